@@ -1,50 +1,124 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
 import os
+import time
+
+import connection_pool
+import olap_cube
+import parquet_store
+import query_cache
+import snapshot
+from data_version import read_data_version
+from kpi_engine import (
+    active_customers, choose_granularity, classify_subscription_events, downsample, fill_buckets, with_event_details
+)
+from queries import (
+    ACTIVE_PERIODS_QUERY, CAMPAIGN_DATE_RANGE_QUERY, CHURN_SEGMENTS_QUERY, CUSTOMER_CHURN_EXISTS_QUERY,
+    DATASET_STATS_EXISTS_QUERY, DATASET_STATS_QUERY, MARKETING_CAMPAIGN_SUMMARY_QUERY, MRR_BUCKET_QUERIES,
+    SEGMENT_CHURN_QUERY, SUBSCRIPTION_DATE_RANGE_QUERY, SUBSCRIPTION_EVENTS_QUERY, WEEKLY_KPIS_QUERY
+)
 
 DB_PATH = 'data/sqlite/saas.db'
+# Analytics database built by scripts/automate_pipeline.py, holding the materialized KPI tables
+ANALYTICS_DB_PATH = 'data/sqlite/saas_analytics.db'
+# Chart granularity choices; 'Auto' picks one from the width of the date range
+GRANULARITY_OPTIONS = {'Auto': None, 'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M'}
+GRANULARITY_LABELS = {'D': 'Day', 'W': 'Week', 'M': 'Month'}
+DEFAULT_MAX_CHART_POINTS = 500  # Per line; longer series are thinned with LTTB
 
 def load_css(file_name):
     with open(file_name) as f:
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
-def ensure_db_directory():
+def ensure_db_directory(db_path=DB_PATH):
     """Ensures that the directory for the SQLite database exists."""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    ensure_db_directory()
-    if not os.path.exists(DB_PATH):
-        st.error(f"Database file not found at {DB_PATH}. Please run the database setup and data generation scripts.")
-        st.stop()
-    return sqlite3.connect(DB_PATH)
-
-@st.cache_data(ttl=600)
-def fetch_data(query, params=None):
-    """Fetches data from the database using a given query and parameters."""
-    conn = None
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+@st.cache_resource
+def get_connection_pool():
+    """Read-only connections shared by all sessions of this server process."""
+    return connection_pool.new_pool()
+
+@st.cache_resource
+def get_query_cache():
+    """One result cache shared by all sessions of this server process."""
+    return query_cache.new_cache()
+
+@st.cache_resource(max_entries=1)
+def load_data_snapshot(db_path, version):
+    """Columnar snapshot of the dashboard tables; reloaded when the data version changes."""
+    with connection_pool.checkout(get_connection_pool(), db_path) as conn:
+        return snapshot.load_snapshot(conn)
+
+def get_data_snapshot(db_path=DB_PATH):
+    """The snapshot for the database's current data version (in-memory mode)."""
+    with connection_pool.checkout(get_connection_pool(), db_path) as conn:
+        version = read_data_version(db_path, conn)
+    return load_data_snapshot(db_path, version)
+
+def fetch_data(query, params=None, db_path=DB_PATH):
+    """
+    Fetches data from the database using a given query and parameters. Results are cached under
+    the database's data version, so they are reused until the pipeline stamps a new version.
+    Misses run on a pooled read-only connection.
+    """
+    cache = get_query_cache()
+    pool = get_connection_pool()
     try:
-        conn = get_db_connection()  # Get fresh connection each time
-        df = pd.read_sql_query(query, conn, params=params)
-        return df  # Return only the dataframe, not the connection
+        with connection_pool.checkout(pool, db_path) as conn:
+            key = query_cache.cache_key(db_path, read_data_version(db_path, conn), query, params)
+            df = query_cache.cache_get(cache, key)
+            if df is not None:
+                return df
+            started = time.perf_counter()
+            df = pd.read_sql_query(query, conn, params=params)
+            connection_pool.record_query(pool, time.perf_counter() - started)
+    except FileNotFoundError:
+        st.error(f"Database file not found at {db_path}. Please run the database setup and data generation scripts.")
+        st.stop()
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-        return pd.DataFrame()
-    finally:
-        if conn:
-            conn.close()  # Always close the connection
-
-def get_date_range():
-    """Gets the overall min and max date from subscriptions and campaigns for global filter."""
-    query_subs = "SELECT MIN(start_date) as min_s, MAX(COALESCE(end_date, DATE('now'))) as max_s FROM subscriptions"
-    query_campaigns = "SELECT MIN(start_date) as min_c, MAX(end_date) as max_c FROM marketing_campaigns"
-    
-    df_subs = fetch_data(query_subs)
-    df_campaigns = fetch_data(query_campaigns)
+        return pd.DataFrame()  # Errors are not cached
+    query_cache.cache_put(cache, key, df)
+    return df
+
+def get_dataset_stats(db_path=DB_PATH):
+    """
+    The loaders' current dataset_stats rows indexed by table name ('dataset' holds the overall date
+    bounds), or None if absent. Rows flagged stale are left out, so their callers fall back to the
+    aggregate queries (or hide the counts) instead of showing outdated bounds.
+    """
+    exists = fetch_data(DATASET_STATS_EXISTS_QUERY, db_path=db_path)
+    if exists.empty or not exists['n'].iloc[0]:
+        return None
+    stats = fetch_data(DATASET_STATS_QUERY, db_path=db_path)
+    if 'stale' in stats.columns:
+        stats = stats[stats['stale'] == 0]
+    return stats.set_index('table_name') if not stats.empty else None
+
+def stats_date_range(stats):
+    """Global filter bounds from the 'dataset' row; subscriptions without an end date run until today."""
+    if 'dataset' not in stats.index or pd.isna(stats.at['dataset', 'min_date']):
+        return None
+    min_date = pd.to_datetime(stats.at['dataset', 'min_date'])
+    max_date = pd.to_datetime(stats.at['dataset', 'max_date'])
+    if stats.at['dataset', 'open_rows'] > 0:
+        max_date = max(max_date, pd.Timestamp(datetime.today().date()))
+    return min_date, max_date
+
+def get_date_range(stats=None):
+    """
+    Gets the overall min and max date from subscriptions and campaigns for global filter: from
+    dataset_stats when the loaders wrote it, otherwise with MIN/MAX over both tables.
+    """
+    bounds = stats_date_range(stats) if stats is not None else None
+    if bounds is not None:
+        return bounds
+
+    df_subs = fetch_data(SUBSCRIPTION_DATE_RANGE_QUERY)
+    df_campaigns = fetch_data(CAMPAIGN_DATE_RANGE_QUERY)
 
     min_dates = []
     max_dates = []
@@ -69,186 +143,122 @@ def get_date_range():
     return overall_min_date, overall_max_date
 
 # --- KPI Calculation Functions ---
-def calculate_mrr_and_movements(start_date, end_date):
+def calculate_mrr_and_movements(start_date, end_date, freq='D', data_snapshot=None):
     """
-    Calculates MRR, New MRR, Churned MRR, Expansion MRR, Contraction MRR over time.
-    This is a simplified version. A more accurate calculation would track individual subscription changes.
+    Calculates MRR, New MRR, Churned MRR, Expansion MRR, Contraction MRR per day, week or month
+    (freq 'D', 'W' or 'M'). SQLite aggregates the start/end events into buckets, so one row per
+    bucket is fetched; MRR is the value on the bucket's last day and the movements are sums.
+    With a data_snapshot (in-memory mode) the event sweep runs on its columns instead.
     """
-    query = """
-    WITH RECURSIVE dates(date) AS (
-        SELECT DATE(?) -- start_date
-        UNION ALL
-        SELECT DATE(date, '+1 day')
-        FROM dates
-        WHERE date < DATE(?) -- end_date
-    ),
-    subscription_daily_mrr AS (
-        SELECT
-            s.customer_id,
-            p.price_monthly,
-            s.start_date,
-            COALESCE(s.end_date, DATE('now', '+100 years')) as effective_end_date, 
-            s.status,
-            LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_id,
-            LAG(p.price_monthly, 1, 0) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_price
-        FROM subscriptions s
-        JOIN plans p ON s.plan_id = p.id
-    )
-    SELECT
-        d.date,
-        SUM(CASE WHEN sdm.start_date <= d.date AND sdm.effective_end_date > d.date THEN sdm.price_monthly ELSE 0 END) as mrr,
-        
-        SUM(CASE 
-            WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NULL -- New customer or first subscription
-            THEN sdm.price_monthly ELSE 0 
-            END) as new_mrr,
-            
-        SUM(CASE 
-            WHEN sdm.effective_end_date = d.date AND sdm.status = 'canceled' -- Explicit cancellation
-            THEN sdm.price_monthly ELSE 0 
-            END) as churned_mrr,
-
-        SUM(CASE 
-            WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NOT NULL AND sdm.price_monthly > sdm.prev_plan_price -- Upgrade
-            THEN (sdm.price_monthly - sdm.prev_plan_price) ELSE 0 
-            END) as expansion_mrr,
-
-        SUM(CASE 
-            WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NOT NULL AND sdm.price_monthly < sdm.prev_plan_price -- Downgrade
-            THEN (sdm.prev_plan_price - sdm.price_monthly) ELSE 0 -- Positive value for contraction amount
-            END) as contraction_mrr
-            
-    FROM dates d
-    LEFT JOIN subscription_daily_mrr sdm ON 1=1 -- Join all and filter in SUM cases, or refine join condition
-    GROUP BY d.date
-    ORDER BY d.date;
+    if data_snapshot is not None:
+        return snapshot.snapshot_mrr(data_snapshot, start_date, end_date, freq)
+    buckets = fetch_data(MRR_BUCKET_QUERIES[freq], {"start_date": start_date.strftime('%Y-%m-%d'),
+                                                    "end_date": end_date.strftime('%Y-%m-%d')})
+    if buckets.columns.empty: # fetch_data already reported the error
+        return buckets
+    return fill_buckets(buckets, start_date, end_date, freq)
+
+def calculate_active_subscriptions(start_date, end_date, freq='D', data_snapshot=None):
     """
-    df = fetch_data(query, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-    return df
-
-def calculate_active_subscriptions(start_date, end_date):
-    query = """
-    WITH RECURSIVE dates(date) AS (
-        SELECT DATE(?) -- start_date
-        UNION ALL
-        SELECT DATE(date, '+1 day')
-        FROM dates
-        WHERE date < DATE(?) -- end_date
-    )
-    SELECT
-        d.date,
-        COUNT(DISTINCT s.customer_id) as active_subscriptions
-    FROM dates d
-    LEFT JOIN subscriptions s ON s.start_date <= d.date AND (s.end_date IS NULL OR s.end_date > d.date) AND s.status = 'active'
-    GROUP BY d.date
-    ORDER BY d.date;
+    Counts distinct customers with an active subscription, per day or at the end of each
+    week/month (freq 'D', 'W' or 'M'), using the interval engine in kpi_engine.active_customers.
     """
-    df = fetch_data(query, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-    return df
-    
-def get_subscription_events(start_date, end_date):
-    """Fetches new subscriptions, cancellations, upgrades, downgrades within the date range."""
-    query = """
-    SELECT 
-        s.id,
-        s.customer_id,
-        c.name as customer_name,
-        s.plan_id,
-        p.name as plan_name,
-        p.price_monthly,
-        s.start_date,
-        s.end_date,
-        s.status,
-        LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_id,
-        (SELECT name from plans where id = prev_plan_id) as prev_plan_name,
-        LAG(p.price_monthly, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_price
-    FROM subscriptions s
-    JOIN plans p ON s.plan_id = p.id
-    JOIN customers c ON s.customer_id = c.id
-    WHERE s.start_date BETWEEN DATE(?) AND DATE(?) OR s.end_date BETWEEN DATE(?) AND DATE(?)
-    ORDER BY s.start_date
+    if data_snapshot is not None:
+        return snapshot.snapshot_active(data_snapshot, start_date, end_date, freq)
+    subs = fetch_data(ACTIVE_PERIODS_QUERY, (end_date.strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d')))
+    if subs.columns.empty: # fetch_data already reported the error
+        return subs
+    return active_customers(subs, start_date, end_date, freq)
+
+def get_subscription_events(start_date, end_date, data_snapshot=None):
+    """
+    Fetches new subscriptions, cancellations, upgrades, downgrades within the date range.
+    Events are classified column-wise; `details` is added later, only for the displayed log page.
     """
-    df = fetch_data(query, (
+    if data_snapshot is not None:
+        return snapshot.snapshot_events(data_snapshot, start_date, end_date)
+    df = fetch_data(SUBSCRIPTION_EVENTS_QUERY, (
         start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'),
         start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
     ))
 
-    if df.empty:
-        return pd.DataFrame(columns=['date', 'type', 'details', 'mrr_change'])
+    if df.columns.empty: # fetch_data already reported the error
+        return df
+    return classify_subscription_events(df, start_date, end_date)
 
-    df['start_date'] = pd.to_datetime(df['start_date'])
-    df['end_date'] = pd.to_datetime(df['end_date'], errors='coerce')
-    
-    events = []
-
-    for _, row in df.iterrows():
-        # New Subscriptions
-        if row['status'] == 'active' and pd.isna(row['prev_plan_id']) and row['start_date'] >= start_date and row['start_date'] <= end_date:
-            events.append({
-                'date': row['start_date'], 
-                'type': 'New Subscription', 
-                'details': f"Customer {row['customer_name']} started {row['plan_name']}",
-                'mrr_change': row['price_monthly']
-            })
-
-        # Cancellations
-        if row['status'] == 'canceled' and row['end_date'] is not pd.NaT and row['end_date'] >= start_date and row['end_date'] <= end_date:
-            events.append({
-                'date': row['end_date'], 
-                'type': 'Cancellation', 
-                'details': f"Customer {row['customer_name']} canceled {row['plan_name']}",
-                'mrr_change': -row['price_monthly']
-            })
-        
-        # Upgrades
-        if row['status'] == 'upgraded' and row['start_date'] >= start_date and row['start_date'] <= end_date: # 'upgraded' status implies it's the start of new plan
-            if row['prev_price'] is not None and row['price_monthly'] > row['prev_price']:
-                 events.append({
-                    'date': row['start_date'], 
-                    'type': 'Upgrade', 
-                    'details': f"Customer {row['customer_name']} upgraded from {row['prev_plan_name']} to {row['plan_name']}",
-                    'mrr_change': row['price_monthly'] - row['prev_price']
-                })
-
-        # Downgrades
-        if row['status'] == 'downgraded' and row['start_date'] >= start_date and row['start_date'] <= end_date: # 'downgraded' status implies it's the start of new plan
-            if row['prev_price'] is not None and row['price_monthly'] < row['prev_price']:
-                events.append({
-                    'date': row['start_date'], 
-                    'type': 'Downgrade', 
-                    'details': f"Customer {row['customer_name']} downgraded from {row['prev_plan_name']} to {row['plan_name']}",
-                    'mrr_change': row['price_monthly'] - row['prev_price'] # Negative value
-                })
-                
-    return pd.DataFrame(events)
-
-def get_marketing_campaign_summary(start_date, end_date):
-    query = """
-    SELECT 
-        mc.id,
-        mc.name,
-        mc.start_date,
-        mc.end_date,
-        mc.budget,
-        mc.channel,
-        COUNT(DISTINCT c.id) as acquired_customers_during_campaign,
-        SUM(CASE WHEN s.start_date >= mc.start_date AND (s.end_date IS NULL OR s.end_date >= mc.start_date) THEN p.price_monthly ELSE 0 END) as initial_mrr_from_acquired
-    FROM marketing_campaigns mc
-    LEFT JOIN customers c ON mc.id = c.marketing_campaign_id 
-        AND c.registration_date BETWEEN mc.start_date AND mc.end_date -- Customer registered during campaign
-    LEFT JOIN subscriptions s ON c.id = s.customer_id 
-        AND s.start_date >= mc.start_date -- Subscription started during or after campaign start
-        AND (s.prev_plan_id IS NULL) -- Count only initial subscription for this MRR
-    LEFT JOIN plans p ON s.plan_id = p.id
-    WHERE mc.start_date <= DATE(?) AND mc.end_date >= DATE(?) -- Campaigns active within the filter range
-    GROUP BY mc.id, mc.name, mc.start_date, mc.end_date, mc.budget, mc.channel
-    ORDER BY mc.start_date
+def get_weekly_kpis(start_date, end_date):
+    """Reads the materialized kpi_weekly table for weeks starting within the date range."""
+    if not os.path.exists(ANALYTICS_DB_PATH):
+        return pd.DataFrame()
+    df = fetch_data(WEEKLY_KPIS_QUERY, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')), db_path=ANALYTICS_DB_PATH)
+    if not df.empty:
+        df['week_start_date'] = pd.to_datetime(df['week_start_date'])
+    return df
+
+def get_churn_segments():
+    """(plan, marketing_channel, country) segments of the kpi_customer_churn table; empty if it was not built."""
+    if not os.path.exists(ANALYTICS_DB_PATH):
+        return pd.DataFrame()
+    exists = fetch_data(CUSTOMER_CHURN_EXISTS_QUERY, db_path=ANALYTICS_DB_PATH)
+    if exists.empty or not exists['n'].iloc[0]:
+        return pd.DataFrame()
+    return fetch_data(CHURN_SEGMENTS_QUERY, db_path=ANALYTICS_DB_PATH)
+
+def get_segment_churn(start_date, end_date, segment):
+    """Weekly customer churn rate of one slice; `segment` maps plan/marketing_channel/country to a value or None (all)."""
+    params = {"start_date": start_date.strftime('%Y-%m-%d'), "end_date": end_date.strftime('%Y-%m-%d'), **segment}
+    df = fetch_data(SEGMENT_CHURN_QUERY, params, db_path=ANALYTICS_DB_PATH)
+    if not df.empty:
+        df['week_start_date'] = pd.to_datetime(df['week_start_date'])
+    return df
+
+def get_cuboids():
+    """{cuboid: row_count} of the kpi_cube catalog; empty if the cube was not built."""
+    if not os.path.exists(ANALYTICS_DB_PATH):
+        return {}
+    exists = fetch_data(olap_cube.CUBE_EXISTS_QUERY, db_path=ANALYTICS_DB_PATH)
+    if exists.empty or not exists['n'].iloc[0]:
+        return {}
+    cuboids = fetch_data(olap_cube.CUBOIDS_QUERY, db_path=ANALYTICS_DB_PATH)
+    return dict(zip(cuboids['cuboid'], cuboids['row_count'])) if not cuboids.empty else {}
+
+def get_cube_slice(start_date, end_date, cuboids, group_by, measures, filters):
+    """Measures grouped by `group_by` from the smallest covering cuboid of kpi_cube (no fact table is read)."""
+    query, params = olap_cube.slice_query(cuboids, group_by, measures, filters,
+                                          start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    df = fetch_data(query, params, db_path=ANALYTICS_DB_PATH)
+    if not df.empty and 'week_start_date' in df.columns:
+        df['week_start_date'] = pd.to_datetime(df['week_start_date'])
+    return df
+
+def get_channel_signups(start_date, end_date):
     """
-    df = fetch_data(query, (end_date.strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d')))
+    Weekly signups per marketing channel from the Parquet customers table (written by
+    `scripts/generate_data.py --storage parquet`). Only the year/month partitions and row groups
+    overlapping the date range are read, and only the two columns needed. Results share the query
+    cache, keyed on the table's files (parquet_store.table_version) instead of a data version.
+    """
+    if not parquet_store.has_table('customers'):
+        return pd.DataFrame()
+    cache = get_query_cache()
+    key = query_cache.cache_key(parquet_store.table_dir('customers'), parquet_store.table_version('customers'),
+                                'channel_signups', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+    df = query_cache.cache_get(cache, key)
+    if df is not None:
+        return df
+    df = parquet_store.read_table('customers', start_date.date(), end_date.date(),
+                                  columns=['signup_date', 'marketing_channel'])
+    if not df.empty:
+        df['week_start_date'] = pd.to_datetime(df['signup_date']).dt.to_period('W-FRI').dt.start_time  # Weeks start on Saturday
+        df = df.groupby(['week_start_date', 'marketing_channel'], observed=True).size().reset_index(name='signups')
+    query_cache.cache_put(cache, key, df)
+    return df
+
+def get_marketing_campaign_summary(start_date, end_date, data_snapshot=None):
+    if data_snapshot is not None:
+        df = snapshot.snapshot_campaign_summary(data_snapshot, start_date, end_date)
+    else:
+        df = fetch_data(MARKETING_CAMPAIGN_SUMMARY_QUERY, (end_date.strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d')))
     if not df.empty:
         df['start_date'] = pd.to_datetime(df['start_date'])
         df['end_date'] = pd.to_datetime(df['end_date'])
@@ -281,12 +291,20 @@ if not os.path.exists(DB_PATH):
     st.stop()
 
 
+dataset_stats = get_dataset_stats()
+if dataset_stats is not None and 'subscriptions' in dataset_stats.index and dataset_stats.at['subscriptions', 'row_count'] == 0:
+    st.warning(f"The database at {DB_PATH} has no subscriptions yet. Please run `generate_sample_data.py` first.")
+    st.stop()
+
 # --- Global Filters ---
-min_db_date, max_db_date = get_date_range()
+min_db_date, max_db_date = get_date_range(dataset_stats)
 
 st.sidebar.header("Global Filters")
 selected_start_date = st.sidebar.date_input("Start Date", min_db_date, min_value=min_db_date, max_value=max_db_date)
 selected_end_date = st.sidebar.date_input("End Date", max_db_date, min_value=min_db_date, max_value=max_db_date)
+if dataset_stats is not None and {'customers', 'subscriptions'} <= set(dataset_stats.index):
+    st.sidebar.caption(f"{dataset_stats.at['customers', 'row_count']:,} customers · "
+                       f"{dataset_stats.at['subscriptions', 'row_count']:,} subscriptions")
 
 # Convert to datetime objects for comparison
 selected_start_date = datetime.combine(selected_start_date, datetime.min.time())
@@ -297,11 +315,21 @@ if selected_start_date > selected_end_date:
     st.sidebar.error("Error: End date must be after start date.")
     st.stop()
 
+st.sidebar.header("Chart Options")
+granularity_choice = st.sidebar.selectbox("Granularity", options=list(GRANULARITY_OPTIONS), index=0)
+granularity = GRANULARITY_OPTIONS[granularity_choice] or choose_granularity(selected_start_date, selected_end_date)
+max_chart_points = st.sidebar.number_input("Max points per line", min_value=50, max_value=10_000,
+                                           value=DEFAULT_MAX_CHART_POINTS, step=50)
+in_memory_mode = st.sidebar.toggle("In-memory mode", value=False,
+                                   help="Load the dashboard tables into memory once per data version and compute "
+                                        "every section from there instead of querying SQLite on each change.")
+data_snapshot = get_data_snapshot() if in_memory_mode else None
+
 # --- Main Dashboard Sections ---
 st.sidebar.header("Dashboard Sections")
 display_section = st.sidebar.radio(
     "Choose a section:",
-    options=['Key Metrics Overview', 'Subscription Fluctuations', 'Marketing Impact'],
+    options=['Key Metrics Overview', 'Subscription Fluctuations', 'Marketing Impact', 'Weekly KPI Summary'],
     index=0 
 )
 
@@ -313,20 +341,15 @@ if display_section == 'Key Metrics Overview':
     
     with col1:
         st.subheader("MRR Trend & Movements")
-        mrr_df = calculate_mrr_and_movements(selected_start_date, selected_end_date)
+        mrr_df = calculate_mrr_and_movements(selected_start_date, selected_end_date, granularity, data_snapshot)
         if not mrr_df.empty:
-            fig_mrr = px.line(mrr_df, x='date', y='mrr', title='Monthly Recurring Revenue (MRR)',
+            fig_mrr = px.line(downsample(mrr_df, 'date', ['mrr'], max_chart_points), x='date', y='mrr',
+                            title=f'Monthly Recurring Revenue (MRR, per {GRANULARITY_LABELS[granularity]})',
                             color_discrete_sequence=px.colors.sequential.Viridis)
             st.plotly_chart(fig_mrr, use_container_width=True)
-            
-            mrr_movements_df = mrr_df[['date', 'new_mrr', 'churned_mrr', 'expansion_mrr', 'contraction_mrr']]
-            mrr_movements_df = mrr_movements_df.set_index('date')
-            # Resample to monthly for a cleaner view of movements, if data spans multiple months
-            if (selected_end_date - selected_start_date).days > 60 :
-                 mrr_movements_df = mrr_movements_df.resample('M').sum().reset_index()
-
-            fig_mrr_b = px.bar(mrr_movements_df, x='date', y=['new_mrr', 'churned_mrr', 'expansion_mrr', 'contraction_mrr'],
-                             title='MRR Movements (Summed)', barmode='group',
+
+            fig_mrr_b = px.bar(mrr_df, x='date', y=['new_mrr', 'churned_mrr', 'expansion_mrr', 'contraction_mrr'],
+                             title=f'MRR Movements (Summed per {GRANULARITY_LABELS[granularity]})', barmode='group',
                              color_discrete_map={
                                  'new_mrr': '#2ecc71',        # Green
                                  'churned_mrr': '#e74c3c',    # Red
@@ -339,9 +362,11 @@ if display_section == 'Key Metrics Overview':
 
     with col2:
         st.subheader("Active Subscriptions")
-        active_subs_df = calculate_active_subscriptions(selected_start_date, selected_end_date)
+        # Counted at the end of each bucket of the chosen granularity instead of on every day
+        active_subs_df = calculate_active_subscriptions(selected_start_date, selected_end_date, granularity, data_snapshot)
         if not active_subs_df.empty:
-            fig_active_subs = px.line(active_subs_df, x='date', y='active_subscriptions', title='Active Subscriptions Over Time',
+            fig_active_subs = px.line(downsample(active_subs_df, 'date', ['active_subscriptions'], max_chart_points),
+                                    x='date', y='active_subscriptions', title='Active Subscriptions Over Time',
                                     color_discrete_sequence=px.colors.sequential.Plasma)
             st.plotly_chart(fig_active_subs, use_container_width=True)
         else:
@@ -353,7 +378,7 @@ elif display_section == 'Subscription Fluctuations':
     st.header("Subscription Fluctuations Analysis")
     st.markdown("Track new subscriptions, cancellations, upgrades, and downgrades.")
 
-    events_df = get_subscription_events(selected_start_date, selected_end_date)
+    events_df = get_subscription_events(selected_start_date, selected_end_date, data_snapshot)
 
     if not events_df.empty:
         # Summary Counts
@@ -374,7 +399,14 @@ elif display_section == 'Subscription Fluctuations':
 
         # Detailed Log
         st.subheader("Detailed Event Log")
-        st.dataframe(events_df[['date', 'type', 'details', 'mrr_change']].sort_values(by='date', ascending=False), use_container_width=True)
+        log_df = events_df.sort_values(by='date', ascending=False, kind='stable')
+        log_col1, log_col2 = st.columns(2)
+        page_size = log_col1.selectbox("Rows per page", options=[25, 50, 100, 250], index=1)
+        page_count = max(1, -(-len(log_df) // page_size))
+        page = log_col2.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        page_df = with_event_details(log_df.iloc[(page - 1) * page_size:page * page_size]) # Details only for the shown rows
+        st.caption(f"Page {page} of {page_count} ({len(log_df)} events)")
+        st.dataframe(page_df[['date', 'type', 'details', 'mrr_change']], use_container_width=True)
     else:
         st.info("No subscription events found for the selected period.")
 
@@ -383,7 +415,7 @@ elif display_section == 'Marketing Impact':
     st.header("Marketing Campaign Impact")
     st.markdown("Analyze customer acquisition and initial MRR from campaigns.")
     
-    campaign_summary_df = get_marketing_campaign_summary(selected_start_date, selected_end_date)
+    campaign_summary_df = get_marketing_campaign_summary(selected_start_date, selected_end_date, data_snapshot)
     
     if not campaign_summary_df.empty:
         st.subheader("Campaign Performance Summary")
@@ -413,6 +445,113 @@ elif display_section == 'Marketing Impact':
     else:
         st.info("No marketing campaign data available for the selected period, or no campaigns were active/ended in this period.")
 
+# --- Weekly KPI Summary ---
+elif display_section == 'Weekly KPI Summary':
+    st.header("Weekly KPI Summary")
+    st.markdown("Weekly KPIs materialized by the data pipeline (`scripts/automate_pipeline.py`).")
+
+    weekly_kpis_df = get_weekly_kpis(selected_start_date, selected_end_date)
+
+    if not weekly_kpis_df.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            fig_weekly_mrr = px.line(downsample(weekly_kpis_df, 'week_start_date', ['total_mrr'], max_chart_points),
+                                     x='week_start_date', y='total_mrr', title='Total MRR (Weekly)',
+                                     color_discrete_sequence=px.colors.sequential.Viridis)
+            st.plotly_chart(fig_weekly_mrr, use_container_width=True)
+
+            churn_columns = ['customer_churn_rate_pct', 'gross_revenue_churn_rate_pct']
+            fig_weekly_churn = px.line(downsample(weekly_kpis_df, 'week_start_date', churn_columns, max_chart_points),
+                                       x='week_start_date', y=churn_columns,
+                                       title='Churn Rates (Weekly %)')
+            st.plotly_chart(fig_weekly_churn, use_container_width=True)
+        with col2:
+            fig_weekly_components = px.bar(weekly_kpis_df, x='week_start_date',
+                                           y=['new_mrr', 'expansion_mrr', 'contraction_mrr', 'churned_mrr'],
+                                           title='MRR Growth Components (Weekly)', barmode='relative',
+                                           color_discrete_map={
+                                               'new_mrr': '#2ecc71',
+                                               'expansion_mrr': '#3498db',
+                                               'contraction_mrr': '#f39c12',
+                                               'churned_mrr': '#e74c3c'
+                                           })
+            st.plotly_chart(fig_weekly_components, use_container_width=True)
+
+            customer_columns = ['active_customers', 'new_signups']
+            fig_weekly_customers = px.line(downsample(weekly_kpis_df, 'week_start_date', customer_columns, max_chart_points),
+                                           x='week_start_date', y=customer_columns,
+                                           title='Active Customers & New Signups (Weekly)')
+            st.plotly_chart(fig_weekly_customers, use_container_width=True)
+
+        channel_signups_df = get_channel_signups(selected_start_date, selected_end_date)
+        if not channel_signups_df.empty:
+            fig_channel_signups = px.bar(channel_signups_df, x='week_start_date', y='signups', color='marketing_channel',
+                                         title='New Signups by Marketing Channel (Weekly, from Parquet)')
+            st.plotly_chart(fig_channel_signups, use_container_width=True)
+
+        churn_segments_df = get_churn_segments()
+        if not churn_segments_df.empty:
+            st.subheader("Customer Churn by Segment")
+            segment = {}
+            for column, segment_col in zip(churn_segments_df.columns, st.columns(len(churn_segments_df.columns))):
+                label = column.replace('_', ' ').title()
+                choice = segment_col.selectbox(label, ['All'] + sorted(churn_segments_df[column].unique()),
+                                               key=f"churn_segment_{column}")
+                segment[column] = None if choice == 'All' else choice
+            segment_churn_df = get_segment_churn(selected_start_date, selected_end_date, segment)
+            if not segment_churn_df.empty:
+                fig_segment_churn = px.line(
+                    downsample(segment_churn_df, 'week_start_date', ['customer_churn_rate_pct'], max_chart_points),
+                    x='week_start_date', y='customer_churn_rate_pct', title='Customer Churn Rate of the Segment (Weekly %)'
+                )
+                st.plotly_chart(fig_segment_churn, use_container_width=True)
+
+            cuboids = get_cuboids()
+            if cuboids:
+                measure_col, breakdown_col = st.columns(2)
+                measure = measure_col.selectbox("Measure", olap_cube.MEASURES, key="cube_measure",
+                                                format_func=lambda name: name.replace('_', ' ').title())
+                breakdown = breakdown_col.selectbox("Break down by", ['None'] + olap_cube.SEGMENT_DIMENSIONS,
+                                                    key="cube_breakdown",
+                                                    format_func=lambda name: name.replace('_', ' ').title())
+                group_by = ['week'] + ([] if breakdown == 'None' else [breakdown])
+                try:
+                    cube_df = get_cube_slice(selected_start_date, selected_end_date, cuboids, group_by, [measure], segment)
+                except ValueError as e:
+                    st.info(str(e))
+                    cube_df = pd.DataFrame()
+                if not cube_df.empty:
+                    fig_cube = px.line(cube_df, x='week_start_date', y=measure,
+                                       color=None if breakdown == 'None' else breakdown,
+                                       title=f"{measure.replace('_', ' ').title()} of the Segment (Weekly, from the KPI cube)")
+                    st.plotly_chart(fig_cube, use_container_width=True)
+
+        st.subheader("Weekly Snapshot")
+        st.dataframe(weekly_kpis_df, use_container_width=True)
+    else:
+        st.info(f"No materialized KPIs found in {ANALYTICS_DB_PATH} for the selected period. "
+                "Run `python scripts/automate_pipeline.py` to build them.")
+
+# --- Cache Debug Panel ---
+with st.sidebar.expander("Query cache and connections (debug)"):
+    stats = query_cache.cache_stats(get_query_cache())
+    st.write(f"Entries: {stats['entries']} / {stats['max_entries']} "
+             f"({stats['megabytes']:.1f} / {stats['max_megabytes']:.0f} MB)")
+    st.write(f"Hits: {stats['hits']} · Misses: {stats['misses']} · Hit rate: {stats['hit_rate']:.0%}")
+    st.write(f"Evictions: {stats['evictions']} · Invalidations: {stats['invalidations']}")
+    for path, version in stats['versions'].items():
+        st.caption(f"{os.path.basename(path)}: data version {version}")
+    pool = connection_pool.pool_stats(get_connection_pool())
+    st.write(f"Connections: {pool['opened']} opened ({pool['avg_connect_ms']:.2f} ms avg) · "
+             f"{pool['reused']} reused · {pool['idle']} idle")
+    st.write(f"Queries: {pool['queries']} run, {pool['query_ms']:.0f} ms total ({pool['avg_query_ms']:.1f} ms avg)")
+    if data_snapshot is not None:
+        st.write(f"In-memory snapshot: {data_snapshot['bytes'] / 1024 / 1024:.1f} MB, "
+                 f"loaded in {data_snapshot['load_seconds']:.2f}s")
+    if st.button("Clear query cache"):
+        query_cache.clear_cache(get_query_cache())
+        st.rerun()
+
 # --- Footer ---
 st.sidebar.markdown("---")
 st.sidebar.info("Dashboard for SaaS Subscription Analytics. Uses `saas_subscriptions.db`.")
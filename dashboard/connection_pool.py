@@ -0,0 +1,113 @@
+# Process-wide pool of read-only SQLite connections for the dashboard. Connections are kept open
+# between page renders so SQLite's page cache, the memory map and each connection's prepared
+# statement cache survive; a thread checks a connection out for the duration of one query.
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlite_schema import read_only_uri
+
+MAX_IDLE_PER_DATABASE = 8
+CACHED_STATEMENTS = 256              # Prepared statements kept per connection (sqlite3 default: 128)
+CACHE_SIZE_KIB = 64 * 1024           # Page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024
+READ_ONLY_PRAGMAS = [
+    "PRAGMA query_only = ON",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KIB}",  # Negative: KiB rather than pages
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+]
+
+def new_pool(max_idle=MAX_IDLE_PER_DATABASE):
+    """An empty pool: idle connections per database file, with connection and query timings."""
+    return {
+        "idle": {},                # db_path -> [(connection, file identity)]
+        "lock": threading.Lock(),
+        "max_idle": max_idle,
+        "opened": 0,
+        "reused": 0,
+        "discarded": 0,            # Connections to a file that was since replaced
+        "connect_seconds": 0.0,
+        "queries": 0,
+        "query_seconds": 0.0,
+    }
+
+def file_identity(db_path):
+    """(device, inode) of the database file; changes when the file is replaced. Raises FileNotFoundError."""
+    stat = os.stat(db_path)
+    return stat.st_dev, stat.st_ino
+
+def open_read_only(db_path):
+    """A read-only connection (mode=ro) usable from any thread, one thread at a time."""
+    conn = sqlite3.connect(read_only_uri(db_path), uri=True,
+                           check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    for pragma in READ_ONLY_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextmanager
+def checkout(pool, db_path):
+    """
+    Lends the calling thread a pooled connection to db_path, opening one if none is idle.
+    Idle connections to an older file at the same path (replaced by a rebuild) are closed.
+    """
+    identity = file_identity(db_path)
+    conn = None
+    stale = []
+    with pool["lock"]:
+        idle = pool["idle"].setdefault(db_path, [])
+        while idle and conn is None:
+            candidate, candidate_identity = idle.pop()
+            if candidate_identity == identity:
+                conn = candidate
+                pool["reused"] += 1
+            else:
+                stale.append(candidate)
+        pool["discarded"] += len(stale)
+    for candidate in stale:
+        candidate.close()
+
+    if conn is None:
+        started = time.perf_counter()
+        conn = open_read_only(db_path)
+        with pool["lock"]:
+            pool["opened"] += 1
+            pool["connect_seconds"] += time.perf_counter() - started
+    try:
+        yield conn
+    finally:
+        with pool["lock"]:
+            idle = pool["idle"].setdefault(db_path, [])
+            if len(idle) < pool["max_idle"]:
+                idle.append((conn, identity))
+                conn = None
+        if conn is not None:
+            conn.close()
+
+def record_query(pool, seconds):
+    with pool["lock"]:
+        pool["queries"] += 1
+        pool["query_seconds"] += seconds
+
+def close_pool(pool):
+    with pool["lock"]:
+        for idle in pool["idle"].values():
+            for conn, _ in idle:
+                conn.close()
+        pool["idle"].clear()
+
+def pool_stats(pool):
+    """Connection and query timings for the sidebar debug panel, in milliseconds."""
+    with pool["lock"]:
+        return {
+            "opened": pool["opened"],
+            "reused": pool["reused"],
+            "discarded": pool["discarded"],
+            "idle": sum(len(idle) for idle in pool["idle"].values()),
+            "connect_ms": pool["connect_seconds"] * 1000,
+            "avg_connect_ms": pool["connect_seconds"] * 1000 / pool["opened"] if pool["opened"] else 0.0,
+            "queries": pool["queries"],
+            "query_ms": pool["query_seconds"] * 1000,
+            "avg_query_ms": pool["query_seconds"] * 1000 / pool["queries"] if pool["queries"] else 0.0,
+        }
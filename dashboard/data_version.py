@@ -0,0 +1,56 @@
+# Data version stamp: every step that rewrites a database's data (loads, KPI refreshes, sample data
+# generation) records a new version in the single-row data_version table. The dashboard keys its
+# cached query results on it, so they stay valid until the data actually changes.
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+
+from sqlite_schema import read_only_uri
+
+DATA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),  -- Single row
+    version TEXT NOT NULL,                  -- Load timestamp plus a random suffix
+    source TEXT NOT NULL,                   -- Step that wrote the data, e.g. 'load', 'kpi_refresh'
+    updated_at TEXT NOT NULL
+);
+"""
+DATA_VERSION_QUERY = "SELECT version FROM data_version WHERE id = 1"
+
+def stamp_data_version(conn, source):
+    """Records a new data version in the caller's transaction (the caller commits). Returns the version."""
+    now = datetime.now()
+    version = f"{now.strftime('%Y%m%dT%H%M%S.%f')}-{uuid.uuid4().hex[:8]}"
+    conn.execute(DATA_VERSION_SQL)
+    conn.execute(
+        "INSERT INTO data_version (id, version, source, updated_at) VALUES (1, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET version = excluded.version, source = excluded.source, "
+        "updated_at = excluded.updated_at",
+        (version, source, now.isoformat(timespec='seconds'))
+    )
+    return version
+
+def read_data_version(db_path, conn=None):
+    """
+    The stamped version of a database file, read over `conn` if given (e.g. a pooled connection).
+    A database without a stamp (built before the stamp existed) falls back to its file size and
+    modification time; None if the file does not exist.
+    """
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(read_only_uri(db_path), uri=True)
+        row = conn.execute(DATA_VERSION_QUERY).fetchone()
+        if row:
+            return row[0]
+    except sqlite3.Error:
+        pass  # No data_version table yet
+    finally:
+        if own_conn and conn:
+            conn.close()
+    return f"mtime-{stat.st_mtime_ns}-{stat.st_size}"
@@ -0,0 +1,107 @@
+# Small per-table summary maintained by the loaders: row counts, distinct customers and date bounds.
+# The dashboard starts up from it (global filter bounds, empty-state checks) instead of running
+# MIN/MAX aggregates over the full tables on every rerun.
+from datetime import datetime
+
+from sqlite_schema import table_columns
+
+DATASET_STATS_SQL = """
+CREATE TABLE IF NOT EXISTS dataset_stats (
+    table_name TEXT PRIMARY KEY,          -- A table, or 'dataset' for the date bounds of the whole database
+    row_count INTEGER NOT NULL,
+    distinct_customers INTEGER,           -- NULL for tables without a customer column
+    min_date TEXT,                        -- YYYY-MM-DD
+    max_date TEXT,                        -- Latest start or end date
+    open_rows INTEGER NOT NULL,           -- Rows still running today (no end date yet)
+    updated_at TEXT NOT NULL,
+    stale INTEGER NOT NULL DEFAULT 0      -- 1 once rows changed after updated_at (incremental ingest or KPI refresh)
+);
+"""
+DATASET_ROW = "dataset"
+
+# Per schema: table -> (customer column, start date column, end date column, open end means "still running today").
+STATS_COLUMNS = {
+    "dashboard": {
+        "plans": (None, None, None, False),
+        "marketing_campaigns": (None, "start_date", "end_date", False),
+        "customers": ("id", "registration_date", None, False),
+        "subscriptions": ("customer_id", "start_date", "end_date", True),
+    },
+    "analytics": {
+        "calendar": (None, "week_start_date", "week_end_date", False),
+        "customers": ("customer_id", "signup_date", "churn_date", False),
+        "marketing": (None, "week_start", None, False),
+        "revenue": ("customer_id", "week_start", None, False),
+        "product_usage": ("customer_id", "week_start", None, False),
+        "subscription_changes": ("customer_id", "event_date", None, False),
+        "support_tickets": ("customer_id", "creation_date", "resolution_date", False),
+    },
+}
+# Tables whose dates make up the 'dataset' bounds (what the dashboard's global date filter spans).
+BOUND_TABLES = {
+    "dashboard": ["subscriptions", "marketing_campaigns"],
+    "analytics": ["calendar"],
+}
+
+def table_stats(conn, table, customer_column, start_column, end_column, open_today):
+    """(row_count, distinct_customers, min_date, max_date, open_rows) in one scan of the table."""
+    null = "NULL"
+    row = conn.execute(f"""
+        SELECT COUNT(*),
+               {f'COUNT(DISTINCT {customer_column})' if customer_column else null},
+               {f'MIN({start_column})' if start_column else null},
+               {f'MAX({start_column})' if start_column else null},
+               {f'MAX({end_column})' if end_column else null},
+               {f'SUM({end_column} IS NULL)' if end_column and open_today else 0}
+        FROM {table}
+    """).fetchone()
+    count, customers, min_date, max_start, max_end, open_rows = row
+    ends = [value for value in (max_start, max_end) if value is not None]
+    return count, customers, min_date, max(ends) if ends else None, open_rows or 0
+
+def mark_dataset_stats_stale(conn, tables):
+    """
+    Flags the rows of `tables` and the 'dataset' row as stale instead of rescanning the tables after
+    an incremental change; the next full load or full KPI refresh recomputes them. Returns rows flagged.
+    """
+    columns = table_columns(conn, "dataset_stats")
+    if not columns or not tables:
+        return 0
+    if "stale" not in columns:
+        conn.execute("ALTER TABLE dataset_stats ADD COLUMN stale INTEGER NOT NULL DEFAULT 0")  # Written before the flag existed
+    names = [*tables, DATASET_ROW]
+    return conn.execute(f"UPDATE dataset_stats SET stale = 1 WHERE table_name IN ({', '.join('?' * len(names))})",
+                        names).rowcount
+
+def refresh_dataset_stats(conn, schema):
+    """
+    Rewrites dataset_stats for the tables of `schema` ('dashboard' or 'analytics') that exist, in the
+    caller's transaction (the caller commits). Returns {table: row_count}.
+    """
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    rows = {}
+    for table, (customer_column, start_column, end_column, open_today) in STATS_COLUMNS[schema].items():
+        columns = table_columns(conn, table)
+        if not columns:
+            continue  # Not loaded (e.g. a partial CSV load)
+        used = [column for column in (customer_column, start_column, end_column) if column]
+        if not set(used) <= set(columns):
+            continue
+        rows[table] = table_stats(conn, table, customer_column, start_column, end_column, open_today)
+
+    bounds = [rows[table] for table in BOUND_TABLES[schema] if table in rows]
+    min_dates = [stats[2] for stats in bounds if stats[2] is not None]
+    max_dates = [stats[3] for stats in bounds if stats[3] is not None]
+    customers = rows["customers"][0] if "customers" in rows else None
+    rows[DATASET_ROW] = (sum(stats[0] for stats in rows.values()), customers,
+                         min(min_dates) if min_dates else None, max(max_dates) if max_dates else None,
+                         sum(stats[4] for stats in bounds))
+
+    conn.execute(DATASET_STATS_SQL)
+    conn.execute("DELETE FROM dataset_stats")
+    conn.executemany(
+        "INSERT INTO dataset_stats (table_name, row_count, distinct_customers, min_date, max_date, open_rows, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(table, *stats, updated_at) for table, stats in rows.items()]
+    )
+    return {table: stats[0] for table, stats in rows.items()}
@@ -0,0 +1,280 @@
+import numpy as np
+import pandas as pd
+
+# Day number used for open-ended subscriptions (end_date IS NULL).
+# Kept well inside int64 so offsets from the range start never overflow.
+OPEN_END_DAY = np.iinfo(np.int32).max
+
+def day_number(value):
+    """Converts a date, datetime or 'YYYY-MM-DD' string to days since 1970-01-01."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+def to_day_numbers(values, fill=OPEN_END_DAY):
+    """Vectorized day_number for a column of dates; missing/unparseable values become `fill`."""
+    days = pd.to_datetime(pd.Series(values), errors='coerce').to_numpy().astype('datetime64[D]')
+    missing = np.isnat(days)
+    days = days.astype(np.int64)
+    days[missing] = fill
+    return days
+
+def day_range(start_date, end_date):
+    """Returns the inclusive array of day numbers between two dates."""
+    return np.arange(day_number(start_date), day_number(end_date) + 1, dtype=np.int64)
+
+def days_to_datetimes(days):
+    """Converts day numbers back to a datetime64[ns] array for plotting."""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]')
+
+def cumulative_at(event_days, weights, days):
+    """
+    Sums `weights` of all events on or before each day in `days`.
+    Events are sorted once and each day is answered with a binary search on the running total.
+    """
+    order = np.argsort(event_days, kind='stable')
+    running = np.concatenate(([0.0], np.cumsum(weights[order])))
+    return running[np.searchsorted(event_days[order], days, side='right')]
+
+def bucket_sum(event_days, weights, bucket_ends, first_day):
+    """
+    Sums weighted events into the buckets ending on `bucket_ends` (sorted day numbers, the first
+    bucket starting on first_day); events outside [first_day, last bucket end] are dropped.
+    """
+    in_range = (event_days >= first_day) & (event_days <= bucket_ends[-1])
+    slots = np.searchsorted(bucket_ends, event_days[in_range], side='left')
+    return np.bincount(slots, weights=weights[in_range], minlength=len(bucket_ends))
+
+def mrr_movements(subs, start_date, end_date):
+    """
+    Event-sweep MRR engine.
+
+    `subs` holds one row per subscription period with price_monthly, start_date, end_date,
+    status, prev_plan_id and prev_plan_price (LAG over the customer's periods). Each period
+    contributes +price on its start day and -price on its end day; MRR on a day is the running
+    total of those deltas, and the movement columns are per-day sums of the matching starts/ends.
+    Runs in O((days + subscriptions) log subscriptions) instead of a days x subscriptions join.
+    """
+    return mrr_movement_buckets(
+        subs['price_monthly'].to_numpy(dtype=float),
+        subs['prev_plan_price'].fillna(0).to_numpy(dtype=float),
+        subs['prev_plan_id'].notna().to_numpy(),
+        (subs['status'] == 'canceled').to_numpy(),
+        to_day_numbers(subs['start_date']),
+        to_day_numbers(subs['end_date']),
+        start_date, end_date,
+    )
+
+def mrr_movement_buckets(price, prev_price, has_prev, canceled, start, end, start_date, end_date, freq='D'):
+    """
+    mrr_movements on column arrays (start/end as day numbers, open ends as OPEN_END_DAY), per day,
+    week or month: MRR on each bucket's last day, movements summed over the bucket. Same rows as
+    the SQL bucket queries completed by fill_buckets.
+    """
+    days = bucket_days(start_date, end_date, freq)
+    first_day = day_number(start_date)
+
+    # A period counts towards MRR on days start <= d < end
+    counted = start < end
+    mrr = (cumulative_at(start[counted], price[counted], days)
+           - cumulative_at(end[counted], price[counted], days))
+
+    change = price - prev_price
+    upgrade = has_prev & (change > 0)
+    downgrade = has_prev & (change < 0)
+
+    return pd.DataFrame({
+        'date': days_to_datetimes(days),
+        'mrr': mrr,
+        'new_mrr': bucket_sum(start[~has_prev], price[~has_prev], days, first_day),
+        'churned_mrr': bucket_sum(end[canceled], price[canceled], days, first_day),
+        'expansion_mrr': bucket_sum(start[upgrade], change[upgrade], days, first_day),
+        'contraction_mrr': bucket_sum(start[downgrade], -change[downgrade], days, first_day),
+    })
+
+# Bucket frequencies understood by the interval engines: day, week (ending Sunday), month.
+FREQUENCIES = ('D', 'W', 'M')
+
+def bucket_days(start_date, end_date, freq='D'):
+    """
+    Day numbers at which a bucketed series is sampled: every day for 'D', otherwise the last
+    day of each week/month touching the range, with the final bucket clipped to end_date.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency '{freq}', expected one of {FREQUENCIES}")
+    if freq == 'D':
+        return day_range(start_date, end_date)
+    periods = pd.period_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq=freq)
+    ends = to_day_numbers(periods.asfreq('D', how='end').to_timestamp())
+    return np.minimum(ends, day_number(end_date))
+
+# Automatic granularity: daily up to about a quarter, weekly up to two years, monthly beyond.
+GRANULARITY_MAX_DAYS = (('D', 92), ('W', 731))
+
+def choose_granularity(start_date, end_date):
+    """Bucket frequency ('D', 'W' or 'M') for a range, from its width."""
+    width = day_number(end_date) - day_number(start_date) + 1
+    for freq, max_days in GRANULARITY_MAX_DAYS:
+        if width <= max_days:
+            return freq
+    return 'M'
+
+MOVEMENT_COLUMNS = ['new_mrr', 'churned_mrr', 'expansion_mrr', 'contraction_mrr']
+
+def fill_buckets(buckets, start_date, end_date, freq='D'):
+    """
+    Completes the per-bucket MRR rows aggregated in SQL (queries.MRR_BUCKET_QUERIES), which only
+    has buckets with events: quiet buckets get zero movements and carry the MRR forward. The result
+    has the columns and bucket dates of mrr_movements followed by a resample to `freq`.
+    """
+    days = bucket_days(start_date, end_date, freq)
+    frame = pd.DataFrame({'date': days_to_datetimes(days)})
+    buckets = buckets.assign(date=pd.to_datetime(buckets['date']).astype('datetime64[ns]'))
+    frame = frame.merge(buckets, on='date', how='left')
+    frame['mrr'] = frame['mrr'].ffill().fillna(0.0).astype(float)
+    frame[MOVEMENT_COLUMNS] = frame[MOVEMENT_COLUMNS].fillna(0.0).astype(float)
+    return frame[['date', 'mrr'] + MOVEMENT_COLUMNS]
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: positions of at most max_points points that keep the visual
+    shape of the line (x, y). The first and last points are kept; from each bucket in between the
+    point forming the largest triangle with the previous pick and the next bucket's mean is kept.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)  # max_points - 2 buckets over the inner points
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = hi, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous])
+                      - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        picked[bucket + 1] = previous
+    return picked
+
+def downsample(frame, x, columns, max_points):
+    """
+    Rows of `frame` to plot for the lines `columns` over `x`, at most about max_points per line:
+    the union of the LTTB picks of each line, in order.
+    """
+    if len(frame) <= max_points:
+        return frame
+    x_values = frame[x]
+    if not pd.api.types.is_numeric_dtype(x_values):
+        x_values = pd.to_datetime(x_values).astype('int64')  # Any linear time scale works for the triangle areas
+    keep = np.unique(np.concatenate([
+        lttb_indices(x_values, frame[column].fillna(0).to_numpy(dtype=float), max_points) for column in columns
+    ]))
+    return frame.iloc[keep]
+
+def merge_customer_intervals(customer_ids, start, end):
+    """
+    Collapses each customer's [start, end) day intervals into disjoint covered intervals.
+    Intervals are sorted by (customer, start); a new merged interval opens whenever a start lies
+    beyond the furthest end seen so far for that customer. Returns (merged_start, merged_end).
+    """
+    valid = start < end
+    customer_ids, start, end = np.asarray(customer_ids)[valid], start[valid], end[valid]
+    if len(start) == 0:
+        return start, end
+
+    order = np.lexsort((start, customer_ids))
+    customer_ids, start, end = customer_ids[order], start[order], end[order]
+    reach = pd.Series(end).groupby(customer_ids).cummax().to_numpy()
+
+    opens = np.ones(len(start), dtype=bool)
+    opens[1:] = (customer_ids[1:] != customer_ids[:-1]) | (start[1:] > reach[:-1])
+    group = np.cumsum(opens) - 1
+    merged_end = np.zeros(group[-1] + 1, dtype=np.int64)
+    np.maximum.at(merged_end, group, end)
+    return start[opens], merged_end
+
+def active_customers(subs, start_date, end_date, freq='D'):
+    """
+    Interval-based active customer counter.
+
+    `subs` holds customer_id, start_date and end_date of active subscription periods. Periods are
+    merged per customer so overlapping ones count once, then the number of customers covering a
+    day is (#merged starts <= day) - (#merged ends <= day). With freq 'W' or 'M' the count is taken
+    on the last day of each bucket instead of materialising every day.
+    """
+    return active_customer_counts(subs['customer_id'].to_numpy(), to_day_numbers(subs['start_date']),
+                                  to_day_numbers(subs['end_date']), start_date, end_date, freq)
+
+def active_customer_counts(customer_ids, start, end, start_date, end_date, freq='D'):
+    """active_customers on column arrays (start/end as day numbers, open ends as OPEN_END_DAY)."""
+    days = bucket_days(start_date, end_date, freq)
+    merged_start, merged_end = merge_customer_intervals(customer_ids, start, end)
+    ones = np.ones(len(merged_start))
+    counts = cumulative_at(merged_start, ones, days) - cumulative_at(merged_end, ones, days)
+    return pd.DataFrame({
+        'date': days_to_datetimes(days),
+        'active_subscriptions': counts.astype(np.int64),
+    })
+
+# Event types produced by classify_subscription_events, in np.select order.
+EVENT_TYPES = ['New Subscription', 'Cancellation', 'Upgrade', 'Downgrade']
+
+def classify_subscription_events(subs, start_date, end_date):
+    """
+    Columnar subscription event classifier.
+
+    `subs` holds one row per subscription period (customer_name, plan_name, price_monthly,
+    start_date, end_date, status, prev_plan_id, prev_plan_name, prev_price). The status decides
+    the candidate event, boolean masks check it falls inside the range, and np.select picks the
+    type and MRR change in one pass. The human readable `details` column is not built here; call
+    with_event_details on the rows that are actually displayed.
+    """
+    starts = pd.to_datetime(subs['start_date'])
+    ends = pd.to_datetime(subs['end_date'], errors='coerce')
+    status = subs['status'].to_numpy()
+    price = subs['price_monthly'].to_numpy(dtype=float)
+    prev_price = subs['prev_price'].to_numpy(dtype=float)
+
+    range_start, range_end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    starts_in_range = ((starts >= range_start) & (starts <= range_end)).to_numpy()
+    ends_in_range = ((ends >= range_start) & (ends <= range_end)).to_numpy()
+
+    conditions = [
+        (status == 'active') & subs['prev_plan_id'].isna().to_numpy() & starts_in_range,
+        (status == 'canceled') & ends_in_range,
+        (status == 'upgraded') & starts_in_range & (price > prev_price),
+        (status == 'downgraded') & starts_in_range & (price < prev_price),
+    ]
+    event_type = np.select(conditions, EVENT_TYPES, default='')
+    mrr_change = np.select(conditions, [price, -price, price - prev_price, price - prev_price], default=0.0)
+    event_date = np.where(conditions[1], ends.to_numpy(), starts.to_numpy())
+
+    is_event = event_type != ''
+    return pd.DataFrame({
+        'date': event_date[is_event],
+        'type': event_type[is_event],
+        'mrr_change': mrr_change[is_event],
+        'customer_name': subs['customer_name'].to_numpy()[is_event],
+        'plan_name': subs['plan_name'].to_numpy()[is_event],
+        'prev_plan_name': subs['prev_plan_name'].to_numpy()[is_event],
+    })
+
+def as_text(column):
+    """Formats a column the way an f-string would (None -> 'None'), as an object array."""
+    return column.to_numpy(dtype=object).astype(str).astype(object)
+
+def with_event_details(events):
+    """Adds the `details` description to (a page of) classified events."""
+    events = events.copy()
+    customer = "Customer " + as_text(events['customer_name'])
+    plan = as_text(events['plan_name'])
+    change = " from " + as_text(events['prev_plan_name']) + " to " + plan
+    events['details'] = np.select(
+        [(events['type'] == event_type).to_numpy() for event_type in EVENT_TYPES],
+        [customer + " started " + plan, customer + " canceled " + plan,
+         customer + " upgraded" + change, customer + " downgraded" + change],
+        default='',
+    )
+    return events
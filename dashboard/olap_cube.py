@@ -0,0 +1,251 @@
+# Pre-aggregated OLAP cube over week x plan x marketing channel x country for the analytics
+# database. The KPI refresh (scripts/compute_kpis.py) reads every fact table once per refreshed
+# week range into base cells keyed by week and the customer's segment, then rolls them up into
+# one cuboid per subset of {plan, marketing_channel, country} (every cuboid keeps the week).
+# The slice API answers a group-by from the smallest cuboid that covers it, so breakdowns never
+# touch the fact tables.
+from datetime import datetime
+from itertools import combinations
+
+import pandas as pd
+
+from sqlite_schema import existing_tables, table_columns
+
+SEGMENT_DIMENSIONS = ["plan", "marketing_channel", "country"]
+DIMENSIONS = ["week"] + SEGMENT_DIMENSIONS
+UNKNOWN_SEGMENT = "Unknown"  # Segment of NULL customer attributes and of facts without a known customer
+
+# Additive measures. Counts of customers add up across segments because a customer is in one segment.
+MEASURES = [
+    "mrr",                      # SUM(revenue.MRR); summed over weeks it is MRR-weeks, not MRR
+    "new_signups",
+    "churned_customers",
+    "active_at_start_of_week",  # From kpi_customer_churn; summed over weeks it is customer-weeks
+    "new_mrr",
+    "expansion_mrr",
+    "contraction_mrr",          # Negative or zero
+    "churned_mrr",              # Negative or zero
+    "ad_spend",
+    "sessions",
+]
+# Measures recorded along fewer dimensions: marketing spend is per channel only, so it is NULL in
+# the cuboids that break down by plan or country.
+MEASURE_DIMENSIONS = {"ad_spend": {"week", "marketing_channel"}}
+
+CUBE_SQL = [f"""
+CREATE TABLE IF NOT EXISTS kpi_cube (
+    cuboid TEXT NOT NULL,                 -- Dimensions of the cuboid, e.g. 'week,plan'
+    week_id INTEGER NOT NULL,             -- calendar.week_id
+    week_start_date TEXT NOT NULL,        -- YYYY-MM-DD
+    plan TEXT,                            -- NULL where the cuboid rolls the dimension up
+    marketing_channel TEXT,
+    country TEXT,
+    {", ".join(f"{measure} REAL" for measure in MEASURES)}
+)
+""", "CREATE INDEX IF NOT EXISTS idx_kpi_cube_cuboid_week ON kpi_cube (cuboid, week_start_date)", """
+CREATE TABLE IF NOT EXISTS kpi_cube_cuboids (
+    cuboid TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL,           -- Size the slice API picks the smallest covering cuboid by
+    updated_at TEXT NOT NULL
+)
+"""]
+CUBOIDS_QUERY = "SELECT cuboid, row_count FROM kpi_cube_cuboids"
+CUBE_EXISTS_QUERY = "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = 'kpi_cube_cuboids'"
+
+def segment(columns=SEGMENT_DIMENSIONS):
+    """
+    The segment columns of customers `c`, NULL (or no matching customer) as UNKNOWN_SEGMENT.
+    Columns customers lacks (sql/schema.sql has no plan or channel) are UNKNOWN_SEGMENT throughout.
+    """
+    return ", ".join(f"COALESCE(c.{column}, '{UNKNOWN_SEGMENT}') as {column}" if column in columns
+                     else f"'{UNKNOWN_SEGMENT}' as {column}" for column in SEGMENT_DIMENSIONS)
+
+# One aggregate per fact table over the refreshed weeks, keyed by week and the customer's segment
+# ({segment}). Params: {first_week, last_week}.
+CUBE_FACT_SQL = {
+    "revenue": """
+        SELECT r.week_id, {segment}, SUM(r.MRR) as mrr
+        FROM revenue r
+        LEFT JOIN customers c ON c.customer_id = r.customer_id
+        WHERE r.week_id BETWEEN :first_week AND :last_week
+        GROUP BY 1, 2, 3, 4
+    """,
+    "signups": """
+        SELECT c.signup_week_id as week_id, {segment}, COUNT(DISTINCT c.customer_id) as new_signups
+        FROM customers c
+        WHERE c.signup_week_id BETWEEN :first_week AND :last_week
+        GROUP BY 1, 2, 3, 4
+    """,
+    "churn": """
+        SELECT week_id, plan, marketing_channel, country,
+               churned_this_week as churned_customers, active_at_start_of_week
+        FROM kpi_customer_churn
+        WHERE week_id BETWEEN :first_week AND :last_week
+    """,
+    "subscription_changes": """
+        SELECT
+            sc.week_id,
+            {segment},
+            SUM(CASE WHEN sc.event_type = 'trial_conversion' THEN sc.mrr_change ELSE 0 END) as new_mrr,
+            SUM(CASE WHEN sc.event_type = 'upgrade' THEN sc.mrr_change ELSE 0 END) as expansion_mrr,
+            SUM(CASE WHEN sc.event_type = 'downgrade' THEN sc.mrr_change ELSE 0 END) as contraction_mrr,
+            SUM(CASE WHEN sc.event_type = 'cancellation_processed' AND sc.mrr_change < 0 THEN sc.mrr_change ELSE 0 END) as churned_mrr
+        FROM subscription_changes sc
+        LEFT JOIN customers c ON c.customer_id = sc.customer_id
+        WHERE sc.week_id BETWEEN :first_week AND :last_week
+        GROUP BY 1, 2, 3, 4
+    """,
+    "product_usage": """
+        SELECT pu.week_id, {segment}, SUM(pu.sessions) as sessions
+        FROM product_usage pu
+        LEFT JOIN customers c ON c.customer_id = pu.customer_id
+        WHERE pu.week_id BETWEEN :first_week AND :last_week
+        GROUP BY 1, 2, 3, 4
+    """,
+}
+CUBE_FACT_QUERIES = {fact: query.format(segment=segment()) for fact, query in CUBE_FACT_SQL.items()}
+
+def fact_queries(conn):
+    """CUBE_FACT_QUERIES for the segment columns this database's customers table has."""
+    columns = table_columns(conn, "customers")
+    return {fact: query.format(segment=segment(columns)) for fact, query in CUBE_FACT_SQL.items()}
+
+CUBE_FACT_TABLES = {
+    "revenue": {"revenue", "customers"},
+    "signups": {"customers"},
+    "churn": {"kpi_customer_churn"},
+    "subscription_changes": {"subscription_changes", "customers"},
+    "product_usage": {"product_usage", "customers"},
+}
+CUBE_MARKETING_QUERY = """
+SELECT week_id, channel as marketing_channel, SUM(ad_spend) as ad_spend
+FROM marketing
+WHERE week_id BETWEEN :first_week AND :last_week
+GROUP BY 1, 2
+"""
+CUBE_WEEKS_QUERY = """
+SELECT week_id, MIN(week_start_date) as week_start_date
+FROM calendar
+WHERE week_id BETWEEN :first_week AND :last_week
+GROUP BY week_id
+"""
+
+# --- Cuboids ---
+def cuboid_name(dimensions):
+    return ",".join(["week"] + [dimension for dimension in SEGMENT_DIMENSIONS if dimension in dimensions])
+
+def cuboid_dimensions(name):
+    return set(name.split(","))
+
+def all_cuboids():
+    """Every subset of the segment dimensions, each with the week: the base cuboid first."""
+    return [cuboid_name(dimensions) for size in range(len(SEGMENT_DIMENSIONS), -1, -1)
+            for dimensions in combinations(SEGMENT_DIMENSIONS, size)]
+
+def has_measure(cuboid, measure):
+    return cuboid_dimensions(cuboid) <= MEASURE_DIMENSIONS.get(measure, set(DIMENSIONS))
+
+# --- Build ---
+def base_cells(conn, params, tables):
+    """Measures per (week, plan, channel, country) from the aggregate of each loaded fact table; missing facts are 0."""
+    keys = ["week_id"] + SEGMENT_DIMENSIONS
+    measures = [measure for measure in MEASURES if measure != "ad_spend"]
+    facts = [pd.read_sql_query(query, conn, params=params)
+             for fact, query in fact_queries(conn).items() if CUBE_FACT_TABLES[fact] <= tables]
+    facts = [fact for fact in facts if not fact.empty]
+    if not facts:
+        return pd.DataFrame(columns=keys + measures)
+    cells = pd.concat(facts, ignore_index=True).reindex(columns=keys + measures)
+    return cells.fillna({measure: 0 for measure in measures}).groupby(keys, as_index=False).sum()
+
+def build_cube(conn, first_week_id, last_week_id):
+    """The rows of every cuboid for the weeks first_week_id .. last_week_id, as one DataFrame in kpi_cube's column order."""
+    tables = existing_tables(conn)
+    params = {"first_week": first_week_id, "last_week": last_week_id}
+    weeks = pd.read_sql_query(CUBE_WEEKS_QUERY, conn, params=params)
+    cells = base_cells(conn, params, tables)
+    spend = (pd.read_sql_query(CUBE_MARKETING_QUERY, conn, params=params) if "marketing" in tables
+             else pd.DataFrame(columns=["week_id", "marketing_channel", "ad_spend"]))
+
+    cuboids = []
+    for cuboid in all_cuboids():
+        keys = ["week_id"] + [dimension for dimension in SEGMENT_DIMENSIONS if dimension in cuboid_dimensions(cuboid)]
+        rows = cells.drop(columns=[d for d in SEGMENT_DIMENSIONS if d not in keys]).groupby(keys, as_index=False).sum()
+        if has_measure(cuboid, "ad_spend"):
+            rows = rows.merge(spend.groupby(keys, as_index=False)["ad_spend"].sum(), on=keys, how="outer")
+            rows = rows.fillna({measure: 0 for measure in MEASURES})
+        rows = rows.merge(weeks, on="week_id")  # Calendar weeks only
+        rows.insert(0, "cuboid", cuboid)
+        cuboids.append(rows)
+    cube = pd.concat(cuboids, ignore_index=True)
+    return cube.reindex(columns=["cuboid", "week_id", "week_start_date"] + SEGMENT_DIMENSIONS + MEASURES)
+
+def refresh_cube(conn, first_week_id=None, last_week_id=None):
+    """
+    Rewrites the kpi_cube rows of the weeks first_week_id .. last_week_id (every calendar week if
+    None, or if the table is still empty) in the caller's transaction, after kpi_customer_churn
+    was refreshed. Every cuboid is keyed by week, so the other weeks stay valid.
+    Returns the number of rows written.
+    """
+    if "calendar" not in existing_tables(conn):
+        return 0  # Not loaded (e.g. a partial CSV load)
+    for statement in CUBE_SQL:
+        conn.execute(statement)
+    if first_week_id is None or not conn.execute("SELECT 1 FROM kpi_cube LIMIT 1").fetchone():
+        first_week_id, last_week_id = conn.execute("SELECT MIN(week_id), MAX(week_id) FROM calendar").fetchone()
+        if first_week_id is None:
+            return 0
+    cube = build_cube(conn, first_week_id, last_week_id)
+
+    conn.execute("DELETE FROM kpi_cube WHERE week_id BETWEEN ? AND ?", (first_week_id, last_week_id))
+    columns = list(cube.columns)
+    values = [cube[column].astype(object).where(cube[column].notna(), None).tolist() for column in columns]
+    conn.executemany(f"INSERT INTO kpi_cube ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                     zip(*values))
+    updated_at = datetime.now().isoformat(timespec='seconds')
+    conn.execute("DELETE FROM kpi_cube_cuboids")
+    conn.execute("INSERT INTO kpi_cube_cuboids (cuboid, row_count, updated_at) "
+                 "SELECT cuboid, COUNT(*), ? FROM kpi_cube GROUP BY cuboid", (updated_at,))
+    return len(cube)
+
+# --- Slice API ---
+def choose_cuboid(cuboids, dimensions, measures):
+    """
+    The smallest cuboid of `cuboids` ({name: row_count}) that has every dimension grouped or
+    filtered on and carries every measure. Raises ValueError if none does.
+    """
+    dimensions = set(dimensions) | {"week"}
+    covering = [(rows, name) for name, rows in cuboids.items()
+                if dimensions <= cuboid_dimensions(name) and all(has_measure(name, measure) for measure in measures)]
+    if not covering:
+        raise ValueError(f"No cuboid covers {sorted(dimensions)} with {', '.join(measures)}; "
+                         f"ad_spend is only broken down by week and marketing_channel.")
+    return min(covering)[1]
+
+def slice_query(cuboids, group_by, measures, filters=None, start_date=None, end_date=None):
+    """
+    SQL and params for the measures grouped by `group_by` (dimensions, 'week' included if wanted),
+    restricted to `filters` ({dimension: value}) and the weeks starting in [start_date, end_date]
+    (YYYY-MM-DD strings, both optional). Reads the smallest covering cuboid only.
+    """
+    filters = {dimension: value for dimension, value in (filters or {}).items() if value is not None}
+    unknown = (set(group_by) | set(filters)) - set(DIMENSIONS) or set(measures) - set(MEASURES)
+    if unknown:
+        raise ValueError(f"Unknown dimension or measure: {', '.join(sorted(unknown))}")
+    cuboid = choose_cuboid(cuboids, set(group_by) | set(filters), measures)
+
+    columns = ["week_start_date" if dimension == "week" else dimension for dimension in DIMENSIONS if dimension in group_by]
+    where = ["cuboid = :cuboid"]
+    params = {"cuboid": cuboid}
+    if start_date is not None:
+        where.append("week_start_date >= :start_date")
+        params["start_date"] = start_date
+    if end_date is not None:
+        where.append("week_start_date <= :end_date")
+        params["end_date"] = end_date
+    for dimension, value in filters.items():
+        where.append(f"{dimension} = :{dimension}")
+        params[dimension] = value
+    select = columns + [f"SUM({measure}) as {measure}" for measure in measures]
+    group = f"\nGROUP BY {', '.join(columns)}\nORDER BY {', '.join(columns)}" if columns else ""
+    return f"SELECT {', '.join(select)}\nFROM kpi_cube\nWHERE {' AND '.join(where)}{group}", params
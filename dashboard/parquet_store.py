@@ -0,0 +1,219 @@
+# Columnar storage tier for the raw analytics tables:
+#   data/parquet/<table>/year=YYYY/month=M/part-0.parquet
+# Dates are stored as date32 and the low-cardinality text columns as dictionaries, so readers do
+# not re-parse text. Reads filtered on a date range skip the other year/month directories and,
+# within a month, the row groups whose date statistics fall outside the range.
+import hashlib
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PARQUET_DIR = os.path.join(PROJECT_ROOT, "data", "parquet")
+
+# Date column each table is partitioned and range-filtered on.
+PARTITION_COLUMNS = {
+    "calendar": "week_start_date",
+    "customers": "signup_date",
+    "marketing": "week_start",
+    "revenue": "week_start",
+    "product_usage": "week_start",
+    "subscription_changes": "event_date",
+    "support_tickets": "creation_date",
+}
+DATE_COLUMNS = {"week_start_date", "week_end_date", "signup_date", "churn_date", "week_start", "event_date",
+                "creation_date", "resolution_date"}
+DICTIONARY_COLUMNS = {"plan", "marketing_channel", "country", "event_type"}
+
+PARTITION_FIELDS = ("year", "month")
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+ROW_GROUP_ROWS = 16_384  # Rows are sorted by date, so each row group covers a few days of a month
+SOURCE_COLUMNS_KEY = b"source_columns"  # Schema metadata: the table's own columns, in order
+
+# --- Helper Functions ---
+def table_dir(table_name, root=PARQUET_DIR):
+    return os.path.join(root, table_name)
+
+def has_table(table_name, root=PARQUET_DIR):
+    return os.path.isdir(table_dir(table_name, root))
+
+def to_date32(column):
+    """Casts a text (YYYY-MM-DD), timestamp or date column to date32."""
+    if pa.types.is_date32(column.type):
+        return column
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        column = pc.strptime(column, format="%Y-%m-%d", unit="s")
+    return pc.cast(column, pa.date32())
+
+def to_arrow(frame, table_name):
+    """
+    Arrow table for a DataFrame: date columns as date32, dictionary columns dictionary-encoded,
+    plus the year/month partition fields taken from the table's partition column.
+    """
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    for index, name in enumerate(table.column_names):
+        if name in DATE_COLUMNS:
+            table = table.set_column(index, name, to_date32(table.column(name)))
+        elif name in DICTIONARY_COLUMNS:
+            table = table.set_column(index, name, pc.dictionary_encode(table.column(name)))
+    source_columns = ",".join(table.column_names).encode()
+
+    partition_dates = table.column(PARTITION_COLUMNS[table_name])
+    partitions = {"year": pc.cast(pc.year(partition_dates), pa.int16()),
+                  "month": pc.cast(pc.month(partition_dates), pa.int8())}
+    for field, values in partitions.items():
+        if field in table.column_names:  # calendar carries its own year/month, derived from the same date
+            table = table.drop_columns([field])
+        table = table.append_column(field, values)
+    table = table.sort_by(PARTITION_COLUMNS[table_name])
+    return table.replace_schema_metadata({SOURCE_COLUMNS_KEY: source_columns})
+
+def write_table(frame, table_name, root=PARQUET_DIR):
+    """Replaces the Parquet copy of a table with the rows of `frame`."""
+    path = table_dir(table_name, root)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    ds.write_dataset(
+        to_arrow(frame, table_name), path, format="parquet", partitioning=PARTITIONING,
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=ROW_GROUP_ROWS,
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+
+def append_batch(frame, table_name, batch_index, schema=None, root=PARQUET_DIR):
+    """
+    Writes one batch of a table produced batch by batch as its own files (part-<batch>-<n>.parquet)
+    in the partition directories; batch 0 replaces the table. Later batches are cast to the schema
+    returned for batch 0, so a column that is all-null in one batch keeps its type. Small batches
+    leave many small files: call compact_table once the last batch is written.
+    """
+    path = table_dir(table_name, root)
+    if batch_index == 0 and os.path.isdir(path):
+        shutil.rmtree(path)
+    table = to_arrow(frame, table_name)
+    if schema is not None:
+        table = table.cast(schema)
+    ds.write_dataset(
+        table, path, format="parquet", partitioning=PARTITIONING,
+        basename_template=f"part-{batch_index}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=ROW_GROUP_ROWS,
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+    return table.schema
+
+def compact_table(table_name, root=PARQUET_DIR):
+    """
+    Rewrites every partition directory holding more than one file (appended batches) as sorted
+    part-<n>.parquet files with full ROW_GROUP_ROWS row groups, one partition in memory at a time.
+    Returns (files before, files after).
+    """
+    before = after = 0
+    for folder, _, names in os.walk(table_dir(table_name, root)):
+        files = sorted(name for name in names if name.endswith(".parquet"))
+        before += len(files)
+        if len(files) <= 1:
+            after += len(files)
+            continue
+        partition = ds.dataset([os.path.join(folder, name) for name in files], format="parquet")
+        table = partition.to_table().sort_by(PARTITION_COLUMNS[table_name])
+        compacted = os.path.join(folder, ".compacted")  # Hidden: dataset readers skip it
+        shutil.rmtree(compacted, ignore_errors=True)  # Left over by an interrupted compaction
+        ds.write_dataset(
+            table.replace_schema_metadata(partition.schema.metadata), compacted, format="parquet",
+            basename_template="part-{i}.parquet",
+            max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=ROW_GROUP_ROWS,
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+        for name in files:
+            os.remove(os.path.join(folder, name))
+        for name in os.listdir(compacted):
+            os.replace(os.path.join(compacted, name), os.path.join(folder, name))
+            after += 1
+        os.rmdir(compacted)
+    return before, after
+
+def open_dataset(table_name, root=PARQUET_DIR):
+    return ds.dataset(table_dir(table_name, root), format="parquet", partitioning=PARTITIONING)
+
+def source_columns(dataset):
+    """The table's own columns (the year/month partition fields only where the table has them)."""
+    metadata = dataset.schema.metadata or {}
+    if SOURCE_COLUMNS_KEY in metadata:
+        return metadata[SOURCE_COLUMNS_KEY].decode().split(",")
+    return [name for name in dataset.schema.names if name not in PARTITION_FIELDS]
+
+def combine(left, right):
+    return right if left is None else left if right is None else left & right
+
+def partition_filter(start_date=None, end_date=None):
+    """Year/month terms for [start_date, end_date]: decide which partition directories are read."""
+    year, month = ds.field("year"), ds.field("month")
+    expression = None
+    if start_date is not None:
+        expression = (year > start_date.year) | ((year == start_date.year) & (month >= start_date.month))
+    if end_date is not None:
+        expression = combine(expression, (year < end_date.year) | ((year == end_date.year) & (month <= end_date.month)))
+    return expression
+
+def row_filter(table_name, start_date=None, end_date=None):
+    """Date terms for [start_date, end_date]: prune row groups by their statistics, then rows."""
+    column = ds.field(PARTITION_COLUMNS[table_name])
+    expression = None
+    if start_date is not None:
+        expression = column >= pa.scalar(start_date, pa.date32())
+    if end_date is not None:
+        expression = combine(expression, column <= pa.scalar(end_date, pa.date32()))
+    return expression
+
+def date_range_filter(table_name, start_date=None, end_date=None):
+    """Filter for rows whose partition date lies in [start_date, end_date] (dates, either bound optional)."""
+    return combine(partition_filter(start_date, end_date), row_filter(table_name, start_date, end_date))
+
+# --- Reading ---
+def read_table(table_name, start_date=None, end_date=None, columns=None, root=PARQUET_DIR):
+    """Reads a table (or the rows in a date range) into a DataFrame; dictionary columns come back as categoricals."""
+    dataset = open_dataset(table_name, root)
+    return dataset.to_table(
+        columns=columns or source_columns(dataset),
+        filter=date_range_filter(table_name, start_date, end_date),
+    ).to_pandas()
+
+def iter_batches(table_name, batch_rows, start_date=None, end_date=None, root=PARQUET_DIR):
+    """Streams a table (or a date range of it) as DataFrames of at most batch_rows rows."""
+    dataset = open_dataset(table_name, root)
+    for batch in dataset.to_batches(columns=source_columns(dataset), batch_size=batch_rows,
+                                    filter=date_range_filter(table_name, start_date, end_date)):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def scanned_row_groups(table_name, start_date=None, end_date=None, root=PARQUET_DIR):
+    """(row groups a range read touches, total row groups), after partition and statistics pruning."""
+    dataset = open_dataset(table_name, root)
+    rows = row_filter(table_name, start_date, end_date)
+    total = sum(fragment.num_row_groups for fragment in dataset.get_fragments())
+    touched = 0
+    for fragment in dataset.get_fragments(filter=partition_filter(start_date, end_date)):
+        touched += len(fragment.split_by_row_group(filter=rows)) if rows is not None else fragment.num_row_groups
+    return touched, total
+
+def table_version(table_name, root=PARQUET_DIR):
+    """
+    Version of a table's files for cache keys, the Parquet counterpart of the databases' data
+    version: a digest of the path, size and mtime of every file, so any rewrite (generation,
+    compaction) changes it.
+    """
+    path = table_dir(table_name, root)
+    digest = hashlib.sha256()
+    for folder, _, names in sorted(os.walk(path)):
+        for name in sorted(names):
+            stat = os.stat(os.path.join(folder, name))
+            digest.update(f"{os.path.relpath(os.path.join(folder, name), path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+def table_size(table_name, root=PARQUET_DIR):
+    """Bytes on disk of all files of a table."""
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(table_dir(table_name, root)) for name in names)
@@ -0,0 +1,190 @@
+# SQL used by the dashboard. Kept in one module so scripts (benchmarks, the query plan audit in
+# scripts/migrations.py) can run exactly the statements the dashboard runs.
+
+# Per-table row counts and date bounds maintained by the loaders (dashboard/dataset_stats.py).
+# Databases built before the table existed fall back to the range queries below. SELECT *: the
+# stale column (rows changed since they were computed) is missing from tables written before it.
+DATASET_STATS_EXISTS_QUERY = "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = 'dataset_stats'"
+DATASET_STATS_QUERY = "SELECT * FROM dataset_stats"
+
+# Bounds for the global date filter.
+SUBSCRIPTION_DATE_RANGE_QUERY = "SELECT MIN(start_date) as min_s, MAX(COALESCE(end_date, DATE('now'))) as max_s FROM subscriptions"
+CAMPAIGN_DATE_RANGE_QUERY = "SELECT MIN(start_date) as min_c, MAX(end_date) as max_c FROM marketing_campaigns"
+
+# Subscription periods overlapping [start_date, end_date], with the previous plan of the same
+# customer. Params: (end_date, start_date). The LAG runs before the range filter so periods
+# that start inside the range still see a predecessor that ended before it.
+SUBSCRIPTION_PERIODS_QUERY = """
+SELECT customer_id, price_monthly, start_date, end_date, status, prev_plan_id, prev_plan_price
+FROM (
+    SELECT
+        s.customer_id,
+        p.price_monthly,
+        s.start_date,
+        s.end_date,
+        s.status,
+        LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_id,
+        LAG(p.price_monthly, 1, 0) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_price
+    FROM subscriptions s
+    JOIN plans p ON s.plan_id = p.id
+)
+WHERE start_date <= DATE(?) -- end_date
+  AND (end_date IS NULL OR end_date >= DATE(?)) -- start_date
+"""
+
+# MRR and MRR movements per day/week/month bucket, aggregated in SQLite so only one row per bucket
+# reaches pandas. Each period adds its price on its start day and removes it on its end day (when
+# start < end); MRR at a bucket is the running total up to the bucket's last day, with everything
+# before :start_date folded into the first bucket. Movements only count days inside the range.
+# Buckets end on the day itself, on Sunday (like pandas 'W') or at month end, clipped to
+# :end_date; buckets without events are filled in by kpi_engine.fill_buckets.
+# Params: {"start_date": ..., "end_date": ...}.
+MRR_BUCKETS_SQL = """
+WITH periods AS (
+    SELECT
+        p.price_monthly AS price,
+        s.start_date,
+        s.end_date,
+        s.status,
+        LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) AS prev_plan_id,
+        LAG(p.price_monthly, 1, 0) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) AS prev_price
+    FROM subscriptions s
+    JOIN plans p ON s.plan_id = p.id
+),
+deltas AS (
+    SELECT
+        start_date AS day,
+        CASE WHEN end_date IS NULL OR start_date < end_date THEN price ELSE 0 END AS mrr_delta,
+        CASE WHEN prev_plan_id IS NULL THEN price ELSE 0 END AS new_mrr,
+        0 AS churned_mrr,
+        CASE WHEN prev_plan_id IS NOT NULL AND price > prev_price THEN price - prev_price ELSE 0 END AS expansion_mrr,
+        CASE WHEN prev_plan_id IS NOT NULL AND price < prev_price THEN prev_price - price ELSE 0 END AS contraction_mrr
+    FROM periods
+    WHERE start_date <= DATE(:end_date)
+    UNION ALL
+    SELECT
+        end_date,
+        CASE WHEN start_date < end_date THEN -price ELSE 0 END,
+        0,
+        CASE WHEN status = 'canceled' THEN price ELSE 0 END,
+        0,
+        0
+    FROM periods
+    WHERE end_date <= DATE(:end_date)
+),
+bucketed AS (
+    SELECT
+        MIN({bucket_end}, DATE(:end_date)) AS bucket,
+        mrr_delta,
+        day >= DATE(:start_date) AS in_range,
+        new_mrr, churned_mrr, expansion_mrr, contraction_mrr
+    FROM (SELECT *, MAX(day, DATE(:start_date)) AS bucket_day FROM deltas)
+)
+SELECT
+    bucket AS date,
+    SUM(SUM(mrr_delta)) OVER (ORDER BY bucket) AS mrr,
+    SUM(CASE WHEN in_range THEN new_mrr ELSE 0 END) AS new_mrr,
+    SUM(CASE WHEN in_range THEN churned_mrr ELSE 0 END) AS churned_mrr,
+    SUM(CASE WHEN in_range THEN expansion_mrr ELSE 0 END) AS expansion_mrr,
+    SUM(CASE WHEN in_range THEN contraction_mrr ELSE 0 END) AS contraction_mrr
+FROM bucketed
+GROUP BY bucket
+ORDER BY bucket
+"""
+MRR_BUCKET_QUERIES = {
+    'D': MRR_BUCKETS_SQL.replace("{bucket_end}", "bucket_day"),
+    'W': MRR_BUCKETS_SQL.replace("{bucket_end}", "DATE(bucket_day, 'weekday 0')"),
+    'M': MRR_BUCKETS_SQL.replace("{bucket_end}", "DATE(bucket_day, 'start of month', '+1 month', '-1 day')"),
+}
+
+# Active subscription periods overlapping [start_date, end_date]. Params: (end_date, start_date).
+ACTIVE_PERIODS_QUERY = """
+SELECT customer_id, start_date, end_date
+FROM subscriptions
+WHERE status = 'active'
+  AND start_date <= DATE(?) -- end_date
+  AND (end_date IS NULL OR end_date > DATE(?)) -- start_date
+"""
+
+# Subscription periods starting or ending in [start_date, end_date], with names for the event log.
+# Params: (start_date, end_date, start_date, end_date).
+SUBSCRIPTION_EVENTS_QUERY = """
+SELECT
+    s.id,
+    s.customer_id,
+    c.name as customer_name,
+    s.plan_id,
+    p.name as plan_name,
+    p.price_monthly,
+    s.start_date,
+    s.end_date,
+    s.status,
+    LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_id,
+    (SELECT name from plans where id = prev_plan_id) as prev_plan_name,
+    LAG(p.price_monthly, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_price
+FROM subscriptions s
+JOIN plans p ON s.plan_id = p.id
+JOIN customers c ON s.customer_id = c.id
+WHERE s.start_date BETWEEN DATE(?) AND DATE(?) OR s.end_date BETWEEN DATE(?) AND DATE(?)
+ORDER BY s.start_date
+"""
+
+# Materialized weekly KPIs (analytics database). Params: (start_date, end_date).
+WEEKLY_KPIS_QUERY = """
+SELECT *
+FROM kpi_weekly
+WHERE week_start_date BETWEEN DATE(?) AND DATE(?)
+ORDER BY week_start_date
+"""
+
+# Weekly customer churn per (plan, marketing_channel, country) segment, materialized by
+# scripts/churn_rate.py. Every segment has a row in every week, so the first week lists them all.
+CUSTOMER_CHURN_EXISTS_QUERY = "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = 'kpi_customer_churn'"
+CHURN_SEGMENTS_QUERY = """
+SELECT plan, marketing_channel, country
+FROM kpi_customer_churn
+WHERE week_id = (SELECT MIN(week_id) FROM kpi_customer_churn)
+"""
+# Churn rate of the customers in a slice: NULL for a segment column means all of its values.
+# Params: {start_date, end_date, plan, marketing_channel, country}.
+SEGMENT_CHURN_QUERY = """
+SELECT
+    week_start_date,
+    SUM(active_at_start_of_week) as active_at_start_of_week,
+    SUM(churned_this_week) as churned_this_week,
+    CASE
+        WHEN SUM(active_at_start_of_week) > 0
+        THEN (CAST(SUM(churned_this_week) AS REAL) / SUM(active_at_start_of_week)) * 100
+        ELSE 0
+    END as customer_churn_rate_pct
+FROM kpi_customer_churn
+WHERE week_start_date BETWEEN DATE(:start_date) AND DATE(:end_date)
+  AND (:plan IS NULL OR plan = :plan)
+  AND (:marketing_channel IS NULL OR marketing_channel = :marketing_channel)
+  AND (:country IS NULL OR country = :country)
+GROUP BY week_start_date
+ORDER BY week_start_date
+"""
+
+# Campaigns active within the range with acquired customers and initial MRR. Params: (end_date, start_date).
+MARKETING_CAMPAIGN_SUMMARY_QUERY = """
+SELECT
+    mc.id,
+    mc.name,
+    mc.start_date,
+    mc.end_date,
+    mc.budget,
+    mc.channel,
+    COUNT(DISTINCT c.id) as acquired_customers_during_campaign,
+    SUM(CASE WHEN s.start_date >= mc.start_date AND (s.end_date IS NULL OR s.end_date >= mc.start_date) THEN p.price_monthly ELSE 0 END) as initial_mrr_from_acquired
+FROM marketing_campaigns mc
+LEFT JOIN customers c ON mc.id = c.marketing_campaign_id
+    AND c.registration_date BETWEEN mc.start_date AND mc.end_date -- Customer registered during campaign
+LEFT JOIN subscriptions s ON c.id = s.customer_id
+    AND s.start_date >= mc.start_date -- Subscription started during or after campaign start
+    AND (s.prev_plan_id IS NULL) -- Count only initial subscription for this MRR
+LEFT JOIN plans p ON s.plan_id = p.id
+WHERE mc.start_date <= DATE(?) AND mc.end_date >= DATE(?) -- Campaigns active within the filter range
+GROUP BY mc.id, mc.name, mc.start_date, mc.end_date, mc.budget, mc.channel
+ORDER BY mc.start_date
+"""
@@ -0,0 +1,92 @@
+# In-process LRU cache for dashboard query results. Keys carry the database's data version
+# (data_version.py), so an entry stays valid until the next load or KPI refresh rather than for a
+# fixed TTL. The cache is bounded by entry count and by the memory of the cached DataFrames.
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 256
+MAX_BYTES = 256 * 1024 * 1024
+
+def new_cache(max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """An empty cache: entries in LRU order (oldest first), bounds and hit/miss counters."""
+    return {
+        "entries": OrderedDict(),  # key -> (DataFrame, bytes)
+        "versions": {},            # db_path -> data version last seen
+        "lock": threading.Lock(),  # Streamlit serves each session on its own thread
+        "max_entries": max_entries,
+        "max_bytes": max_bytes,
+        "bytes": 0,
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "invalidations": 0,
+    }
+
+def cache_key(db_path, version, query, params=None):
+    """Hashable key for a query result; params may be a list, tuple or dict."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif params is not None:
+        params = tuple(params)
+    return db_path, version, query, params
+
+def drop_entry(cache, key):
+    _, size = cache["entries"].pop(key)
+    cache["bytes"] -= size
+
+def observe_version(cache, db_path, version):
+    """Drops the entries of older versions of a database as soon as a new version is seen."""
+    if cache["versions"].get(db_path, version) != version:
+        stale = [key for key in cache["entries"] if key[0] == db_path and key[1] != version]
+        for key in stale:
+            drop_entry(cache, key)
+        cache["invalidations"] += len(stale)
+    cache["versions"][db_path] = version
+
+def cache_get(cache, key):
+    """A copy of the cached DataFrame (callers may modify it), or None on a miss."""
+    with cache["lock"]:
+        observe_version(cache, key[0], key[1])
+        entry = cache["entries"].get(key)
+        if entry is None:
+            cache["misses"] += 1
+            return None
+        cache["entries"].move_to_end(key)
+        cache["hits"] += 1
+        return entry[0].copy()
+
+def cache_put(cache, key, frame):
+    """Stores a copy of a DataFrame, evicting least recently used entries to stay within the bounds."""
+    size = int(frame.memory_usage(index=True, deep=True).sum())
+    if size > cache["max_bytes"]:
+        return  # Larger than the whole cache; not worth evicting everything for
+    with cache["lock"]:
+        if key in cache["entries"]:
+            drop_entry(cache, key)
+        cache["entries"][key] = (frame.copy(), size)
+        cache["bytes"] += size
+        while len(cache["entries"]) > cache["max_entries"] or cache["bytes"] > cache["max_bytes"]:
+            drop_entry(cache, next(iter(cache["entries"])))
+            cache["evictions"] += 1
+
+def clear_cache(cache):
+    with cache["lock"]:
+        cache["entries"].clear()
+        cache["bytes"] = 0
+
+def cache_stats(cache):
+    """Counters and sizes for the sidebar debug panel."""
+    with cache["lock"]:
+        lookups = cache["hits"] + cache["misses"]
+        return {
+            "entries": len(cache["entries"]),
+            "max_entries": cache["max_entries"],
+            "megabytes": cache["bytes"] / 1024 / 1024,
+            "max_megabytes": cache["max_bytes"] / 1024 / 1024,
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+            "hit_rate": cache["hits"] / lookups if lookups else 0.0,
+            "evictions": cache["evictions"],
+            "invalidations": cache["invalidations"],
+            "versions": dict(cache["versions"]),
+        }
@@ -0,0 +1,217 @@
+# Columnar in-memory snapshot of the dashboard database for the opt-in in-memory mode.
+# subscriptions, plans, customers and marketing_campaigns are read once per data version into
+# typed NumPy columns: int32 day numbers, small integer plan positions, categorical codes for the
+# text columns. The KPI functions below answer each date range with vectorized filters over them
+# and return the same frames as the SQL-backed functions in app.py.
+import time
+
+import numpy as np
+import pandas as pd
+
+from kpi_engine import (
+    OPEN_END_DAY, active_customer_counts, classify_subscription_events, day_number, days_to_datetimes,
+    mrr_movement_buckets
+)
+
+MISSING_DAY = np.iinfo(np.int32).min  # NULL end of a campaign: never inside or after a range
+MISSING = -1  # Position of a NULL plan, customer or campaign reference
+
+def day_column(column, fill):
+    """SQLite expression turning a 'YYYY-MM-DD' column into a day number (days since 1970-01-01)."""
+    return f"COALESCE(CAST(JULIANDAY({column}) - 2440587.5 AS INTEGER), {fill}) AS {column}"
+
+def categorical(values):
+    """(int32 codes, categories) of a text column."""
+    values = pd.Categorical(values)
+    return values.codes.astype(np.int32), np.asarray(values.categories, dtype=object)
+
+def positions(sorted_ids, ids):
+    """Row positions of `ids` in `sorted_ids`, MISSING (-1) for NULL or unknown ids."""
+    ids = pd.Series(ids).fillna(-1).to_numpy(dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), MISSING, dtype=np.int32)
+    found = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[found] == ids, found, MISSING).astype(np.int32)
+
+def lag_plans(customer_ids, plans):
+    """LAG(plan) over each customer's periods, for rows sorted by (customer, start); MISSING for a first period."""
+    lagged = np.full(len(plans), MISSING, dtype=np.int16)
+    lagged[1:] = plans[:-1]
+    first_period = np.ones(len(plans), dtype=bool)
+    first_period[1:] = customer_ids[1:] != customer_ids[:-1]
+    lagged[first_period] = MISSING
+    return lagged
+
+def load_snapshot(conn):
+    """Reads the four dashboard tables into typed columns. Returns the snapshot dict."""
+    started = time.perf_counter()
+    plans = pd.read_sql_query("SELECT id, name, price_monthly FROM plans ORDER BY id", conn)
+    subs = pd.read_sql_query(
+        f"SELECT customer_id, plan_id, prev_plan_id, status, {day_column('start_date', 'NULL')}, "
+        f"{day_column('end_date', OPEN_END_DAY)} FROM subscriptions ORDER BY customer_id, start_date, id", conn)
+    customers = pd.read_sql_query(
+        f"SELECT id, name, {day_column('registration_date', 'NULL')}, marketing_campaign_id FROM customers ORDER BY id", conn)
+    campaigns = pd.read_sql_query(
+        f"SELECT id, name, {day_column('start_date', 'NULL')}, {day_column('end_date', MISSING_DAY)}, budget, channel "
+        "FROM marketing_campaigns ORDER BY start_date, id", conn)
+
+    plan_ids = plans['id'].to_numpy(dtype=np.int64)
+    customer_ids = subs['customer_id'].to_numpy(dtype=np.int32)
+    plan = positions(plan_ids, subs['plan_id']).astype(np.int16)
+    status_codes, statuses = categorical(subs['status'])
+    name_codes, names = categorical(customers['name'])
+    channel_codes, channels = categorical(campaigns['channel'])
+    campaign_ids = campaigns['id'].to_numpy(dtype=np.int64)
+    campaign_order = np.argsort(campaign_ids, kind='stable')
+
+    snapshot = {
+        "plans": {
+            "id": plan_ids,
+            "name": plans['name'].to_numpy(dtype=object),
+            "price": plans['price_monthly'].to_numpy(dtype=np.float64),  # A handful of rows; exact prices
+        },
+        "subscriptions": {
+            "customer_id": customer_ids,
+            "customer": positions(customers['id'].to_numpy(dtype=np.int64), customer_ids),
+            "plan": plan,
+            "lag_plan": lag_plans(customer_ids, plan),  # LAG(plan_id) over the customer's periods
+            "prev_plan": positions(plan_ids, subs['prev_plan_id']).astype(np.int16),  # Stored prev_plan_id
+            "status": status_codes.astype(np.int8),
+            "start": subs['start_date'].to_numpy(dtype=np.int32),
+            "end": subs['end_date'].to_numpy(dtype=np.int32),
+        },
+        "statuses": statuses,
+        "customers": {
+            "name": name_codes,
+            "registration": customers['registration_date'].to_numpy(dtype=np.int32),
+            "campaign": positions(campaign_ids[campaign_order], customers['marketing_campaign_id']),
+        },
+        "customer_names": names,
+        "campaigns": {
+            "id": campaign_ids[campaign_order],
+            "name": campaigns['name'].to_numpy(dtype=object)[campaign_order],
+            "start": campaigns['start_date'].to_numpy(dtype=np.int32)[campaign_order],
+            "end": campaigns['end_date'].to_numpy(dtype=np.int32)[campaign_order],
+            "budget": campaigns['budget'].to_numpy(dtype=np.float64)[campaign_order],
+            "channel": channel_codes[campaign_order],
+        },
+        "channels": channels,
+    }
+    snapshot["load_seconds"] = time.perf_counter() - started
+    snapshot["bytes"] = snapshot_bytes(snapshot)
+    return snapshot
+
+def snapshot_bytes(snapshot):
+    """Memory held by the numeric columns and the category arrays."""
+    total = 0
+    for value in snapshot.values():
+        arrays = value.values() if isinstance(value, dict) else [value]
+        for array in arrays:
+            if isinstance(array, np.ndarray):
+                total += array.nbytes
+                if array.dtype == object:
+                    total += sum(len(str(item)) for item in array)
+    return total
+
+def status_is(snapshot, status):
+    """Mask of subscriptions with a given status."""
+    codes = np.flatnonzero(snapshot["statuses"] == status)
+    return snapshot["subscriptions"]["status"] == (codes[0] if len(codes) else -1)
+
+def subscription_prices(snapshot):
+    """(price, LAG price with 0 for a first period, has LAG plan) per subscription, as float64."""
+    subs, price = snapshot["subscriptions"], snapshot["plans"]["price"]
+    has_prev = subs["lag_plan"] != MISSING
+    return price[subs["plan"]], np.where(has_prev, price[subs["lag_plan"]], 0.0), has_prev
+
+# --- KPI Functions ---
+def snapshot_mrr(snapshot, start_date, end_date, freq='D'):
+    """calculate_mrr_and_movements on the snapshot: the event sweep over the periods overlapping the range."""
+    subs = snapshot["subscriptions"]
+    first, last = day_number(start_date), day_number(end_date)
+    overlapping = (subs["start"] <= last) & (subs["end"] >= first)
+    price, prev_price, has_prev = subscription_prices(snapshot)
+    return mrr_movement_buckets(
+        price[overlapping], prev_price[overlapping], has_prev[overlapping],
+        status_is(snapshot, 'canceled')[overlapping],
+        subs["start"][overlapping], subs["end"][overlapping],
+        start_date, end_date, freq,
+    )
+
+def snapshot_active(snapshot, start_date, end_date, freq='D'):
+    """calculate_active_subscriptions on the snapshot."""
+    subs = snapshot["subscriptions"]
+    first, last = day_number(start_date), day_number(end_date)
+    active = status_is(snapshot, 'active') & (subs["start"] <= last) & (subs["end"] > first)
+    return active_customer_counts(subs["customer_id"][active], subs["start"][active], subs["end"][active],
+                                  start_date, end_date, freq)
+
+def snapshot_events(snapshot, start_date, end_date):
+    """get_subscription_events on the snapshot: periods starting or ending in the range, classified."""
+    subs, plan_names = snapshot["subscriptions"], snapshot["plans"]["name"]
+    first, last = day_number(start_date), day_number(end_date)
+    selected = (((subs["start"] >= first) & (subs["start"] <= last))
+                | ((subs["end"] >= first) & (subs["end"] <= last)))
+    rows = np.flatnonzero(selected)
+    # The query's LAG runs after its WHERE: the previous plan among the selected periods only
+    lag_plan = lag_plans(subs["customer_id"][rows], subs["plan"][rows])
+    order = np.argsort(subs["start"][rows], kind='stable')  # ORDER BY start_date
+    rows, lag_plan = rows[order], lag_plan[order]
+
+    price, _, _ = subscription_prices(snapshot)
+    has_prev = lag_plan != MISSING
+    prev_price = np.where(has_prev, snapshot["plans"]["price"][lag_plan], np.nan)
+    end = subs["end"][rows]
+    open_end = end == OPEN_END_DAY
+    end_dates = days_to_datetimes(np.where(open_end, 0, end))
+    end_dates[open_end] = np.datetime64('NaT')
+    customer = subs["customer"][rows]
+    stored_prev = subs["prev_plan"][rows]  # The query names the stored prev_plan_id, not the LAG plan
+    frame = pd.DataFrame({
+        'customer_name': snapshot["customer_names"][snapshot["customers"]["name"][customer]],
+        'plan_name': plan_names[subs["plan"][rows]],
+        'price_monthly': price[rows],
+        'start_date': days_to_datetimes(subs["start"][rows]),
+        'end_date': end_dates,
+        'status': snapshot["statuses"][subs["status"][rows]],
+        'prev_plan_id': np.where(has_prev, snapshot["plans"]["id"][lag_plan], np.nan),
+        'prev_plan_name': np.where(stored_prev != MISSING, plan_names[stored_prev], None),
+        'prev_price': prev_price,
+    })
+    return classify_subscription_events(frame, start_date, end_date)
+
+def snapshot_campaign_summary(snapshot, start_date, end_date):
+    """
+    get_marketing_campaign_summary's query on the snapshot: campaigns active in the range, the
+    customers who registered during each, and the initial MRR of their first subscriptions.
+    """
+    campaigns, customers, subs = snapshot["campaigns"], snapshot["customers"], snapshot["subscriptions"]
+    first, last = day_number(start_date), day_number(end_date)
+    n_campaigns = len(campaigns["id"])
+
+    campaign = customers["campaign"]
+    has_campaign = campaign != MISSING
+    safe = np.where(has_campaign, campaign, 0)
+    acquired = has_campaign & (customers["registration"] >= campaigns["start"][safe]) \
+        & (customers["registration"] <= campaigns["end"][safe])
+    acquired_count = np.bincount(campaign[acquired], minlength=n_campaigns)
+
+    sub_campaign = np.where(subs["customer"] != MISSING, campaign[subs["customer"]], MISSING)
+    sub_acquired = (sub_campaign != MISSING) & acquired[subs["customer"]]
+    campaign_start = campaigns["start"][np.where(sub_acquired, sub_campaign, 0)]
+    initial = sub_acquired & (subs["prev_plan"] == MISSING) & (subs["start"] >= campaign_start) & (subs["end"] >= campaign_start)
+    price, _, _ = subscription_prices(snapshot)
+    initial_mrr = np.bincount(sub_campaign[initial], weights=price[initial], minlength=n_campaigns)
+
+    active = (campaigns["start"] <= last) & (campaigns["end"] >= first)
+    rows = np.flatnonzero(active)
+    return pd.DataFrame({
+        'id': campaigns["id"][rows],
+        'name': campaigns["name"][rows],
+        'start_date': days_to_datetimes(campaigns["start"][rows]),
+        'end_date': days_to_datetimes(campaigns["end"][rows]),
+        'budget': campaigns["budget"][rows],
+        'channel': snapshot["channels"][campaigns["channel"][rows]],
+        'acquired_customers_during_campaign': acquired_count[rows],
+        'initial_mrr_from_acquired': initial_mrr[rows],
+    })
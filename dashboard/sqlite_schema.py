@@ -0,0 +1,16 @@
+# Schema introspection and connection URIs shared by the dashboard modules and the scripts (which
+# put dashboard/ on sys.path).
+import os
+from urllib.request import pathname2url
+
+def read_only_uri(db_path):
+    """URI opening an existing database read-only; the absolute path is escaped, so '#' or '?' in it are kept."""
+    return f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+
+def existing_tables(conn):
+    """Names of the tables present in the database."""
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+def table_columns(conn, table):
+    """Column names of a table (empty if it does not exist)."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
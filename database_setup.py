@@ -1,27 +1,19 @@
 import sqlite3
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard"))
+from data_version import stamp_data_version
+from dataset_stats import refresh_dataset_stats
 
 DB_DIR = "data/sqlite"
 DB_NAME = "saas.db"
 DB_PATH = os.path.join(DB_DIR, DB_NAME)
 
-def create_database_schema():
-    """Creates the database schema for the SaaS Subscriptions Analytics project."""
-    os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+def create_tables(conn):
+    """Creates the tables on an open connection (the database file or an in-memory staging database)."""
     cursor = conn.cursor()
 
-    # Drop existing tables to ensure a fresh schema (idempotent)
-    tables_to_drop = [
-        'subscriptions', 
-        'customers', 
-        'marketing_campaigns', 
-        'plans'
-    ]
-    for table_name in tables_to_drop:
-        cursor.execute(f'DROP TABLE IF EXISTS {table_name};')
-    conn.commit()
-
     # Table: plans
     # Stores information about different subscription plans.
     cursor.execute('''
@@ -76,6 +68,28 @@ def create_database_schema():
     );
     ''')
 
+def create_database_schema():
+    """Creates the database schema for the SaaS Subscriptions Analytics project."""
+    os.makedirs(DB_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Drop existing tables to ensure a fresh schema (idempotent)
+    tables_to_drop = [
+        'subscriptions', 
+        'customers', 
+        'marketing_campaigns', 
+        'plans',
+        'schema_version' # Dropping the tables drops their indexes, so migrations must run again
+    ]
+    for table_name in tables_to_drop:
+        cursor.execute(f'DROP TABLE IF EXISTS {table_name};')
+    conn.commit()
+
+    create_tables(conn)
+    refresh_dataset_stats(conn, "dashboard")  # All counts 0: the dashboard asks for sample data
+    stamp_data_version(conn, "setup")  # The tables are empty now; results cached before are stale
+
     conn.commit()
     conn.close()
     print(f"Database schema for '{DB_NAME}' created/re-created successfully at '{DB_PATH}'.")
@@ -1,16 +1,29 @@
+import argparse
 import sqlite3
 import random
 from faker import Faker
 from datetime import datetime, timedelta
 import os
+import sys
+import time
+
+from database_setup import create_tables
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard"))
+from migrations import run_migrations
+from data_version import stamp_data_version
+from dataset_stats import refresh_dataset_stats
 
 DB_DIR = "data/sqlite"
 DB_NAME = "saas.db"
 DB_PATH = os.path.join(DB_DIR, DB_NAME)
 
-NUM_CUSTOMERS = 200
+NUM_CUSTOMERS = 200  # At scale factor 1; --scale-factor multiplies customers and campaigns
 NUM_CAMPAIGNS = 10
 MAX_SUBSCRIPTION_EVENTS_PER_CUSTOMER = 3 # Max changes (upgrade, downgrade, cancel)
+NAME_POOL_SIZE = 1000  # --fast: distinct first and last names drawn from Faker once
+REGISTRATION_DAYS = 730  # Customers register within the last two years
 
 fake = Faker()
 
@@ -82,16 +95,51 @@ def create_customers(conn, num_customers, campaign_ids):
     print(f"Inserted {len(customers_data)} customers.")
     return cursor.execute("SELECT id, registration_date FROM customers ORDER BY id").fetchall()
 
+def create_customers_fast(conn, num_customers, campaign_ids):
+    """
+    Creates sample customers from pools drawn from Faker once: names combine pooled first and last
+    names, and emails are made unique by the customer's sequence number instead of fake.unique's
+    retry loop. Registration dates are picked from the precomputed days of the last two years.
+    """
+    cursor = conn.cursor()
+    first_names = [fake.first_name() for _ in range(NAME_POOL_SIZE)]
+    last_names = [fake.last_name() for _ in range(NAME_POOL_SIZE)]
+    domains = list({fake.free_email_domain() for _ in range(20)})
+    today = datetime.today()
+    registration_dates = [(today - timedelta(days=days)).strftime('%Y-%m-%d') for days in range(REGISTRATION_DAYS + 1)]
+    campaign_choices = campaign_ids + [None]*int(len(campaign_ids)*0.3)  # 70% tied to a campaign, as above
+
+    firsts = random.choices(first_names, k=num_customers)
+    lasts = random.choices(last_names, k=num_customers)
+    customers_data = [
+        (f"{first} {last}", f"{first.lower()}.{last.lower()}.{number}@{domain}", registration_date, campaign_id)
+        for number, first, last, domain, registration_date, campaign_id in zip(
+            range(1, num_customers + 1), firsts, lasts,
+            random.choices(domains, k=num_customers),
+            random.choices(registration_dates, k=num_customers),
+            random.choices(campaign_choices, k=num_customers) if campaign_ids else [None] * num_customers,
+        )
+    ]
+    cursor.executemany(
+        "INSERT INTO customers (name, email, registration_date, marketing_campaign_id) VALUES (?, ?, ?, ?)",
+        customers_data
+    )
+    conn.commit()
+    print(f"Inserted {len(customers_data)} customers.")
+    return cursor.execute("SELECT id, registration_date FROM customers ORDER BY id").fetchall()
+
 
 def create_subscriptions(conn, customers_with_reg_date, plan_ids):
     """Creates sample subscriptions with lifecycles (new, churn, upgrade/downgrade)."""
     cursor = conn.cursor()
     subscriptions_data = []
+    other_plan_ids = {pid: [other for other in plan_ids if other != pid] for pid in plan_ids}
+    today = datetime.today()
     
     for customer_id, reg_date_str in customers_with_reg_date:
         current_plan_id = random.choice(plan_ids)
         # Subscription starts on or after registration
-        current_start_date_obj = datetime.strptime(reg_date_str, '%Y-%m-%d') + timedelta(days=random.randint(0, 30))
+        current_start_date_obj = datetime.fromisoformat(reg_date_str) + timedelta(days=random.randint(0, 30))
         
         active_subscription = True
         
@@ -109,7 +157,6 @@ def create_subscriptions(conn, customers_with_reg_date, plan_ids):
             potential_end_date_obj = current_start_date_obj + timedelta(days=random.randint(min_duration, max_duration))
             
             # Ensure end date is not in the future for non-active statuses, unless it's an ongoing active sub
-            today = datetime.today()
             if potential_end_date_obj > today and not is_last_potential_event: # if it's not the last event, it must end to have another event
                  potential_end_date_obj = today - timedelta(days=random.randint(1,30)) # make it end in the past
             
@@ -163,14 +210,14 @@ def create_subscriptions(conn, customers_with_reg_date, plan_ids):
                 # Add the current (now ending) subscription
                 subscriptions_data.append((
                     customer_id, current_plan_id, 
-                    current_start_date_obj.strftime('%Y-%m-%d'), 
-                    current_end_date_obj.strftime('%Y-%m-%d') if current_end_date_obj else None, 
+                    current_start_date_obj.date().isoformat(), 
+                    current_end_date_obj.date().isoformat() if current_end_date_obj else None, 
                     current_status,
                     None  # No prev_plan for this one as it's the original
                 ))
                 
                 # Setup for the next subscription (the new plan after upgrade/downgrade)
-                new_plan_id = random.choice([pid for pid in plan_ids if pid != current_plan_id])
+                new_plan_id = random.choice(other_plan_ids[current_plan_id])
                 if not new_plan_id: new_plan_id = random.choice(plan_ids) # Failsafe if only one plan
 
                 current_plan_id = new_plan_id
@@ -205,8 +252,8 @@ def create_subscriptions(conn, customers_with_reg_date, plan_ids):
             # Add the subscription event
             subscriptions_data.append((
                 customer_id, current_plan_id, 
-                current_start_date_obj.strftime('%Y-%m-%d'), 
-                current_end_date_obj.strftime('%Y-%m-%d') if current_end_date_obj else None, 
+                current_start_date_obj.date().isoformat(), 
+                current_end_date_obj.date().isoformat() if current_end_date_obj else None, 
                 current_status,
                 prev_plan_id
             ))
@@ -230,8 +277,8 @@ def create_subscriptions(conn, customers_with_reg_date, plan_ids):
             
             subscriptions_data.append((
                 customer_id, current_plan_id, 
-                current_start_date_obj.strftime('%Y-%m-%d'), 
-                final_sub_end_date_obj.strftime('%Y-%m-%d') if final_sub_end_date_obj else None, 
+                current_start_date_obj.date().isoformat(), 
+                final_sub_end_date_obj.date().isoformat() if final_sub_end_date_obj else None, 
                 current_status,
                 prev_plan_id
             ))
@@ -244,43 +291,81 @@ def create_subscriptions(conn, customers_with_reg_date, plan_ids):
     print(f"Inserted {len(subscriptions_data)} subscription records.")
 
 
-def main():
-    """Main function to generate all sample data."""
+def save_staged_database(conn, db_path=DB_PATH):
+    """
+    Writes an in-memory staging database to db_path in one shot: VACUUM INTO a temporary file next
+    to it, then an atomic rename over the old database.
+    """
+    staged_path = db_path + ".tmp"
+    if os.path.exists(staged_path):
+        os.remove(staged_path)
+    conn.execute("VACUUM INTO ?", (staged_path,))
+    os.replace(staged_path, db_path)
+
+def main(scale_factor=1, fast=False):
+    """
+    Main function to generate all sample data. With fast=True the schema and data are staged in
+    an in-memory database, with pooled names and emails, and written to DB_PATH at the end
+    (database_setup.py is not needed first).
+    """
     ensure_db_directory()
     
     # Check if DB exists
-    if not os.path.exists(DB_PATH):
+    if not fast and not os.path.exists(DB_PATH):
         print(f"Database file not found at {DB_PATH}. Please run database_setup.py first.")
         return
 
-    conn = get_db_connection()
+    started = time.perf_counter()
+    if fast:
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+    else:
+        conn = get_db_connection()
     
     try:
-        print("Starting data generation...")
+        print("Starting data generation..." + (" (fast mode, staged in memory)" if fast else ""))
         # Generate data in the correct order for foreign key constraints
         plan_ids = create_plans(conn)
         if not plan_ids:
             print("Error: No plans created. Aborting data generation.")
             return
 
-        campaign_ids = create_marketing_campaigns(conn, NUM_CAMPAIGNS)
+        print(f"Scale factor {scale_factor:g}.")
+        campaign_ids = create_marketing_campaigns(conn, max(1, round(NUM_CAMPAIGNS * scale_factor)))
         # campaign_ids can be empty if NUM_CAMPAIGNS is 0, which is fine
 
         # Fetch customer id and registration_date together
-        customers_info = create_customers(conn, NUM_CUSTOMERS, campaign_ids)
+        customer_creator = create_customers_fast if fast else create_customers
+        customers_info = customer_creator(conn, max(1, round(NUM_CUSTOMERS * scale_factor)), campaign_ids)
         if not customers_info:
             print("Error: No customers created. Aborting further data generation.")
             return
             
         create_subscriptions(conn, customers_info, plan_ids)
+
+        # Indexes are built once the data is in
+        run_migrations(conn, schema="dashboard")
+        with conn:
+            refresh_dataset_stats(conn, "dashboard")
+            stamp_data_version(conn, "sample_data")
+
+        if fast:
+            save_staged_database(conn)
+            print(f"Wrote the staged database to {DB_PATH}.")
         
-        print("Sample data generation complete.")
+        print(f"Sample data generation complete in {time.perf_counter() - started:.1f}s.")
         
-    except sqlite3.Error as e:
+    except (sqlite3.Error, OSError) as e:
         print(f"An SQLite error occurred: {e}")
     finally:
         if conn:
             conn.close()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Populates the dashboard database with sample data.")
+    parser.add_argument("--scale-factor", type=float, default=1,
+                        help=f"Dataset size relative to the default (SF1 = {NUM_CUSTOMERS} customers, {NUM_CAMPAIGNS} campaigns).")
+    parser.add_argument("--fast", action="store_true",
+                        help="Pooled names/emails and in-memory staging, written to the database file in one shot.")
+    sample_args = parser.parse_args()
+    main(sample_args.scale_factor, sample_args.fast)
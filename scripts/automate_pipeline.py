@@ -1,6 +1,13 @@
-import subprocess
 import os
 import argparse
+import sqlite3
+
+from compute_kpis import refresh_kpis
+from data_version import read_data_version, stamp_data_version  # dashboard/, put on sys.path by compute_kpis
+from ingest_batches import ingest_batches
+from migrations import run_migrations
+from shadow_db import BUILD_PRAGMAS, integrity_problems, replace_database, shadow_file
+from sql_runner import SCRIPT_PRAGMAS, apply_pragmas, check_views, print_timings, run_script, view_names
 
 # --- Configuration ---
 DATABASE_NAME = "saas_analytics.db"
@@ -13,16 +20,30 @@ SQL_DIR = os.path.join(PROJECT_ROOT, "sql")
 # Example: DATA_DIR = os.path.join(PROJECT_ROOT, "data_files_for_import") 
 SCHEMA_FILE = os.path.join(SQL_DIR, "schema.sql")
 CREATE_VIEWS_FILE = os.path.join(SQL_DIR, "create_views.sql")
-DB_PATH = os.path.join(PROJECT_ROOT, DATABASE_NAME)
+# Same location scripts/generate_data.py loads into and the dashboard reads the KPI tables from.
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", DATABASE_NAME)
+# A full rebuild goes into a shadow file next to the database (scripts/shadow_db.py) and is
+# swapped in once it is complete, so the dashboard never sees a missing or half-loaded database.
 
 # --- Helper Functions ---
 def get_db_path():
     """Returns the absolute path to the SQLite database."""
     return os.path.abspath(DB_PATH)
 
-def execute_sqlite_script(sql_file_path):
-    """Executes an SQL script against the SQLite database."""
-    db_path = get_db_path()
+def get_shadow_path():
+    """Absolute path of the shadow file a full rebuild is built in."""
+    return shadow_file(get_db_path())
+
+def connect(db_path):
+    """A read-write connection; the unsafe-fast build PRAGMAs are applied to the shadow file only."""
+    conn = sqlite3.connect(db_path)
+    if db_path == get_shadow_path():
+        apply_pragmas(conn, BUILD_PRAGMAS)
+    return conn
+
+def execute_sqlite_script(sql_file_path, db_path=None):
+    """Executes an SQL script against the SQLite database in one transaction, reporting per-statement timings."""
+    db_path = db_path or get_db_path()
     abs_sql_file_path = os.path.abspath(sql_file_path)
     
     if not os.path.exists(abs_sql_file_path):
@@ -30,61 +51,37 @@ def execute_sqlite_script(sql_file_path):
         return False
 
     print(f"Executing SQL script: {abs_sql_file_path} on database: {db_path}")
+    conn = None
     try:
         with open(abs_sql_file_path, 'r') as f:
             sql_script_content = f.read()
 
-        process = subprocess.run(
-            f'sqlite3 "{db_path}"',
-            input=sql_script_content,
-            text=True,
-            capture_output=True,
-            check=False, 
-            shell=True 
-        )
-        
-        if process.returncode == 0:
-            print(f"Successfully executed {os.path.basename(abs_sql_file_path)}.")
-            if process.stdout.strip():
-                print(f"Stdout:\\n{process.stdout.strip()}")
-            return True
-        else:
-            print(f"Error executing {os.path.basename(abs_sql_file_path)}:")
-            print(f"Return Code: {process.returncode}")
-            if process.stdout.strip():
-                print(f"Stdout:\\n{process.stdout.strip()}")
-            if process.stderr.strip():
-                print(f"Stderr:\\n{process.stderr.strip()}")
-            return False
-    except FileNotFoundError: # This specific error is for 'sqlite3' command itself
-        print(f"Error: sqlite3 command not found. Ensure SQLite3 is installed and in your system PATH.")
+        conn = connect(db_path)
+        pragmas = {**SCRIPT_PRAGMAS, **BUILD_PRAGMAS} if db_path == get_shadow_path() else SCRIPT_PRAGMAS
+        timings = run_script(conn, sql_script_content, pragmas=pragmas)
+        print_timings(timings)
+        print(f"Successfully executed {os.path.basename(abs_sql_file_path)}.")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error executing {os.path.basename(abs_sql_file_path)} (rolled back): {e}")
         return False
     except Exception as e:
         print(f"An unexpected error occurred while executing {os.path.basename(abs_sql_file_path)}: {e}")
         return False
+    finally:
+        if conn:
+            conn.close()
 
 def test_sqlite3_connection():
-    """Tests if sqlite3 command is accessible."""
+    """Tests that the in-process sqlite3 module works (no sqlite3 CLI on PATH is needed)."""
     print("Testing SQLite3 accessibility...")
     try:
-        process = subprocess.run(
-            "sqlite3 --version", # Simple command to check
-            text=True,
-            capture_output=True,
-            check=True, # Expect success
-            shell=True
-        )
-        print(f"SQLite3 version: {process.stdout.strip()}")
+        conn = sqlite3.connect(":memory:")
+        version = conn.execute("SELECT sqlite_version()").fetchone()[0]
+        conn.close()
+        print(f"SQLite3 version: {version}")
         return True
-    except FileNotFoundError:
-        print("Error: sqlite3 command not found. Please ensure SQLite3 is installed and its directory is in your system PATH.")
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing 'sqlite3 --version'. Is SQLite3 installed and in PATH?")
-        if e.stdout: print(f"Stdout: {e.stdout}")
-        if e.stderr: print(f"Stderr: {e.stderr}")
-        return False
-    except Exception as e:
+    except sqlite3.Error as e:
         print(f"An unexpected error occurred while testing sqlite3: {e}")
         return False
 
@@ -109,42 +106,159 @@ def regenerate_source_data(force_regeneration=False):
     print("Data regeneration step completed (Placeholder - implement actual logic).")
     return True # Assume success for placeholder
 
+def remove_shadow():
+    """Deletes a leftover shadow file (from an earlier failed or interrupted rebuild). Returns False if it cannot be removed."""
+    shadow_path = get_shadow_path()
+    if os.path.exists(shadow_path):
+        try:
+            os.remove(shadow_path)
+            print(f"Removed shadow database: {shadow_path}")
+        except OSError as e:
+            print(f"Error removing shadow database {shadow_path}: {e}")
+            return False
+    return True
+
 def initialize_database():
     """
-    Initializes the database: deletes the old one if it exists,
-    then loads the schema and any initial data via schema.sql.
+    Initializes a new database in the shadow file, loading the schema and any initial data via
+    schema.sql. The live database stays in place (and readable) until publish_database swaps it.
     """
     print("Step 2: Initializing database...")
-    db_path = get_db_path()
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-            print(f"Removed existing database: {db_path}")
-        except OSError as e:
-            print(f"Error removing existing database {db_path}: {e}")
-            return False
-    
-    print(f"Creating new database and loading schema/data from: {SCHEMA_FILE}")
-    if not execute_sqlite_script(SCHEMA_FILE):
+    db_path = get_shadow_path()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if not remove_shadow():
+        return False
+
+    print(f"Creating shadow database {db_path} and loading schema/data from: {SCHEMA_FILE}")
+    if not execute_sqlite_script(SCHEMA_FILE, db_path):
         print("Failed to load schema and initial data. Check schema.sql and its data import paths.")
         return False
     
     print("Database initialized successfully.")
     return True
 
-def refresh_database_views():
-    """Creates or refreshes database views using create_views.sql."""
-    print("Step 3: Refreshing database views...")
-    if not execute_sqlite_script(CREATE_VIEWS_FILE):
+def ingest_new_batches(db_path, paths):
+    """
+    Upserts the new CSV/Parquet batches of `paths` (scripts/ingest_batches.py); batches already in
+    ingest_manifest are skipped, and the next step's KPI refresh recomputes the weeks they touched.
+    """
+    print(f"Step 2b: Ingesting new data batches from {', '.join(paths)}...")
+    if not ingest_batches(db_path, paths):
+        return False
+    print("Data batches ingested successfully.")
+    return True
+
+def apply_schema_migrations(db_path):
+    """Applies pending schema migrations (covering indexes) to the freshly loaded tables."""
+    print("Step 3: Applying schema migrations...")
+    conn = None
+    try:
+        conn = connect(db_path)
+        run_migrations(conn, schema="analytics")
+    except sqlite3.Error as e:
+        print(f"Error applying schema migrations: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    print("Schema migrations applied successfully.")
+    return True
+
+def refresh_database_views(db_path, workers=4, count_rows=False):
+    """
+    Creates or refreshes database views using create_views.sql, then checks every view in parallel
+    to catch views that were created but fail when queried (e.g. a column missing from the tables).
+    The views are only compiled (LIMIT 0) unless count_rows runs each one to completion.
+    """
+    print("Step 4: Refreshing database views...")
+    if not execute_sqlite_script(CREATE_VIEWS_FILE, db_path):
         print("Failed to create/refresh database views.")
         return False
+
+    conn = sqlite3.connect(db_path)
+    try:
+        views = view_names(conn)
+    finally:
+        conn.close()
+    print(f"Checking {len(views)} views with {workers} worker(s)...")
+    for view, (rows, seconds, error) in check_views(db_path, views, workers=workers, count_rows=count_rows).items():
+        if error:
+            print(f"  Warning: {view} fails when queried: {error}")
+        else:
+            print(f"  {seconds:8.3f}s  {view}" + (f" ({rows} rows)" if count_rows else ""))
     print("Database views refreshed successfully.")
     return True
 
+def materialize_kpis(db_path, full_refresh=False):
+    """
+    Refreshes the kpi_weekly/kpi_daily tables read by the dashboard.
+    Only weeks touched by rows newer than the stored high-watermarks are recomputed unless full_refresh is set.
+    """
+    print("Step 5: Materializing KPI tables...")
+    conn = None
+    try:
+        conn = connect(db_path)
+        refresh_kpis(conn, full_refresh=full_refresh)
+    except sqlite3.Error as e:
+        print(f"Error materializing KPI tables: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    print("KPI tables materialized successfully.")
+    return True
+
+def verify_database(db_path):
+    """
+    Prepares a rebuilt shadow database for the swap: ANALYZE for the query planner, an integrity
+    check, and a new data version so the dashboard's caches move to it. Returns False if the
+    file is damaged.
+    """
+    print("Step 6: Verifying rebuilt database...")
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("ANALYZE")
+        problems = integrity_problems(conn)
+        if problems:
+            for problem in problems[:10]:
+                print(f"  Integrity check: {problem}")
+            return False
+        with conn:
+            stamp_data_version(conn, "rebuild")
+    except sqlite3.Error as e:
+        print(f"Error verifying the rebuilt database: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    print("Rebuilt database verified successfully.")
+    return True
+
+def publish_database(shadow_path, db_path=None):
+    """
+    Atomically replaces the live database with the verified shadow (os.replace is a rename). Readers
+    holding the old file keep reading it to the end of their query; the dashboard's connection pool
+    sees the new inode on its next checkout and reopens.
+    """
+    print("Step 7: Swapping the rebuilt database into place...")
+    db_path = db_path or get_db_path()
+    try:
+        replace_database(shadow_path, db_path)
+    except OSError as e:
+        print(f"Error replacing {db_path} with the rebuilt database: {e}")
+        return False
+    print(f"Published rebuilt database: {db_path}")
+    return True
+
 def trigger_dashboard_update():
-    """Placeholder function to trigger a dashboard update (e.g., Tableau, Streamlit refresh)."""
-    print("Step 4: Triggering dashboard update (Placeholder)...")
-    # Example implementation:
+    """
+    Reports the data version stamped by the load/KPI refresh. The Streamlit dashboard keys its cached
+    results on it and picks up the new data on its next rerun; external dashboards would be notified here.
+    """
+    print("Step 8: Triggering dashboard update...")
+    print(f"Analytics data version: {read_data_version(get_db_path())} (Streamlit caches follow it automatically).")
+    # Example implementation for an external dashboard (e.g., Tableau):
     # import requests
     # DASHBOARD_HOOK_URL = "YOUR_DASHBOARD_API_OR_WEBHOOK_URL"
     # try:
@@ -155,12 +269,12 @@ def trigger_dashboard_update():
     # except requests.exceptions.RequestException as e:
     #     print(f"Failed to trigger dashboard update: {e}")
     #     return False # Or handle as non-critical
-    print("Dashboard update step completed (Placeholder - implement actual logic).")
+    print("Dashboard update step completed.")
     return True
 
 def send_summary_email():
     """Placeholder function to send a summary email."""
-    print("Step 5: Sending summary email (Placeholder)...")
+    print("Step 9: Sending summary email (Placeholder)...")
     # Example implementation:
     # import smtplib
     # from email.mime.text import MIMEText
@@ -183,12 +297,41 @@ def send_summary_email():
     return True
 
 # --- Main Pipeline Orchestration ---
+def update_database(db_path, args, rebuild):
+    """Steps 2b-7 on db_path; a rebuilt shadow is verified and swapped into place at the end."""
+    if args.ingest and not ingest_new_batches(db_path, args.ingest):
+        print("Pipeline halted: Failed to ingest data batches.")
+        return False
+
+    if not apply_schema_migrations(db_path):
+        print("Pipeline halted: Failed to apply schema migrations.")
+        return False
+
+    if not refresh_database_views(db_path, workers=args.view_workers, count_rows=args.count_view_rows):
+        print("Pipeline halted: Failed to refresh database views.")
+        return False
+
+    if not materialize_kpis(db_path, full_refresh=args.full_refresh):
+        print("Pipeline halted: Failed to materialize KPI tables.")
+        return False
+
+    if not rebuild:
+        return True
+    if not verify_database(db_path):
+        print("Pipeline halted: The rebuilt database failed verification; the live database was kept.")
+        return False
+    if not publish_database(db_path):
+        print("Pipeline halted: Failed to swap in the rebuilt database; the live database was kept.")
+        return False
+    return True
+
 def run_pipeline(args):
     """Main function to orchestrate the data pipeline."""
     print("--- Starting SaaS Analytics Data Refresh Pipeline ---")
     print(f"Project Root: {PROJECT_ROOT}")
     print(f"SQL Directory: {SQL_DIR}")
     print(f"Database Path: {DB_PATH}")
+    print(f"Shadow Path (full rebuilds): {get_shadow_path()}")
     print(f"Schema File: {SCHEMA_FILE}")
     print(f"Views File: {CREATE_VIEWS_FILE}")
     print("---")
@@ -208,12 +351,25 @@ def run_pipeline(args):
         print("Pipeline halted: Failed to regenerate source data.")
         return False
 
-    if not initialize_database():
-        print("Pipeline halted: Failed to initialize the database.")
-        return False
+    # A full rebuild is reserved for --full-refresh (or a missing database); otherwise the
+    # existing tables are kept and only the KPI weeks touched by new rows are recomputed, each
+    # refresh in its own transaction. A rebuild happens in the shadow file and is swapped in at the end.
+    rebuild = args.full_refresh or not os.path.exists(get_db_path())
+    if rebuild:
+        if not initialize_database():
+            remove_shadow()
+            print("Pipeline halted: Failed to initialize the database.")
+            return False
+    else:
+        print("Step 2: Keeping existing database (use --full-refresh to rebuild it).")
 
-    if not refresh_database_views():
-        print("Pipeline halted: Failed to refresh database views.")
+    updated = False
+    try:
+        updated = update_database(get_shadow_path() if rebuild else get_db_path(), args, rebuild)
+    finally:
+        if rebuild and not updated:
+            remove_shadow()  # The live database was never touched
+    if not updated:
         return False
 
     if not args.skip_dashboard:
@@ -235,7 +391,7 @@ def run_pipeline(args):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Automated SaaS Analytics Data Refresh Pipeline. "
-                    "Regenerates data, reloads SQLite DB, refreshes views, "
+                    "Regenerates data, reloads SQLite DB, refreshes views and KPI tables, "
                     "and optionally triggers dashboard/email notifications."
     )
     parser.add_argument(
@@ -243,6 +399,30 @@ if __name__ == "__main__":
         action="store_true",
         help="Force regeneration of source data (behavior depends on placeholder implementation)."
     )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Rebuild the database from schema.sql in a shadow file, recompute every KPI week and swap it into place "
+             "instead of refreshing incrementally."
+    )
+    parser.add_argument(
+        "--ingest",
+        nargs="+",
+        metavar="PATH",
+        help="Upsert new CSV/Parquet batches (files or directories, named <table>_<batch>.csv/.parquet) "
+             "before refreshing; only the KPI weeks they touch are recomputed."
+    )
+    parser.add_argument(
+        "--view-workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Threads used to check the refreshed views in parallel (default: up to 4)."
+    )
+    parser.add_argument(
+        "--count-view-rows",
+        action="store_true",
+        help="Run every view to completion (COUNT(*)) when checking it, instead of only compiling it."
+    )
     parser.add_argument(
         "--skip-dashboard",
         action="store_true",
@@ -0,0 +1,1319 @@
+import argparse
+import itertools
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DASHBOARD_DIR = os.path.join(PROJECT_ROOT, "dashboard")
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas.db")
+DEFAULT_RAW_DIR = os.path.join(PROJECT_ROOT, "data", "raw")
+DEFAULT_ANALYTICS_DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas_analytics.db")
+
+# The dashboard engines live next to app.py (Streamlit puts that directory on sys.path).
+sys.path.insert(0, DASHBOARD_DIR)
+import connection_pool  # noqa: E402
+import kpi_engine  # noqa: E402
+import parquet_store  # noqa: E402
+import queries  # noqa: E402
+import snapshot  # noqa: E402
+from sqlite_schema import existing_tables, table_columns  # noqa: E402
+from load_to_db import TABLE_DTYPES, column_values, create_table, insert_rows  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+import churn_rate  # noqa: E402
+import cohort_retention  # noqa: E402
+import olap_cube  # noqa: E402
+import automate_pipeline  # noqa: E402
+import shadow_db  # noqa: E402
+import ingest_batches  # noqa: E402
+from compute_kpis import refresh_kpis  # noqa: E402
+import generate_data  # noqa: E402
+
+# Original dates x subscriptions cross join from dashboard/app.py, kept as the reference
+# implementation the event-sweep engine is checked against.
+LEGACY_MRR_QUERY = """
+WITH RECURSIVE dates(date) AS (
+    SELECT DATE(?)
+    UNION ALL
+    SELECT DATE(date, '+1 day')
+    FROM dates
+    WHERE date < DATE(?)
+),
+subscription_daily_mrr AS (
+    SELECT
+        s.customer_id,
+        p.price_monthly,
+        s.start_date,
+        COALESCE(s.end_date, DATE('now', '+100 years')) as effective_end_date,
+        s.status,
+        LAG(s.plan_id, 1, NULL) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_id,
+        LAG(p.price_monthly, 1, 0) OVER (PARTITION BY s.customer_id ORDER BY s.start_date) as prev_plan_price
+    FROM subscriptions s
+    JOIN plans p ON s.plan_id = p.id
+)
+SELECT
+    d.date,
+    SUM(CASE WHEN sdm.start_date <= d.date AND sdm.effective_end_date > d.date THEN sdm.price_monthly ELSE 0 END) as mrr,
+    SUM(CASE WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NULL THEN sdm.price_monthly ELSE 0 END) as new_mrr,
+    SUM(CASE WHEN sdm.effective_end_date = d.date AND sdm.status = 'canceled' THEN sdm.price_monthly ELSE 0 END) as churned_mrr,
+    SUM(CASE WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NOT NULL AND sdm.price_monthly > sdm.prev_plan_price
+        THEN (sdm.price_monthly - sdm.prev_plan_price) ELSE 0 END) as expansion_mrr,
+    SUM(CASE WHEN sdm.start_date = d.date AND sdm.prev_plan_id IS NOT NULL AND sdm.price_monthly < sdm.prev_plan_price
+        THEN (sdm.prev_plan_price - sdm.price_monthly) ELSE 0 END) as contraction_mrr
+FROM dates d
+LEFT JOIN subscription_daily_mrr sdm ON 1=1
+GROUP BY d.date
+ORDER BY d.date;
+"""
+
+LEGACY_ACTIVE_QUERY = """
+WITH RECURSIVE dates(date) AS (
+    SELECT DATE(?)
+    UNION ALL
+    SELECT DATE(date, '+1 day')
+    FROM dates
+    WHERE date < DATE(?)
+)
+SELECT
+    d.date,
+    COUNT(DISTINCT s.customer_id) as active_subscriptions
+FROM dates d
+LEFT JOIN subscriptions s ON s.start_date <= d.date AND (s.end_date IS NULL OR s.end_date > d.date) AND s.status = 'active'
+GROUP BY d.date
+ORDER BY d.date;
+"""
+
+# Former v_weekly_cohort_retention_summary (sql/create_views.sql): the cohort x activity-week
+# self-join the bitset engine in scripts/cohort_retention.py is checked against.
+LEGACY_COHORT_RETENTION_QUERY = """
+WITH cohort_base AS (
+    SELECT
+        c.customer_id,
+        cal.week_start_date as cohort_week,
+        cal.week_id as cohort_week_id
+    FROM customers c
+    JOIN calendar cal ON c.signup_week_id = cal.week_id
+),
+cohort_sizes AS (
+    SELECT cohort_week, COUNT(DISTINCT customer_id) as cohort_size
+    FROM cohort_base
+    GROUP BY cohort_week
+),
+weekly_activity AS (
+    SELECT DISTINCT
+        r.customer_id,
+        r.week_id as activity_week_id
+    FROM revenue r
+    WHERE r.MRR > 0
+)
+SELECT
+    cb.cohort_week,
+    cs.cohort_size,
+    wa.activity_week_id - cb.cohort_week_id as week_number_after_signup,
+    COUNT(DISTINCT wa.customer_id) as retained_customers,
+    ( CAST(COUNT(DISTINCT wa.customer_id) AS REAL) / cs.cohort_size ) * 100 as retention_percentage
+FROM cohort_base cb
+JOIN weekly_activity wa ON cb.customer_id = wa.customer_id AND wa.activity_week_id >= cb.cohort_week_id
+JOIN cohort_sizes cs ON cb.cohort_week = cs.cohort_week
+GROUP BY 1, 2, 3
+ORDER BY 1, 3;
+"""
+
+# A breakdown straight off the fact tables, as the dashboard would run it without the cube.
+RAW_MRR_BREAKDOWN_QUERY = """
+SELECT cal.week_start_date, COALESCE(c.{dimension}, 'Unknown') as {dimension}, SUM(r.MRR) as mrr
+FROM revenue r
+LEFT JOIN customers c ON c.customer_id = r.customer_id
+JOIN (SELECT week_id, MIN(week_start_date) as week_start_date FROM calendar GROUP BY week_id) cal ON cal.week_id = r.week_id
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+# kpi_weekly columns the week cuboid must reproduce: kpi_weekly column -> cube measure
+KPI_WEEKLY_MEASURES = {
+    "total_mrr": "mrr", "new_signups": "new_signups", "churned_this_week": "churned_customers",
+    "active_at_start_of_week": "active_at_start_of_week", "new_mrr": "new_mrr", "expansion_mrr": "expansion_mrr",
+    "contraction_mrr": "contraction_mrr", "churned_mrr": "churned_mrr", "total_ad_spend": "ad_spend",
+}
+
+# Original v_weekly_customer_churn_rate (sql/create_views.sql before migration 4): the FULL OUTER
+# JOIN of the v_customers_active_at_week_start and v_customers_churned_in_week range joins over
+# DATE() comparisons, inlined. {customers} is the customers table or a slice of it.
+LEGACY_CHURN_RATE_QUERY = """
+WITH cas AS (
+    SELECT
+        cal.week_start_date,
+        COUNT(DISTINCT cust.customer_id) as active_at_start_of_week
+    FROM calendar cal
+    LEFT JOIN {customers} cust
+        ON DATE(cust.signup_date) < cal.week_start_date
+        AND (cust.churn_date IS NULL OR DATE(cust.churn_date) >= cal.week_start_date)
+    GROUP BY 1
+),
+ccw AS (
+    SELECT
+        cal.week_start_date,
+        COUNT(DISTINCT cust.customer_id) as churned_this_week
+    FROM calendar cal
+    LEFT JOIN {customers} cust
+        ON DATE(cust.churn_date) >= cal.week_start_date AND DATE(cust.churn_date) <= cal.week_end_date
+    GROUP BY 1
+)
+SELECT
+    COALESCE(cas.week_start_date, ccw.week_start_date) as week_start_date,
+    COALESCE(cas.active_at_start_of_week, 0) as active_at_start_of_week,
+    COALESCE(ccw.churned_this_week, 0) as churned_this_week,
+    CASE
+        WHEN cas.active_at_start_of_week > 0
+        THEN (CAST(COALESCE(ccw.churned_this_week, 0) AS REAL) / cas.active_at_start_of_week) * 100
+        ELSE 0
+    END as customer_churn_rate_pct
+FROM cas
+FULL OUTER JOIN ccw ON cas.week_start_date = ccw.week_start_date
+ORDER BY 1
+"""
+
+MRR_COLUMNS = ['mrr', 'new_mrr', 'churned_mrr', 'expansion_mrr', 'contraction_mrr']
+
+EVENT_COLUMNS = ['date', 'type', 'details', 'mrr_change']
+
+def legacy_subscription_events(df, start_date, end_date):
+    """Original row-by-row event loop from dashboard/app.py:get_subscription_events."""
+    df = df.copy()
+    df['start_date'] = pd.to_datetime(df['start_date'])
+    df['end_date'] = pd.to_datetime(df['end_date'], errors='coerce')
+    events = []
+    for _, row in df.iterrows():
+        if row['status'] == 'active' and pd.isna(row['prev_plan_id']) and row['start_date'] >= start_date and row['start_date'] <= end_date:
+            events.append({'date': row['start_date'], 'type': 'New Subscription',
+                           'details': f"Customer {row['customer_name']} started {row['plan_name']}",
+                           'mrr_change': row['price_monthly']})
+        if row['status'] == 'canceled' and row['end_date'] is not pd.NaT and row['end_date'] >= start_date and row['end_date'] <= end_date:
+            events.append({'date': row['end_date'], 'type': 'Cancellation',
+                           'details': f"Customer {row['customer_name']} canceled {row['plan_name']}",
+                           'mrr_change': -row['price_monthly']})
+        if row['status'] == 'upgraded' and row['start_date'] >= start_date and row['start_date'] <= end_date:
+            if row['prev_price'] is not None and row['price_monthly'] > row['prev_price']:
+                events.append({'date': row['start_date'], 'type': 'Upgrade',
+                               'details': f"Customer {row['customer_name']} upgraded from {row['prev_plan_name']} to {row['plan_name']}",
+                               'mrr_change': row['price_monthly'] - row['prev_price']})
+        if row['status'] == 'downgraded' and row['start_date'] >= start_date and row['start_date'] <= end_date:
+            if row['prev_price'] is not None and row['price_monthly'] < row['prev_price']:
+                events.append({'date': row['start_date'], 'type': 'Downgrade',
+                               'details': f"Customer {row['customer_name']} downgraded from {row['prev_plan_name']} to {row['plan_name']}",
+                               'mrr_change': row['price_monthly'] - row['prev_price']})
+    return pd.DataFrame(events)
+
+def synthetic_subscription_rows(n_rows, start_date, end_date, seed=42):
+    """Random rows shaped like the get_subscription_events query output."""
+    rng = np.random.default_rng(seed)
+    plans = np.array(['Basic', 'Pro', 'Enterprise'], dtype=object)
+    prices = np.array([10.0, 25.0, 75.0])
+    span = (end_date - start_date).days
+    plan = rng.integers(0, 3, n_rows)
+    prev_plan = rng.integers(0, 3, n_rows)
+    has_prev = rng.random(n_rows) < 0.3
+    starts = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(-60, span, n_rows), unit='D')
+    ends = starts + pd.to_timedelta(rng.integers(30, 400, n_rows), unit='D')
+    ends = ends.where(rng.random(n_rows) < 0.8)
+    return pd.DataFrame({
+        'id': np.arange(1, n_rows + 1),
+        'customer_id': rng.integers(1, max(n_rows // 2, 2), n_rows),
+        'customer_name': np.char.add('Customer-', rng.integers(1, n_rows + 1, n_rows).astype(str)).astype(object),
+        'plan_id': plan + 1,
+        'plan_name': plans[plan],
+        'price_monthly': prices[plan],
+        'start_date': starts.strftime('%Y-%m-%d'),
+        'end_date': ends.strftime('%Y-%m-%d'),
+        'status': rng.choice(['active', 'canceled', 'upgraded', 'downgraded'], n_rows, p=[0.3, 0.5, 0.1, 0.1]),
+        'prev_plan_id': np.where(has_prev, prev_plan + 1, np.nan),
+        'prev_plan_name': np.where(has_prev, plans[prev_plan], None),
+        'prev_price': np.where(has_prev, prices[prev_plan], np.nan),
+    })
+
+def legacy_weekly_revenue(customers_df):
+    """Original per-customer, per-week loop from scripts/generate_data.py:simulate_weekly_revenue."""
+    config = generate_data.CONFIG
+    records = []
+    for _, row in customers_df.iterrows():
+        signup = datetime.strptime(str(row.signup_date), "%Y-%m-%d")
+        churn = datetime.strptime(str(row.churn_date), "%Y-%m-%d") if pd.notnull(row.churn_date) else config["START_DATE"] + timedelta(weeks=config["NUM_WEEKS"])
+        plan_price = config["PLANS"][row.plan]
+        for week in range(config["NUM_WEEKS"]):
+            week_date = config["START_DATE"] + timedelta(weeks=week)
+            if signup <= week_date < churn:
+                records.append({
+                    "customer_id": row.customer_id,
+                    "week": week,
+                    "week_start": week_date.date(),
+                    "plan": row.plan,
+                    "MRR": plan_price
+                })
+    return pd.DataFrame(records)
+
+def legacy_product_data(customers_df):
+    """Original per-week filter and iterrows loop from scripts/generate_data.py:simulate_product_data."""
+    config = generate_data.CONFIG
+    records = []
+    for week in range(config["NUM_WEEKS"]):
+        week_date = config["START_DATE"] + timedelta(weeks=week)
+        active_customers = customers_df[
+            (pd.to_datetime(customers_df.signup_date) <= week_date) &
+            ((pd.isnull(customers_df.churn_date)) | (pd.to_datetime(customers_df.churn_date) > week_date))
+        ]
+        for _, row in active_customers.iterrows():
+            sessions = np.random.poisson(5)
+            features_used = np.random.randint(1, 6)
+            records.append({
+                "customer_id": row.customer_id,
+                "week": week,
+                "week_start": week_date.date(),
+                "sessions": sessions,
+                "features_used": features_used
+            })
+    return pd.DataFrame(records)
+
+def synthetic_customers(n_customers, seed=42):
+    """
+    Customers shaped like simulate_weekly_signups output (weekly signups, exponential churn capped
+    a year past the simulation, 70% of late churns dropped), drawn column-wise for large sizes.
+    """
+    config = generate_data.CONFIG
+    rng = np.random.default_rng(seed)
+    signup_weeks = np.sort(rng.integers(0, config["NUM_WEEKS"], n_customers))
+    churn_weeks = np.minimum(signup_weeks + rng.exponential(52, n_customers).astype(int), config["NUM_WEEKS"] + 52)
+    churn_weeks = np.where((churn_weeks > config["NUM_WEEKS"]) & (rng.random(n_customers) < 0.7), -1, churn_weeks)
+    week_dates = np.array([(config["START_DATE"] + timedelta(weeks=int(week))).date()
+                           for week in range(config["NUM_WEEKS"] + 53)], dtype=object)
+    plans = np.array(list(config["PLANS"]), dtype=object)
+    churn_dates = week_dates[churn_weeks]
+    churn_dates[churn_weeks < 0] = None
+    return pd.DataFrame({
+        "customer_id": np.arange(1, n_customers + 1),
+        "signup_date": week_dates[signup_weeks],
+        "plan": plans[rng.choice(len(plans), n_customers, p=[0.6, 0.3, 0.1])],
+        "marketing_channel": rng.choice(config["MARKETING_CHANNELS"], n_customers).astype(object),
+        "country": rng.choice(config["COUNTRIES"], n_customers).astype(object),
+        "churn_date": churn_dates,
+    })
+
+def same_frame(expected, actual):
+    """Same columns, dtypes and values in the same order."""
+    return list(expected.columns) == list(actual.columns) and all(
+        expected[column].dtype == actual[column].dtype and (expected[column].to_numpy() == actual[column].to_numpy()).all()
+        for column in expected.columns
+    )
+
+# --- Helper Functions ---
+def timed(func, *args, **kwargs):
+    """Runs func once and returns (result, elapsed seconds)."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def open_dashboard_db(db_path):
+    """Opens the dashboard database, failing early if it lacks the subscriptions/plans schema."""
+    if not os.path.exists(db_path):
+        print(f"Error: database not found at {db_path}")
+        return None
+    conn = sqlite3.connect(db_path)
+    if not {'subscriptions', 'plans'} <= existing_tables(conn):
+        print(f"Error: {db_path} has no subscriptions/plans tables. "
+              "Run database_setup.py and generate_sample_data.py to build the dashboard database.")
+        conn.close()
+        return None
+    return conn
+
+def default_range(conn):
+    """Full subscription history, as the dashboard's global filter defaults to it."""
+    min_s, max_s = conn.execute(
+        "SELECT MIN(start_date), MAX(COALESCE(end_date, DATE('now'))) FROM subscriptions"
+    ).fetchone()
+    return datetime.strptime(min_s, '%Y-%m-%d'), datetime.strptime(max_s, '%Y-%m-%d')
+
+def resolve_range(conn, args):
+    """Applies --start/--end on top of the full subscription history."""
+    start_date, end_date = default_range(conn)
+    if args.start:
+        start_date = datetime.strptime(args.start, '%Y-%m-%d')
+    if args.end:
+        end_date = datetime.strptime(args.end, '%Y-%m-%d')
+    return start_date, end_date
+
+def same_series(legacy, engine, columns):
+    """Compares an engine frame with the legacy query output day by day."""
+    if len(legacy) != len(engine) or not (pd.to_datetime(legacy['date']).to_numpy() == engine['date'].to_numpy()).all():
+        print("Mismatch in the returned dates.")
+        return False
+    for column in columns:
+        if not np.allclose(legacy[column].to_numpy(dtype=float), engine[column].to_numpy(dtype=float)):
+            print(f"Mismatch in column '{column}'.")
+            return False
+    return True
+
+def row_counter(frame):
+    """Rows of a frame as a multiset of bindable tuples, so frames can be compared regardless of row order and dtypes."""
+    return Counter(zip(*(column_values(frame[column]) for column in frame.columns)))
+
+def megabytes(size):
+    return size / (1024 * 1024)
+
+def report_match(ok):
+    """Prints the outcome of an equivalence check and passes it through."""
+    print("Results match the legacy query." if ok else "Results DIFFER from the legacy query.")
+    return ok
+
+# --- Benchmarks ---
+def bench_mrr(args):
+    """Checks the event-sweep MRR engine against the legacy cross join and times both."""
+    conn = open_dashboard_db(args.db)
+    if conn is None:
+        return False
+    try:
+        start_date, end_date = resolve_range(conn, args)
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        print(f"MRR engine on {args.db} for {params[0]} .. {params[1]}")
+
+        legacy, legacy_s = timed(pd.read_sql_query, LEGACY_MRR_QUERY, conn, params=params)
+
+        def sweep():
+            subs = pd.read_sql_query(queries.SUBSCRIPTION_PERIODS_QUERY, conn, params=params[::-1])
+            return kpi_engine.mrr_movements(subs, start_date, end_date)
+        engine, engine_s = timed(sweep)
+    finally:
+        conn.close()
+
+    print(f"- legacy cross join: {legacy_s:.3f}s ({len(legacy)} days)")
+    print(f"- event sweep:       {engine_s:.3f}s ({len(engine)} days)")
+
+    return report_match(same_series(legacy, engine, MRR_COLUMNS))
+
+def bench_active(args):
+    """Checks the interval active-customer engine against the legacy range join and times both."""
+    conn = open_dashboard_db(args.db)
+    if conn is None:
+        return False
+    try:
+        start_date, end_date = resolve_range(conn, args)
+        params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        print(f"Active subscriptions engine on {args.db} for {params[0]} .. {params[1]}")
+
+        legacy, legacy_s = timed(pd.read_sql_query, LEGACY_ACTIVE_QUERY, conn, params=params)
+
+        def intervals(freq):
+            subs = pd.read_sql_query(queries.ACTIVE_PERIODS_QUERY, conn, params=params[::-1])
+            return kpi_engine.active_customers(subs, start_date, end_date, freq)
+        engine, engine_s = timed(intervals, 'D')
+        weekly, weekly_s = timed(intervals, 'W')
+        monthly, monthly_s = timed(intervals, 'M')
+    finally:
+        conn.close()
+
+    print(f"- legacy range join: {legacy_s:.3f}s ({len(legacy)} days)")
+    print(f"- interval engine:   {engine_s:.3f}s ({len(engine)} days)")
+    print(f"- weekly buckets:    {weekly_s:.3f}s ({len(weekly)} weeks)")
+    print(f"- monthly buckets:   {monthly_s:.3f}s ({len(monthly)} months)")
+
+    ok = same_series(legacy, engine, ['active_subscriptions'])
+    if ok:
+        # Bucketed series must equal the daily series sampled on each bucket's last day
+        daily = engine.set_index('date')['active_subscriptions']
+        for bucketed in (weekly, monthly):
+            if not (daily.loc[bucketed['date']].to_numpy() == bucketed['active_subscriptions'].to_numpy()).all():
+                print("Bucketed counts do not match the daily series.")
+                ok = False
+    return report_match(ok)
+
+def bench_events(args):
+    """Times the columnar event classifier against the iterrows loop on synthetic subscription rows."""
+    start_date, end_date = datetime(2023, 1, 1), datetime.combine(datetime(2023, 12, 31), datetime.max.time())
+    ok = True
+    print(f"Subscription event classification for {start_date:%Y-%m-%d} .. {end_date:%Y-%m-%d}")
+    print(f"{'rows':>10} {'iterrows':>10} {'columnar':>10} {'+details':>10} {'speed-up':>9}")
+    for n_rows in args.sizes:
+        rows = synthetic_subscription_rows(n_rows, start_date, end_date)
+        legacy, legacy_s = timed(legacy_subscription_events, rows, start_date, end_date)
+        events, columnar_s = timed(kpi_engine.classify_subscription_events, rows, start_date, end_date)
+        detailed, details_s = timed(kpi_engine.with_event_details, events)
+        print(f"{n_rows:>10} {legacy_s:>9.3f}s {columnar_s:>9.3f}s {details_s:>9.3f}s {legacy_s / columnar_s:>8.1f}x")
+
+        matches = len(legacy) == len(detailed) and all(
+            (legacy[column].to_numpy() == detailed[column].to_numpy()).all() for column in EVENT_COLUMNS
+        )
+        if not matches:
+            print(f"Events differ from the iterrows loop at {n_rows} rows.")
+            ok = False
+    print("Results match the legacy loop." if ok else "Results DIFFER from the legacy loop.")
+    return ok
+
+def bench_revenue(args):
+    """
+    Times the vectorized revenue simulation against the iterrows loop. The seeded generator's
+    customers are checked first, then synthetic customer sets of the requested sizes; the loop only
+    runs up to --legacy-max customers.
+    """
+    ok = True
+    generate_data.np.random.seed(42)
+    generate_data.random.seed(42)
+    print(f"{'customers':>10} {'rows':>11} {'iterrows':>10} {'vectorized':>11} {'speed-up':>9}")
+    cases = [("seeded", generate_data.simulate_weekly_signups())]
+    cases += [(n_customers, synthetic_customers(n_customers)) for n_customers in args.sizes]
+    for label, customers in cases:
+        revenue, vectorized_s = timed(generate_data.simulate_weekly_revenue, customers)
+        if len(customers) > args.legacy_max and label != "seeded":
+            print(f"{len(customers):>10} {len(revenue):>11} {'-':>10} {vectorized_s:>10.3f}s {'-':>9}")
+            continue
+        legacy, legacy_s = timed(legacy_weekly_revenue, customers)
+        print(f"{len(customers):>10} {len(revenue):>11} {legacy_s:>9.3f}s {vectorized_s:>10.3f}s "
+              f"{legacy_s / vectorized_s:>8.1f}x")
+        if not same_frame(legacy, revenue):
+            print(f"Revenue rows differ from the iterrows loop for {label} customers.")
+            ok = False
+    print("Results match the legacy loop." if ok else "Results DIFFER from the legacy loop.")
+    return ok
+
+def bench_product(args):
+    """
+    Times the chunked product-usage simulation against the per-week filter loop. The random draws
+    differ (one batched call per chunk instead of two scalar calls per row), so the (customer, week)
+    rows are compared exactly and the drawn values by range and mean.
+    """
+    ok = True
+    print(f"{'customers':>10} {'rows':>11} {'chunks':>7} {'max chunk':>10} {'loop':>9} {'chunked':>9} {'speed-up':>9}")
+    for n_customers in args.sizes:
+        customers = synthetic_customers(n_customers)
+
+        def chunked():
+            rows = chunks = max_chunk = 0
+            keys = []
+            for chunk in generate_data.iter_product_data(customers, args.chunk_rows):
+                rows, chunks, max_chunk = rows + len(chunk), chunks + 1, max(max_chunk, len(chunk))
+                if n_customers <= args.legacy_max:
+                    keys.append(chunk)
+            return rows, chunks, max_chunk, keys
+        (rows, chunks, max_chunk, keys), chunked_s = timed(chunked)
+        if n_customers > args.legacy_max:
+            print(f"{n_customers:>10} {rows:>11} {chunks:>7} {max_chunk:>10} {'-':>9} {chunked_s:>8.3f}s {'-':>9}")
+            continue
+        legacy, legacy_s = timed(legacy_product_data, customers)
+        print(f"{n_customers:>10} {rows:>11} {chunks:>7} {max_chunk:>10} {legacy_s:>8.3f}s {chunked_s:>8.3f}s "
+              f"{legacy_s / chunked_s:>8.1f}x")
+
+        usage = pd.concat(keys, ignore_index=True)
+        key_columns = ["customer_id", "week", "week_start"]
+        if not same_frame(legacy[key_columns], usage[key_columns]):
+            print(f"Active (customer, week) rows differ from the loop for {n_customers} customers.")
+            ok = False
+        elif not (usage.sessions.min() >= 0 and usage.features_used.between(1, 5).all()
+                  and abs(usage.sessions.mean() - 5) < 0.1 and abs(usage.features_used.mean() - 3) < 0.1):
+            print(f"Drawn sessions/features_used are off for {n_customers} customers.")
+            ok = False
+    print("Results match the legacy loop." if ok else "Results DIFFER from the legacy loop.")
+    return ok
+
+def bench_shards(args):
+    """
+    Times sharded generation of subscription_changes and support_tickets for each worker count
+    against the sequential global-random path, and checks that every worker count (run twice)
+    produces bit-identical tables with unique, contiguous ids.
+    """
+    customers = synthetic_customers(args.customers)
+    print(f"{args.customers:,} customers, {generate_data.CONFIG['SHARD_CUSTOMERS']:,} per shard, seed {args.seed}")
+
+    def sequential():
+        generate_data.random.seed(args.seed)
+        generate_data.np.random.seed(args.seed)
+        return [pd.concat(list(iterate(customers, generate_data.CONFIG["SHARD_CUSTOMERS"])), ignore_index=True)
+                for iterate in (generate_data.iter_subscription_changes, generate_data.iter_support_tickets)]
+
+    def sharded(workers):
+        return [pd.concat(list(generate_data.iter_sharded(table_name, customers, args.seed, workers)), ignore_index=True)
+                for table_name in generate_data.SHARDED_TABLES]
+
+    (events, tickets), sequential_s = timed(sequential)
+    print(f"- sequential:      {sequential_s:.3f}s ({len(events):,} events, {len(tickets):,} tickets)")
+    ok, reference = True, None
+    for workers in args.workers:
+        tables, sharded_s = timed(sharded, workers)
+        print(f"- {workers:>2} worker(s):    {sharded_s:.3f}s ({len(tables[0]):,} events, {len(tables[1]):,} tickets)")
+        repeated = sharded(workers)
+        reference = reference or tables
+        for table, again, expected, (_, id_column) in zip(tables, repeated, reference, generate_data.SHARDED_TABLES.values()):
+            if not (table.equals(again) and table.equals(expected)):
+                print(f"Sharded output with {workers} worker(s) is not reproducible ({id_column}).")
+                ok = False
+            if not (table[id_column].to_numpy() == np.arange(1, len(table) + 1)).all():
+                print(f"{id_column} is not unique and contiguous with {workers} worker(s).")
+                ok = False
+    print("Sharded output is identical across runs and worker counts." if ok else "Sharded output DIFFERS.")
+    return ok
+
+def bench_storage(args):
+    """
+    Converts the CSVs in data/raw/ to the partitioned Parquet tier and compares size, full-table
+    reads and a date-range read (CSV: parse everything, then filter; Parquet: partition and
+    row-group pruning). The range results must be the same rows.
+    """
+    tables = [table for table in TABLE_DTYPES if os.path.exists(os.path.join(args.raw_dir, f"{table}.csv"))]
+    if not tables:
+        print(f"Error: no CSV files found in {args.raw_dir}")
+        return False
+    parquet_dir = args.parquet_dir or tempfile.mkdtemp(prefix="saas_parquet_")
+    ok = True
+    totals = Counter()
+    print(f"CSV ({args.raw_dir}) vs Parquet ({parquet_dir}), range {args.start} .. {args.end}")
+    print(f"{'table':>21} {'rows':>8} {'csv MB':>7} {'pq MB':>7} {'write':>7} {'csv read':>9} {'pq read':>8} "
+          f"{'csv range':>10} {'pq range':>9} {'row groups':>11}")
+    for table_name in tables:
+        csv_path = os.path.join(args.raw_dir, f"{table_name}.csv")
+        date_column = parquet_store.PARTITION_COLUMNS[table_name]
+
+        csv_frame, csv_read_s = timed(pd.read_csv, csv_path, dtype=TABLE_DTYPES[table_name])
+        _, write_s = timed(parquet_store.write_table, csv_frame, table_name, parquet_dir)
+        parquet_frame, parquet_read_s = timed(parquet_store.read_table, table_name, root=parquet_dir)
+
+        def csv_range():
+            frame = pd.read_csv(csv_path, dtype=TABLE_DTYPES[table_name])
+            dates = frame[date_column]
+            return frame[(dates >= args.start.isoformat()) & (dates <= args.end.isoformat())]
+        csv_slice, csv_range_s = timed(csv_range)
+        parquet_slice, parquet_range_s = timed(parquet_store.read_table, table_name, args.start, args.end,
+                                               root=parquet_dir)
+        touched, total = parquet_store.scanned_row_groups(table_name, args.start, args.end, root=parquet_dir)
+
+        csv_mb, parquet_mb = megabytes(os.path.getsize(csv_path)), megabytes(parquet_store.table_size(table_name, parquet_dir))
+        print(f"{table_name:>21} {len(csv_frame):>8} {csv_mb:>7.2f} {parquet_mb:>7.2f} {write_s:>6.3f}s "
+              f"{csv_read_s:>8.3f}s {parquet_read_s:>7.3f}s {csv_range_s:>9.3f}s {parquet_range_s:>8.3f}s "
+              f"{touched:>5}/{total:<5}")
+        totals.update({"csv_mb": csv_mb, "parquet_mb": parquet_mb, "csv_read": csv_read_s, "parquet_read": parquet_read_s,
+                       "csv_range": csv_range_s, "parquet_range": parquet_range_s})
+
+        if len(parquet_frame) != len(csv_frame) or row_counter(parquet_slice) != row_counter(csv_slice):
+            print(f"Parquet rows differ from the CSV rows for '{table_name}'.")
+            ok = False
+    print(f"{'total':>21} {'':>8} {totals['csv_mb']:>7.2f} {totals['parquet_mb']:>7.2f} {'':>7} "
+          f"{totals['csv_read']:>8.3f}s {totals['parquet_read']:>7.3f}s {totals['csv_range']:>9.3f}s "
+          f"{totals['parquet_range']:>8.3f}s")
+    print("Range reads return the same rows from both tiers." if ok else "Range reads DIFFER between CSV and Parquet.")
+    return ok
+
+# pandas resample rules matching the bucket ends of queries.MRR_BUCKET_QUERIES.
+RESAMPLE_RULES = {'D': 'D', 'W': 'W-SUN', 'M': 'ME'}
+
+def bench_buckets(args):
+    """Checks the SQL-bucketed MRR series against the daily event sweep resampled in pandas, and times both."""
+    conn = open_dashboard_db(args.db)
+    if conn is None:
+        return False
+    ok = True
+    try:
+        start_date, end_date = resolve_range(conn, args)
+        params = {"start_date": start_date.strftime('%Y-%m-%d'), "end_date": end_date.strftime('%Y-%m-%d')}
+        print(f"MRR buckets on {args.db} for {params['start_date']} .. {params['end_date']} "
+              f"(auto granularity: {kpi_engine.choose_granularity(start_date, end_date)})")
+
+        def sweep():
+            subs = pd.read_sql_query(queries.SUBSCRIPTION_PERIODS_QUERY, conn,
+                                     params=(params['end_date'], params['start_date']))
+            return kpi_engine.mrr_movements(subs, start_date, end_date).set_index('date')
+        daily, sweep_s = timed(sweep)
+        print(f"- daily event sweep: {sweep_s:.3f}s ({len(daily)} rows)")
+
+        for freq, rule in RESAMPLE_RULES.items():
+            def in_sql():
+                buckets = pd.read_sql_query(queries.MRR_BUCKET_QUERIES[freq], conn, params=params)
+                return kpi_engine.fill_buckets(buckets, start_date, end_date, freq)
+            bucketed, sql_s = timed(in_sql)
+            expected = daily[kpi_engine.MOVEMENT_COLUMNS].resample(rule).sum()
+            expected['mrr'] = daily['mrr'].resample(rule).last()
+            # resample labels a bucket with its last day, the final one even past end_date; the SQL clips it
+            expected.index = expected.index.where(expected.index <= pd.Timestamp(end_date.date()),
+                                                  pd.Timestamp(end_date.date()))
+            same = same_series(expected.reset_index(), bucketed, ['mrr'] + kpi_engine.MOVEMENT_COLUMNS)
+            ok = ok and same
+            points = len(kpi_engine.downsample(bucketed, 'date', ['mrr'], args.max_points))
+            print(f"- SQL buckets '{freq}': {sql_s:.3f}s ({len(bucketed)} rows, {points} plotted at "
+                  f"--max-points {args.max_points}) {'matches' if same else 'DIFFERS'}")
+    finally:
+        conn.close()
+    return report_match(ok)
+
+def sql_sections(conn, start_date, end_date, freq):
+    """The Key Metrics, Subscription Fluctuations and Marketing Impact frames computed from SQLite, as app.py does."""
+    dates = {"start_date": start_date.strftime('%Y-%m-%d'), "end_date": end_date.strftime('%Y-%m-%d')}
+    ranged = (dates["end_date"], dates["start_date"])
+    buckets = pd.read_sql_query(queries.MRR_BUCKET_QUERIES[freq], conn, params=dates)
+    events = pd.read_sql_query(queries.SUBSCRIPTION_EVENTS_QUERY, conn, params=(dates["start_date"], dates["end_date"]) * 2)
+    return {
+        "mrr": kpi_engine.fill_buckets(buckets, start_date, end_date, freq),
+        "active": kpi_engine.active_customers(pd.read_sql_query(queries.ACTIVE_PERIODS_QUERY, conn, params=ranged),
+                                              start_date, end_date, freq),
+        "events": kpi_engine.classify_subscription_events(events, start_date, end_date),
+        "campaigns": pd.read_sql_query(queries.MARKETING_CAMPAIGN_SUMMARY_QUERY, conn, params=ranged),
+    }
+
+def snapshot_sections(data_snapshot, start_date, end_date, freq):
+    """The same frames computed from the in-memory snapshot."""
+    return {
+        "mrr": snapshot.snapshot_mrr(data_snapshot, start_date, end_date, freq),
+        "active": snapshot.snapshot_active(data_snapshot, start_date, end_date, freq),
+        "events": snapshot.snapshot_events(data_snapshot, start_date, end_date),
+        "campaigns": snapshot.snapshot_campaign_summary(data_snapshot, start_date, end_date),
+    }
+
+def same_section(name, expected, actual):
+    """Compares one section's frames: series by bucket, events and campaigns as row multisets."""
+    if name == "mrr":
+        return same_series(expected, actual, ['mrr'] + kpi_engine.MOVEMENT_COLUMNS)
+    if name == "active":
+        return same_series(expected, actual, ['active_subscriptions'])
+    if name == "campaigns":
+        expected = expected.assign(start_date=pd.to_datetime(expected['start_date']),
+                                   end_date=pd.to_datetime(expected['end_date']),
+                                   initial_mrr_from_acquired=expected['initial_mrr_from_acquired'].astype(float).round(6))
+        actual = actual.assign(initial_mrr_from_acquired=actual['initial_mrr_from_acquired'].round(6))
+    else:
+        expected = expected.assign(date=pd.to_datetime(expected['date']), mrr_change=expected['mrr_change'].round(6))
+        actual = actual.assign(date=pd.to_datetime(actual['date']), mrr_change=actual['mrr_change'].round(6))
+    return len(expected) == len(actual) and row_counter(expected) == row_counter(actual[expected.columns])
+
+def bench_snapshot(args):
+    """Checks the in-memory snapshot sections against the SQL-backed ones and times a date filter change."""
+    conn = open_dashboard_db(args.db)
+    if conn is None:
+        return False
+    ok = True
+    try:
+        data_snapshot, load_s = timed(snapshot.load_snapshot, conn)
+        rows = len(data_snapshot["subscriptions"]["start"])
+        print(f"Snapshot of {args.db}: {rows} subscriptions, {megabytes(data_snapshot['bytes']):.1f} MB, "
+              f"loaded in {load_s:.3f}s")
+        first, last = default_range(conn)
+        span = (last - first).days
+        ranges = [(first, last), (first + timedelta(days=span // 3), first + timedelta(days=span // 3 + 90)),
+                  (last - timedelta(days=30), last)]
+        for start_date, end_date in ranges:
+            freq = kpi_engine.choose_granularity(start_date, end_date)
+            expected, sql_s = timed(sql_sections, conn, start_date, end_date, freq)
+            actual, memory_s = timed(snapshot_sections, data_snapshot, start_date, end_date, freq)
+            mismatched = [name for name in expected if not same_section(name, expected[name], actual[name])]
+            ok = ok and not mismatched
+            print(f"- {start_date:%Y-%m-%d} .. {end_date:%Y-%m-%d} ({freq}): SQLite {sql_s * 1000:8.1f} ms, "
+                  f"snapshot {memory_s * 1000:7.1f} ms"
+                  + (f"  DIFFERS: {', '.join(mismatched)}" if mismatched else ""))
+    finally:
+        conn.close()
+    print("Snapshot sections match the SQL-backed ones." if ok else "Snapshot sections DIFFER from the SQL-backed ones.")
+    return ok
+
+def render_queries(conn):
+    """The statements one render of the Key Metrics Overview issues, with their params, for the full history."""
+    start_date, end_date = default_range(conn)
+    params = (end_date.strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d'))
+    return [(queries.SUBSCRIPTION_DATE_RANGE_QUERY, None), (queries.CAMPAIGN_DATE_RANGE_QUERY, None),
+            (queries.SUBSCRIPTION_PERIODS_QUERY, params), (queries.ACTIVE_PERIODS_QUERY, params)]
+
+def fresh_connection_render(db_path, statements):
+    """One render the way fetch_data used to run it: a new connection per query. Returns (frames, connect s, query s)."""
+    frames, connect_s, query_s = [], 0.0, 0.0
+    for sql, params in statements:
+        started = time.perf_counter()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        os.path.exists(db_path)
+        conn = sqlite3.connect(db_path)
+        connected = time.perf_counter()
+        frames.append(pd.read_sql_query(sql, conn, params=params))
+        conn.close()
+        connect_s += connected - started
+        query_s += time.perf_counter() - connected
+    return frames, connect_s, query_s
+
+def pooled_render(pool, db_path, statements):
+    """One render on pooled read-only connections. Returns (frames, checkout s, query s)."""
+    frames, connect_s, query_s = [], 0.0, 0.0
+    for sql, params in statements:
+        started = time.perf_counter()
+        with connection_pool.checkout(pool, db_path) as conn:
+            connected = time.perf_counter()
+            frames.append(pd.read_sql_query(sql, conn, params=params))
+        connect_s += connected - started
+        query_s += time.perf_counter() - connected
+    return frames, connect_s, query_s
+
+def bench_pool(args):
+    """Times page renders with a connection per query against the read-only connection pool."""
+    conn = open_dashboard_db(args.db)
+    if conn is None:
+        return False
+    try:
+        statements = render_queries(conn)
+    finally:
+        conn.close()
+    print(f"{args.renders} renders of {len(statements)} queries on {args.db}, {args.threads} concurrent session thread(s)")
+
+    pool = connection_pool.new_pool()
+    modes = {"fresh connections": lambda: fresh_connection_render(args.db, statements),
+             "connection pool": lambda: pooled_render(pool, args.db, statements)}
+    results = {}
+    for label, render in modes.items():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            renders = list(executor.map(lambda _: render(), range(args.renders)))
+        wall_s = time.perf_counter() - started
+        results[label] = renders[-1][0]
+        connect_ms = sum(r[1] for r in renders) * 1000 / args.renders
+        query_ms = sum(r[2] for r in renders) * 1000 / args.renders
+        print(f"- {label:<18} {wall_s:7.3f}s wall, per render: connect {connect_ms:7.3f} ms, query {query_ms:8.3f} ms")
+    stats = connection_pool.pool_stats(pool)
+    print(f"Pool opened {stats['opened']} connection(s) and reused them {stats['reused']} times.")
+    connection_pool.close_pool(pool)
+
+    ok = all(fresh.equals(pooled) for fresh, pooled in zip(results["fresh connections"], results["connection pool"]))
+    print("Pooled connections return the same results." if ok else "Pooled results DIFFER.")
+    return ok
+
+def copy_tables(source_path, target_path):
+    """Rebuilds target_path from source_path one committed table at a time, like a loader filling a new database."""
+    conn = sqlite3.connect(target_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (source_path,))
+        tables = conn.execute(
+            "SELECT name, sql FROM source.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()
+        for table, create_sql in tables:
+            with conn:
+                conn.execute(create_sql)  # Unqualified: created in main
+                conn.execute(f'INSERT INTO main."{table}" SELECT * FROM source."{table}"')
+        conn.execute("DETACH DATABASE source")
+    finally:
+        conn.close()
+
+def rebuild_in_place(source_path, db_path):
+    """The former initialize_database: remove the live file, then load into it."""
+    os.remove(db_path)
+    copy_tables(source_path, db_path)
+
+def rebuild_with_swap(source_path, db_path):
+    """The pipeline's rebuild: load into a shadow file, verify it, then os.replace it over the live file."""
+    shadow_path = shadow_db.shadow_file(db_path)
+    if os.path.exists(shadow_path):
+        os.remove(shadow_path)
+    copy_tables(source_path, shadow_path)
+    return automate_pipeline.verify_database(shadow_path) and automate_pipeline.publish_database(shadow_path, db_path)
+
+def read_during_rebuilds(source_path, db_path, rebuild, rebuilds, readers):
+    """
+    Runs `rebuilds` rebuilds of db_path while `readers` threads query kpi_weekly through a connection
+    pool, as the dashboard does. Returns (reads, {error: count}, slowest read in seconds).
+    """
+    pool = connection_pool.new_pool()
+    done = threading.Event()
+    reads, errors, slowest = [0], Counter(), [0.0]
+    lock = threading.Lock()
+
+    def read_loop():
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                with connection_pool.checkout(pool, db_path) as conn:
+                    conn.execute("SELECT COUNT(*) FROM kpi_weekly").fetchone()
+                error = None
+            except (OSError, sqlite3.Error) as e:
+                error = f"{type(e).__name__}: {e}"
+            with lock:
+                reads[0] += 1
+                slowest[0] = max(slowest[0], time.perf_counter() - started)
+                if error:
+                    errors[error] += 1
+
+    with ThreadPoolExecutor(max_workers=readers) as executor:
+        futures = [executor.submit(read_loop) for _ in range(readers)]
+        try:
+            for _ in range(rebuilds):
+                rebuild(source_path, db_path)
+        finally:
+            done.set()
+        for future in futures:
+            future.result()
+    connection_pool.close_pool(pool)
+    return reads[0], errors, slowest[0]
+
+def bench_swap(args):
+    """Counts the failed dashboard reads during in-place rebuilds and during shadow-file swaps of a copy of the analytics DB."""
+    if not os.path.exists(args.db):
+        print(f"Analytics database not found at {args.db}. Run scripts/automate_pipeline.py first.")
+        return False
+    conn = sqlite3.connect(args.db)
+    try:
+        has_kpis = "kpi_weekly" in existing_tables(conn)
+    finally:
+        conn.close()
+    if not has_kpis:  # The readers query it, so every read would fail
+        print(f"{args.db} has no kpi_weekly table. Run scripts/automate_pipeline.py (or scripts/compute_kpis.py) first.")
+        return False
+    ok = True
+    modes = {"in place (remove, then load)": rebuild_in_place, "shadow file + os.replace": rebuild_with_swap}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_path = os.path.join(tmp_dir, "source.db")
+        shutil.copyfile(args.db, source_path)
+        print(f"{args.rebuilds} rebuild(s) of a copy of {args.db} under {args.readers} reader thread(s)")
+        for label, rebuild in modes.items():
+            db_path = os.path.join(tmp_dir, "live.db")
+            shutil.copyfile(source_path, db_path)
+            reads, errors, slowest_s = read_during_rebuilds(source_path, db_path, rebuild, args.rebuilds, args.readers)
+            print(f"- {label:<30} {reads:9,} reads, {sum(errors.values()):7,} failed, slowest {slowest_s * 1000:8.1f} ms")
+            for error, count in errors.most_common(3):
+                print(f"    {count:7,} x {error}")
+            if rebuild is rebuild_with_swap:
+                ok = not errors
+    print("Readers never saw a missing or half-loaded database during the swaps." if ok
+          else "Readers FAILED during the swaps.")
+    return ok
+
+# Tables an ingestion batch carries, and the KPI tables a refresh after it must leave as a full refresh would.
+INGEST_BENCH_TABLES = ["subscription_changes", "revenue", "product_usage"]
+KPI_TABLES = ["kpi_weekly", "kpi_daily", "kpi_customer_churn", "kpi_cube", "kpi_cohort_retention"]
+
+def kpi_snapshot(db_path):
+    """Rows of every KPI table, floats rounded and sorted, for comparing two refreshes."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: sorted((tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+                               for row in conn.execute(f"SELECT * FROM {table}")), key=repr)
+                for table in KPI_TABLES}
+    finally:
+        conn.close()
+
+def stale_stats(db_path):
+    """dataset_stats rows flagged stale (incremental changes do not rescan the tables)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if "stale" not in table_columns(conn, "dataset_stats"):
+            return set()
+        return {row[0] for row in conn.execute("SELECT table_name FROM dataset_stats WHERE stale")}
+    finally:
+        conn.close()
+
+def refresh_kpis_at(db_path, full_refresh=False):
+    """refresh_kpis on its own connection to db_path; returns the weeks refreshed (None if current)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return refresh_kpis(conn, full_refresh=full_refresh)
+    finally:
+        conn.close()
+
+def split_last_weeks(db_path, batch_dir, weeks):
+    """
+    Moves the rows of the last `weeks` revenue weeks out of db_path into one CSV batch per table.
+    Returns {table: all rows before the split}, the frames a full reload inserts.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        run_migrations(conn, schema="analytics")
+        cutoff_day = conn.execute(
+            "SELECT MIN(week_start_day) FROM (SELECT DISTINCT week_start_day FROM revenue "
+            "ORDER BY week_start_day DESC LIMIT ?)", (weeks,)).fetchone()[0]
+        frames = {}
+        with conn:
+            for table in INGEST_BENCH_TABLES:
+                columns = ", ".join(ingest_batches.source_columns(conn, table))
+                day_column = ingest_batches.KPI_DAY_COLUMNS[table]
+                frames[table] = pd.read_sql_query(f"SELECT {columns} FROM {table}", conn)
+                batch = pd.read_sql_query(f"SELECT {columns} FROM {table} WHERE {day_column} >= ?", conn,
+                                          params=(cutoff_day,))
+                batch.to_csv(os.path.join(batch_dir, f"{table}_new.csv"), index=False)
+                conn.execute(f"DELETE FROM {table} WHERE {day_column} >= ?", (cutoff_day,))
+        return frames
+    finally:
+        conn.close()
+
+def full_reload(db_path, frames):
+    """What ingestion replaces: reload the batch tables whole, then recompute every KPI week."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            for table, frame in frames.items():
+                conn.execute(f"DELETE FROM {table}")
+                insert_rows(conn, table, frame)
+        return refresh_kpis(conn, full_refresh=True)
+    finally:
+        conn.close()
+
+def bench_ingest(args):
+    """
+    Times a full reload against incremental ingestion of the last weeks as batches on a copy of the
+    analytics DB, and checks the KPI tables against a full refresh, re-ingestion as a no-op, and
+    that a corrected old row only refreshes its own weeks.
+    """
+    if not os.path.exists(args.db):
+        print(f"Analytics database not found at {args.db}. Run scripts/automate_pipeline.py first.")
+        return False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        batch_dir = os.path.join(tmp_dir, "batches")
+        os.mkdir(batch_dir)
+        base_path, reload_path, ingest_path = (os.path.join(tmp_dir, f"{name}.db") for name in ("base", "reload", "ingest"))
+        shutil.copyfile(args.db, base_path)
+        frames = split_last_weeks(base_path, batch_dir, args.weeks)
+        refresh_kpis_at(base_path, full_refresh=True)  # The state before the batches arrive
+        shutil.copyfile(base_path, reload_path)
+        shutil.copyfile(base_path, ingest_path)
+        batch_rows = sum(len(pd.read_csv(os.path.join(batch_dir, name))) for name in os.listdir(batch_dir))
+        print(f"Last {args.weeks} week(s) of {args.db} as batches: {batch_rows:,} rows")
+
+        started = time.perf_counter()
+        full_reload(reload_path, frames)
+        reload_s = time.perf_counter() - started
+        started = time.perf_counter()
+        ok = ingest_batches.ingest_batches(ingest_path, [batch_dir])
+        weeks = refresh_kpis_at(ingest_path)
+        ingest_s = time.perf_counter() - started
+        print(f"- full reload + full KPI refresh:        {reload_s:8.3f}s ({sum(map(len, frames.values())):,} rows)")
+        print(f"- incremental upsert + touched weeks:    {ingest_s:8.3f}s (weeks {weeks[0]} .. {weeks[1]})")
+        same = ok and kpi_snapshot(reload_path) == kpi_snapshot(ingest_path)
+        print("KPI tables match the full reload." if same else "KPI tables DIFFER from the full reload.")
+        stale = stale_stats(ingest_path)
+        stale_ok = stale == {*INGEST_BENCH_TABLES, "dataset"} and not stale_stats(reload_path)
+        print(f"dataset_stats marked stale after ingestion: {', '.join(sorted(stale)) or 'none'}; "
+              f"{'none' if not stale_stats(reload_path) else 'SOME'} after the full reload.")
+
+        repeat = ingest_batches.ingest_batches(ingest_path, [batch_dir]) and refresh_kpis_at(ingest_path) is None
+        print("Re-ingesting the batches is a no-op." if repeat else "Re-ingesting the batches CHANGED the database.")
+
+        # A late correction to one old revenue row: only its week (and the next) should be recomputed
+        corrected = frames["revenue"].iloc[[len(frames["revenue"]) // 3]].copy()
+        corrected["MRR"] = corrected["MRR"] + 1
+        corrected.to_csv(os.path.join(tmp_dir, "revenue_correction.csv"), index=False)
+        ok = ingest_batches.ingest_batches(ingest_path, [os.path.join(tmp_dir, "revenue_correction.csv")])
+        weeks = refresh_kpis_at(ingest_path)
+        shutil.copyfile(ingest_path, reload_path)
+        refresh_kpis_at(reload_path, full_refresh=True)
+        corrected_ok = ok and weeks is not None and kpi_snapshot(reload_path) == kpi_snapshot(ingest_path)
+        print(f"A correction to week {corrected['week_start'].iloc[0]} refreshed weeks {weeks[0] if weeks else None} .. "
+              f"{weeks[1] if weeks else None}; KPI tables {'match' if corrected_ok else 'DIFFER from'} a full refresh.")
+    return same and stale_ok and repeat and corrected_ok
+
+def synthetic_analytics_db(db_path, n_customers, revenue=True):
+    """
+    Builds an analytics database with the calendar, customers and (unless revenue is False) revenue
+    tables of n synthetic customers, migrated. Returns (connection, revenue rows).
+    """
+    customers = synthetic_customers(n_customers)
+    tables = {"calendar": generate_data.simulate_calendar_table(), "customers": customers}
+    if revenue:
+        tables["revenue"] = generate_data.simulate_weekly_revenue(customers)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for table_name, frame in tables.items():
+            create_table(conn, table_name, {column: TABLE_DTYPES[table_name].get(column, str) for column in frame.columns})
+            insert_rows(conn, table_name, frame)
+    run_migrations(conn, schema="analytics")
+    return conn, len(tables.get("revenue", ()))
+
+def check_cohorts(conn, run_legacy):
+    """Times a full and a one-week refresh of kpi_cohort_retention, checked against the legacy self-join."""
+    with conn:
+        cells, full_s = timed(cohort_retention.refresh_cohort_retention, conn)
+    last_week = conn.execute("SELECT MAX(activity_week_id) FROM kpi_cohort_retention").fetchone()[0]
+    with conn:
+        new_cells, week_s = timed(cohort_retention.refresh_cohort_retention, conn, last_week)
+    print(f"  - bitset engine, full matrix: {full_s:8.3f}s ({cells} cells)")
+    print(f"  - bitset engine, new week:    {week_s:8.3f}s ({new_cells} cells)")
+    if not run_legacy:
+        print("  - legacy self-join: skipped")
+        return True
+    legacy, legacy_s = timed(pd.read_sql_query, LEGACY_COHORT_RETENTION_QUERY, conn)
+    print(f"  - legacy self-join:           {legacy_s:8.3f}s ({len(legacy)} cells)")
+    engine = pd.read_sql_query(f"SELECT {', '.join(legacy.columns)} FROM kpi_cohort_retention", conn)
+    legacy['retention_percentage'] = legacy['retention_percentage'].round(9)
+    engine['retention_percentage'] = engine['retention_percentage'].round(9)
+    return len(legacy) == len(engine) and row_counter(legacy) == row_counter(engine)
+
+def check_churn(conn, run_legacy):
+    """Times the single-pass churn engine and checks the total and every plan/channel/country slice against the legacy join."""
+    with conn:
+        rows, engine_s = timed(churn_rate.refresh_churn_rates, conn)
+    segments = pd.read_sql_query(queries.CHURN_SEGMENTS_QUERY, conn)
+    print(f"  - single pass, all {len(segments)} segments: {engine_s:8.3f}s ({rows} rows)")
+    if not run_legacy:
+        print("  - legacy joins: skipped")
+        return True
+    week_range = conn.execute("SELECT MIN(week_start_date), MAX(week_start_date) FROM calendar").fetchone()
+    slices = [("all customers", {}, "customers")]
+    for column in churn_rate.SEGMENT_COLUMNS:
+        for value in sorted(segments[column].unique()):
+            slices.append((f"{column} = {value}", {column: value},
+                           f"(SELECT * FROM customers WHERE {column} = '{value}')"))
+    ok, legacy_total_s = True, 0.0
+    for label, segment, customers in slices:
+        legacy, legacy_s = timed(pd.read_sql_query, LEGACY_CHURN_RATE_QUERY.format(customers=customers), conn)
+        legacy_total_s += legacy_s
+        params = {"start_date": week_range[0], "end_date": week_range[1],
+                  **{column: segment.get(column) for column in churn_rate.SEGMENT_COLUMNS}}
+        engine = pd.read_sql_query(queries.SEGMENT_CHURN_QUERY, conn, params=params)
+        same = (len(legacy) == len(engine) and (legacy['week_start_date'] == engine['week_start_date']).all()
+                and all(np.allclose(legacy[column].astype(float), engine[column].astype(float))
+                        for column in ['active_at_start_of_week', 'churned_this_week', 'customer_churn_rate_pct']))
+        if not same:
+            print(f"  - {label}: DIFFERS")
+        ok = ok and same
+    print(f"  - legacy joins, {len(slices)} slices: {legacy_total_s:8.3f}s")
+    return ok
+
+def cube_slice(conn, cuboids, group_by, measures, filters=None):
+    query, params = olap_cube.slice_query(cuboids, group_by, measures, filters)
+    return pd.read_sql_query(query, conn, params=params)
+
+def same_values(expected, actual, columns):
+    """Same rows in the same order, numeric columns equal within float tolerance (NULL as 0)."""
+    return len(expected) == len(actual) and all(
+        np.allclose(expected[column].astype(float).fillna(0), actual[column].astype(float).fillna(0))
+        if column in olap_cube.MEASURES or column in KPI_WEEKLY_MEASURES
+        else (expected[column].to_numpy() == actual[column].to_numpy()).all()
+        for column in columns
+    )
+
+def check_cube(conn, run_raw):
+    """
+    Times a full cube build, then checks the week cuboid against kpi_weekly and every group-by
+    (and a filtered slice) answered from its smallest covering cuboid against the base cuboid.
+    """
+    with conn:
+        rows, build_s = timed(olap_cube.refresh_cube, conn)
+    cuboids = dict(conn.execute(olap_cube.CUBOIDS_QUERY).fetchall())
+    print(f"  - cube build, {len(cuboids)} cuboids: {build_s:8.3f}s ({rows} rows)")
+    ok = True
+
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'kpi_weekly'").fetchone():
+        kpis = pd.read_sql_query(f"SELECT week_start_date, {', '.join(KPI_WEEKLY_MEASURES)} FROM kpi_weekly ORDER BY 1", conn)
+        totals = cube_slice(conn, cuboids, ["week"], list(KPI_WEEKLY_MEASURES.values()))
+        totals = totals.rename(columns={measure: column for column, measure in KPI_WEEKLY_MEASURES.items()})
+        same = same_values(kpis, totals, kpis.columns)
+        print(f"  - week cuboid vs kpi_weekly: {'same' if same else 'DIFFERS'}")
+        ok = ok and same
+
+    base = olap_cube.all_cuboids()[0]
+    slice_s = 0.0
+    n_slices = 0
+    for size in range(len(olap_cube.SEGMENT_DIMENSIONS) + 1):
+        for dimensions in itertools.combinations(olap_cube.SEGMENT_DIMENSIONS, size):
+            group_by = ["week", *dimensions]
+            for measures in ([m for m in olap_cube.MEASURES if m != "ad_spend"], ["ad_spend"]):
+                chosen = olap_cube.choose_cuboid(cuboids, group_by, measures) if all(
+                    olap_cube.has_measure(olap_cube.cuboid_name(group_by), m) for m in measures) else None
+                if chosen is None:
+                    continue
+                answer, seconds = timed(cube_slice, conn, cuboids, group_by, measures)
+                slice_s += seconds
+                n_slices += 1
+                widest = base if measures != ["ad_spend"] else olap_cube.cuboid_name(["marketing_channel"])
+                expected = cube_slice(conn, {widest: cuboids[widest]}, group_by, measures)
+                same = same_values(expected, answer, answer.columns)
+                if not same:
+                    print(f"  - {', '.join(group_by)} from {chosen}: DIFFERS")
+                ok = ok and same
+    print(f"  - {n_slices} group-bys from the smallest covering cuboid: {slice_s:8.3f}s")
+
+    filtered = cube_slice(conn, cuboids, ["week", "country"], ["mrr", "new_signups"], {"plan": "Pro"})
+    expected = cube_slice(conn, {base: cuboids[base]}, ["week", "country"], ["mrr", "new_signups"], {"plan": "Pro"})
+    ok = ok and same_values(expected, filtered, filtered.columns)
+
+    if not run_raw:
+        print("  - fact-table group-bys: skipped")
+        return ok
+    raw_s = cube_s = 0.0
+    for dimension in olap_cube.SEGMENT_DIMENSIONS:
+        raw, seconds = timed(pd.read_sql_query, RAW_MRR_BREAKDOWN_QUERY.format(dimension=dimension), conn)
+        raw_s += seconds
+        answer, seconds = timed(cube_slice, conn, cuboids, ["week", dimension], ["mrr"])
+        cube_s += seconds
+        # The cube also has rows of segments without revenue that week (MRR 0)
+        both = raw.merge(answer, on=["week_start_date", dimension], how="outer", suffixes=("_raw", "_cube")).fillna(0)
+        same = np.allclose(both["mrr_raw"], both["mrr_cube"])
+        if not same:
+            print(f"  - MRR by week and {dimension}: DIFFERS from the fact tables")
+        ok = ok and same
+    print(f"  - MRR by week x each dimension, fact tables: {raw_s:8.3f}s")
+    print(f"  - MRR by week x each dimension, cube:        {cube_s:8.3f}s")
+    return ok
+
+def bench_cube(args):
+    """Checks the OLAP cube against kpi_weekly and the fact tables, and times slices against fact-table group-bys."""
+    ok = True
+    if os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+        try:
+            print(f"KPI cube on {args.db}")
+            ok = check_cube(conn, run_raw=True)
+        finally:
+            conn.close()
+    else:
+        print(f"Skipping {args.db}: not found.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_customers in args.sizes:
+            conn, revenue_rows = synthetic_analytics_db(os.path.join(tmp_dir, f"cube_{n_customers}.db"), n_customers)
+            try:
+                print(f"KPI cube on {n_customers:,} synthetic customers ({revenue_rows:,} revenue rows)")
+                ok = check_cube(conn, run_raw=True) and ok
+            finally:
+                conn.close()
+    return report_match(ok)
+
+def bench_churn(args):
+    """Checks the single-pass segment churn engine against the legacy churn-rate joins, per slice."""
+    ok = True
+    if os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+        try:
+            print(f"Customer churn on {args.db}")
+            ok = check_churn(conn, run_legacy=True)
+        finally:
+            conn.close()
+    else:
+        print(f"Skipping {args.db}: not found.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_customers in args.sizes:
+            conn, _ = synthetic_analytics_db(os.path.join(tmp_dir, f"churn_{n_customers}.db"), n_customers,
+                                             revenue=False)
+            try:
+                print(f"Customer churn on {n_customers:,} synthetic customers")
+                ok = check_churn(conn, run_legacy=n_customers <= args.legacy_max) and ok
+            finally:
+                conn.close()
+    return report_match(ok)
+
+def bench_cohorts(args):
+    """Checks the bitset cohort retention engine against the legacy self-join on the analytics DB and synthetic data."""
+    ok = True
+    if os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+        try:
+            print(f"Cohort retention on {args.db}")
+            ok = check_cohorts(conn, run_legacy=True)
+        finally:
+            conn.close()
+    else:
+        print(f"Skipping {args.db}: not found.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_customers in args.sizes:
+            conn, revenue_rows = synthetic_analytics_db(os.path.join(tmp_dir, f"cohorts_{n_customers}.db"), n_customers)
+            try:
+                print(f"Cohort retention on {n_customers:,} synthetic customers ({revenue_rows:,} revenue rows)")
+                ok = check_cohorts(conn, run_legacy=n_customers <= args.legacy_max) and ok
+            finally:
+                conn.close()
+    return report_match(ok)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks and equivalence checks for the dashboard KPI engines.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    mrr_parser = subparsers.add_parser("mrr", help="Compare the event-sweep MRR engine with the legacy cross join query.")
+    mrr_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Dashboard SQLite database (plans/subscriptions schema).")
+    mrr_parser.add_argument("--start", help="Range start, YYYY-MM-DD (defaults to the first subscription).")
+    mrr_parser.add_argument("--end", help="Range end, YYYY-MM-DD (defaults to the last subscription end or today).")
+    mrr_parser.set_defaults(func=bench_mrr)
+
+    active_parser = subparsers.add_parser("active", help="Compare the interval active-customer engine with the legacy range join query.")
+    active_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Dashboard SQLite database (plans/subscriptions schema).")
+    active_parser.add_argument("--start", help="Range start, YYYY-MM-DD (defaults to the first subscription).")
+    active_parser.add_argument("--end", help="Range end, YYYY-MM-DD (defaults to the last subscription end or today).")
+    active_parser.set_defaults(func=bench_active)
+
+    events_parser = subparsers.add_parser("events", help="Compare the columnar event classifier with the iterrows loop on synthetic data.")
+    events_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                               help="Numbers of subscription rows to benchmark.")
+    events_parser.set_defaults(func=bench_events)
+
+    revenue_parser = subparsers.add_parser("revenue", help="Compare the vectorized revenue simulation with the iterrows loop.")
+    revenue_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                help="Numbers of synthetic customers to benchmark.")
+    revenue_parser.add_argument("--legacy-max", type=int, default=20_000,
+                                help="Largest customer count the iterrows loop is run (and checked) for.")
+    revenue_parser.set_defaults(func=bench_revenue)
+
+    product_parser = subparsers.add_parser("product", help="Compare the chunked product-usage simulation with the per-week loop.")
+    product_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                                help="Numbers of synthetic customers to benchmark.")
+    product_parser.add_argument("--chunk-rows", type=int, default=generate_data.CONFIG["CHUNK_ROWS"],
+                                help="Rows per generated chunk.")
+    product_parser.add_argument("--legacy-max", type=int, default=20_000,
+                                help="Largest customer count the loop is run (and checked) for.")
+    product_parser.set_defaults(func=bench_product)
+
+    shards_parser = subparsers.add_parser("shards", help="Time and check sharded generation of subscription changes and tickets.")
+    shards_parser.add_argument("--customers", type=int, default=50_000, help="Number of synthetic customers.")
+    shards_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to run.")
+    shards_parser.add_argument("--seed", type=int, default=42, help="Seed of the sharded generators.")
+    shards_parser.set_defaults(func=bench_shards)
+
+    storage_parser = subparsers.add_parser("storage", help="Compare CSV and partitioned Parquet storage of the analytics tables.")
+    storage_parser.add_argument("--raw-dir", default=DEFAULT_RAW_DIR, help="Directory holding the generated <table>.csv files.")
+    storage_parser.add_argument("--parquet-dir", help="Where to write the Parquet tables (default: a new temporary directory).")
+    storage_parser.add_argument("--start", type=date.fromisoformat, default=date(2023, 1, 1), help="Range start, YYYY-MM-DD.")
+    storage_parser.add_argument("--end", type=date.fromisoformat, default=date(2023, 3, 31), help="Range end, YYYY-MM-DD.")
+    storage_parser.set_defaults(func=bench_storage)
+
+    buckets_parser = subparsers.add_parser("buckets", help="Compare SQL-bucketed MRR series with the resampled daily event sweep.")
+    buckets_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Dashboard SQLite database (plans/subscriptions schema).")
+    buckets_parser.add_argument("--start", help="Range start, YYYY-MM-DD (defaults to the first subscription).")
+    buckets_parser.add_argument("--end", help="Range end, YYYY-MM-DD (defaults to the last subscription end or today).")
+    buckets_parser.add_argument("--max-points", type=int, default=500, help="Per-line point cap of the LTTB downsampler.")
+    buckets_parser.set_defaults(func=bench_buckets)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Compare the in-memory snapshot mode with the SQL-backed sections.")
+    snapshot_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Dashboard SQLite database (plans/subscriptions schema).")
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    pool_parser = subparsers.add_parser("pool", help="Compare a connection per query with the dashboard's read-only connection pool.")
+    pool_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Dashboard SQLite database (plans/subscriptions schema).")
+    pool_parser.add_argument("--renders", type=int, default=50, help="Page renders to run per mode.")
+    pool_parser.add_argument("--threads", type=int, default=4, help="Concurrent session threads.")
+    pool_parser.set_defaults(func=bench_pool)
+
+    cohorts_parser = subparsers.add_parser("cohorts", help="Compare the bitset cohort retention engine with the legacy self-join view.")
+    cohorts_parser.add_argument("--db", default=DEFAULT_ANALYTICS_DB_PATH, help="Analytics SQLite database (checked in place).")
+    cohorts_parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000],
+                                help="Numbers of synthetic customers to benchmark.")
+    cohorts_parser.add_argument("--legacy-max", type=int, default=50_000,
+                                help="Largest customer count the legacy self-join is run (and checked) for.")
+    cohorts_parser.set_defaults(func=bench_cohorts)
+
+    churn_parser = subparsers.add_parser("churn", help="Compare the single-pass segment churn engine with the legacy churn-rate joins.")
+    churn_parser.add_argument("--db", default=DEFAULT_ANALYTICS_DB_PATH, help="Analytics SQLite database (checked in place).")
+    churn_parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+                              help="Numbers of synthetic customers to benchmark.")
+    churn_parser.add_argument("--legacy-max", type=int, default=1_000_000,
+                              help="Largest customer count the legacy joins are run (and checked) for.")
+    churn_parser.set_defaults(func=bench_churn)
+
+    cube_parser = subparsers.add_parser("cube", help="Check the OLAP cube's slices and time them against fact-table group-bys.")
+    cube_parser.add_argument("--db", default=DEFAULT_ANALYTICS_DB_PATH, help="Analytics SQLite database (checked in place).")
+    cube_parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000],
+                             help="Numbers of synthetic customers to benchmark.")
+    cube_parser.set_defaults(func=bench_cube)
+
+    swap_parser = subparsers.add_parser("swap", help="Count failed dashboard reads during in-place rebuilds vs. shadow-file swaps.")
+    swap_parser.add_argument("--db", default=DEFAULT_ANALYTICS_DB_PATH, help="Analytics SQLite database (copied, not modified).")
+    swap_parser.add_argument("--rebuilds", type=int, default=3, help="Rebuilds per mode.")
+    swap_parser.add_argument("--readers", type=int, default=4, help="Concurrent reader threads.")
+    swap_parser.set_defaults(func=bench_swap)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Compare incremental batch upserts with a full reload and KPI refresh.")
+    ingest_parser.add_argument("--db", default=DEFAULT_ANALYTICS_DB_PATH, help="Analytics SQLite database (copied, not modified).")
+    ingest_parser.add_argument("--weeks", type=int, default=1, help="Trailing weeks of data ingested as batches.")
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    benchmark_args = parser.parse_args()
+    exit(0 if benchmark_args.func(benchmark_args) else 1)
@@ -0,0 +1,122 @@
+# Weekly customer churn rate in one pass over customers, instead of the FULL OUTER JOIN of the
+# "active at week start" and "churned in week" views. Each customer's signup and churn week are
+# turned into calendar week indices once; two histograms (+1 the week after signup, -1 the week
+# after churn) and a cumulative sum give "active at the start of the week" for every week, and a
+# third histogram gives "churned in the week". The histograms are keyed by (plan, marketing
+# channel, country) segment as well, so every slice comes out of the same scan.
+import numpy as np
+import pandas as pd
+
+from sqlite_schema import existing_tables, table_columns  # dashboard/, put on sys.path by the importing script
+
+CHURN_RATE_SQL = ["""
+CREATE TABLE IF NOT EXISTS kpi_customer_churn (
+    week_id INTEGER NOT NULL,             -- calendar.week_id
+    week_start_date TEXT NOT NULL,        -- YYYY-MM-DD
+    plan TEXT NOT NULL,                   -- Segment of customers.plan / marketing_channel / country,
+    marketing_channel TEXT NOT NULL,      -- 'Unknown' where the column is NULL
+    country TEXT NOT NULL,
+    active_at_start_of_week INTEGER NOT NULL,  -- Signed up before the week, not churned before it
+    churned_this_week INTEGER NOT NULL,
+    PRIMARY KEY (week_id, plan, marketing_channel, country)
+)
+""", "CREATE INDEX IF NOT EXISTS idx_kpi_customer_churn_week_start ON kpi_customer_churn "
+     "(week_start_date, plan, marketing_channel, country, active_at_start_of_week, churned_this_week)"]
+SEGMENT_COLUMNS = ["plan", "marketing_channel", "country"]
+UNKNOWN_SEGMENT = "Unknown"
+
+CALENDAR_WEEKS_QUERY = """
+SELECT week_id, MIN(week_start_date) as week_start_date
+FROM calendar
+GROUP BY week_id
+ORDER BY week_id
+"""
+CHURN_CUSTOMERS_QUERY = """
+SELECT customer_id, signup_week_id, churn_week_id, {segments}
+FROM customers
+"""
+
+def churn_customers_query(conn):
+    """CHURN_CUSTOMERS_QUERY with NULL for segment columns customers lacks (sql/schema.sql has no plan or channel)."""
+    columns = table_columns(conn, "customers")
+    return CHURN_CUSTOMERS_QUERY.format(segments=", ".join(
+        column if column in columns else f"NULL as {column}" for column in SEGMENT_COLUMNS))
+
+# --- Engine ---
+def segment_histogram(segments, week_index, n_segments, n_weeks):
+    """(segments x weeks) counts of the rows whose week index lies in [0, n_weeks)."""
+    inside = (week_index >= 0) & (week_index < n_weeks)
+    flat = segments[inside] * n_weeks + week_index[inside]
+    return np.bincount(flat, minlength=n_segments * n_weeks).reshape(n_segments, n_weeks)
+
+def churn_counts(segments, customer_ids, signup_weeks, churn_weeks, first_week, n_weeks, n_segments):
+    """
+    (active at start of week, churned in week) arrays of shape (segments, weeks) for the weeks
+    first_week .. first_week + n_weeks - 1, with the definitions of the former views: a customer is
+    active at the start of week w if signup_week < w <= churn_week (no churn: open-ended), and
+    churned customers are counted once per week. Week arrays are float with NaN for NULL.
+    """
+    has_signup = ~np.isnan(signup_weeks)
+    churned = ~np.isnan(churn_weeks)
+    signup = np.where(has_signup, signup_weeks, 0).astype(np.int64)
+    churn = np.where(churned, churn_weeks, 0).astype(np.int64)
+
+    # Signups before the first calendar week are already active in it: clip their +1 to index 0
+    starts = has_signup & (~churned | (churn > signup))
+    ends = has_signup & churned & (churn > signup)
+    deltas = (segment_histogram(segments[starts], np.maximum(signup[starts] + 1 - first_week, 0), n_segments, n_weeks)
+              - segment_histogram(segments[ends], np.maximum(churn[ends] + 1 - first_week, 0), n_segments, n_weeks))
+    active = np.cumsum(deltas, axis=1)
+
+    # COUNT(DISTINCT customer_id) per churn week
+    churn_rows = pd.DataFrame({"customer_id": customer_ids[churned], "week": churn[churned],
+                               "segment": segments[churned]}).drop_duplicates(["customer_id", "week"])
+    churned_in_week = segment_histogram(churn_rows["segment"].to_numpy(), churn_rows["week"].to_numpy() - first_week,
+                                        n_segments, n_weeks)
+    return active, churned_in_week
+
+def compute_churn_rates(conn):
+    """
+    Active-at-start and churned counts for every calendar week and (plan, channel, country)
+    segment present in customers, as a DataFrame in the column order of kpi_customer_churn.
+    """
+    weeks = pd.read_sql_query(CALENDAR_WEEKS_QUERY, conn)
+    customers = pd.read_sql_query(churn_customers_query(conn), conn)
+    segment_values = customers[SEGMENT_COLUMNS].astype(object).fillna(UNKNOWN_SEGMENT)
+    segment_codes = segment_values.groupby(SEGMENT_COLUMNS, sort=True).ngroup().to_numpy(dtype=np.int64)
+    labels = segment_values.drop_duplicates().sort_values(SEGMENT_COLUMNS)  # In the order of the group numbers
+    if weeks.empty or labels.empty:
+        return pd.DataFrame(columns=["week_id", "week_start_date", *SEGMENT_COLUMNS,
+                                     "active_at_start_of_week", "churned_this_week"])
+
+    week_ids = weeks['week_id'].to_numpy(dtype=np.int64)
+    first_week, n_weeks = int(week_ids[0]), int(week_ids[-1] - week_ids[0] + 1)  # Dense index, gaps included
+    active, churned = churn_counts(
+        segment_codes, customers['customer_id'].to_numpy(),
+        customers['signup_week_id'].to_numpy(dtype=np.float64), customers['churn_week_id'].to_numpy(dtype=np.float64),
+        first_week, n_weeks, len(labels),
+    )
+    week_index = week_ids - first_week
+    n_segments = len(labels)
+    return pd.DataFrame({
+        "week_id": np.tile(week_ids, n_segments),
+        "week_start_date": np.tile(weeks['week_start_date'].to_numpy(dtype=object), n_segments),
+        **{column: np.repeat(labels[column].to_numpy(dtype=object), len(week_ids)) for column in SEGMENT_COLUMNS},
+        "active_at_start_of_week": active[:, week_index].ravel(),
+        "churned_this_week": churned[:, week_index].ravel(),
+    })
+
+def refresh_churn_rates(conn):
+    """Rewrites kpi_customer_churn in the caller's transaction. Returns the number of rows written."""
+    if not {"calendar", "customers"} <= existing_tables(conn):
+        return 0  # Not loaded (e.g. a partial CSV load)
+    for statement in CHURN_RATE_SQL:
+        conn.execute(statement)
+    rates = compute_churn_rates(conn)
+    conn.execute("DELETE FROM kpi_customer_churn")
+    conn.executemany(
+        f"INSERT INTO kpi_customer_churn (week_id, week_start_date, {', '.join(SEGMENT_COLUMNS)}, "
+        "active_at_start_of_week, churned_this_week) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        zip(*(rates[column].tolist() for column in rates.columns))  # tolist: Python ints sqlite3 can bind
+    )
+    return len(rates)
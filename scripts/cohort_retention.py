@@ -0,0 +1,169 @@
+# Weekly cohort retention from packed bitsets instead of the v_weekly_cohort_retention_summary
+# self-join. Customers get dense bit positions; each signup cohort and each activity week
+# (customers with MRR > 0) is a NumPy-packed bitset, and the customers of cohort c retained in
+# week w are the popcount of the intersection of the two. A bitset only stores the byte span
+# between its lowest and highest member (roaring-style), so the intersection of a cohort with a
+# week touches only the ids of that cohort. Refreshing from a week on re-reads only the revenue
+# rows of those weeks: appending a week computes one new diagonal of the triangular matrix.
+import numpy as np
+
+from sqlite_schema import existing_tables  # dashboard/, put on sys.path by the importing script
+
+COHORT_RETENTION_SQL = ["""
+CREATE TABLE IF NOT EXISTS kpi_cohort_retention (
+    cohort_week_id INTEGER NOT NULL,      -- calendar.week_id of the signup week
+    week_number_after_signup INTEGER NOT NULL,
+    activity_week_id INTEGER NOT NULL,    -- cohort_week_id + week_number_after_signup
+    cohort_week TEXT NOT NULL,            -- YYYY-MM-DD, calendar.week_start_date of the signup week
+    cohort_size INTEGER NOT NULL,
+    retained_customers INTEGER NOT NULL,  -- Cohort members with MRR > 0 in the activity week
+    retention_percentage REAL NOT NULL,
+    PRIMARY KEY (cohort_week_id, week_number_after_signup)
+)
+""", "CREATE INDEX IF NOT EXISTS idx_kpi_cohort_retention_activity ON kpi_cohort_retention (activity_week_id)"]
+
+# The customers of each calendar week's cohort (the view's cohort_base) and of each activity week.
+# One row per week: reading the ids as one comma-separated string per week instead of one row
+# per (customer, week) is what keeps the load fast on millions of revenue rows.
+COHORT_MEMBERS_SQL = """
+SELECT c.signup_week_id as cohort_week_id, cal.cohort_week, GROUP_CONCAT({key}) as customer_ids
+FROM customers c{join}
+JOIN (
+    SELECT week_id, MIN(week_start_date) as cohort_week
+    FROM calendar
+    GROUP BY week_id
+) cal ON c.signup_week_id = cal.week_id
+GROUP BY c.signup_week_id
+"""
+ACTIVE_WEEKS_SQL = """
+SELECT c.week_id, GROUP_CONCAT({key}) as customer_ids
+FROM revenue c{join}
+WHERE c.MRR > 0 AND c.week_id >= :from_week
+GROUP BY c.week_id
+"""
+# The generated data has integer customer ids, read as they are. Text ids (the sample rows of
+# sql/schema.sql, e.g. 'cust_001') are numbered in a temporary table first.
+TEXT_KEYS_SQL = [
+    "CREATE TEMP TABLE IF NOT EXISTS cohort_customer_keys (customer_id PRIMARY KEY, customer_key INTEGER NOT NULL)",
+    "DELETE FROM temp.cohort_customer_keys",
+    "INSERT INTO temp.cohort_customer_keys SELECT customer_id, ROW_NUMBER() OVER (ORDER BY customer_id) FROM customers",
+]
+
+def cohort_queries(text_ids=False):
+    """(cohort members query, activity weeks query) for integer or text customer ids."""
+    if text_ids:
+        key, join = "k.customer_key", "\nJOIN temp.cohort_customer_keys k ON k.customer_id = c.customer_id"
+    else:
+        key, join = "CAST(c.customer_id AS INTEGER)", ""
+    return COHORT_MEMBERS_SQL.format(key=key, join=join), ACTIVE_WEEKS_SQL.format(key=key, join=join)
+
+COHORT_MEMBERS_QUERY, ACTIVE_WEEKS_QUERY = cohort_queries()
+
+def has_text_ids(conn):
+    return conn.execute("SELECT 1 FROM customers WHERE typeof(customer_id) != 'integer' LIMIT 1").fetchone() is not None
+
+# --- Bitsets ---
+def bitset(bit_positions):
+    """(first byte, packed bits) holding the given bit positions; only the bytes from the lowest to the highest are stored."""
+    if len(bit_positions) == 0:
+        return 0, np.zeros(0, dtype=np.uint8)
+    first_byte = int(bit_positions.min()) // 8
+    bits = np.zeros(int(bit_positions.max()) + 1 - first_byte * 8, dtype=bool)
+    bits[bit_positions - first_byte * 8] = True
+    return first_byte, np.packbits(bits)
+
+# Set bits of every byte value: the popcount path for NumPy 1.x, which has no np.bitwise_count.
+BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+def popcount(packed):
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return int(np.bitwise_count(packed).sum())
+    return int(BYTE_POPCOUNT[packed].sum(dtype=np.int64))
+
+def intersection_count(a, b):
+    """Members two bitsets have in common: the popcount of their AND over the overlapping bytes."""
+    (a_first, a_bits), (b_first, b_bits) = a, b
+    start, stop = max(a_first, b_first), min(a_first + len(a_bits), b_first + len(b_bits))
+    if stop <= start:
+        return 0
+    return popcount(a_bits[start - a_first:stop - a_first] & b_bits[start - b_first:stop - b_first])
+
+def id_list(text):
+    """A GROUP_CONCAT of integer ids as an int64 array."""
+    return np.fromstring(text, dtype=np.int64, sep=',')
+
+# --- Engine ---
+def load_cohorts(conn, members_query=COHORT_MEMBERS_QUERY):
+    """
+    The cohorts of the calendar weeks. Returns (sorted customer ids, whose index is their bit position,
+    {cohort_week_id: (cohort_week, cohort_size, bitset)}).
+    """
+    members = [(int(cohort_week_id), cohort_week, id_list(ids))
+               for cohort_week_id, cohort_week, ids in conn.execute(members_query)]
+    customer_ids = np.unique(np.concatenate([ids for _, _, ids in members])) if members else np.zeros(0, np.int64)
+    cohorts = {}
+    for cohort_week_id, cohort_week, ids in members:
+        cohort_bits = bitset(np.searchsorted(customer_ids, ids))
+        cohorts[cohort_week_id] = (cohort_week, popcount(cohort_bits[1]), cohort_bits)
+    return customer_ids, cohorts
+
+def load_active_weeks(conn, customer_ids, from_week_id, active_weeks_query=ACTIVE_WEEKS_QUERY):
+    """{activity week_id: bitset of the cohort members with MRR > 0 that week} for the weeks from from_week_id on."""
+    active_weeks = {}
+    if len(customer_ids) == 0:
+        return active_weeks
+    for week_id, ids in conn.execute(active_weeks_query, {"from_week": from_week_id}):
+        ids = id_list(ids)
+        bit_positions = np.minimum(np.searchsorted(customer_ids, ids), len(customer_ids) - 1)
+        member = customer_ids[bit_positions] == ids  # Revenue of customers outside every cohort never counts
+        active_weeks[int(week_id)] = bitset(bit_positions[member])
+    return active_weeks
+
+def retention_cells(cohorts, active_weeks):
+    """
+    Rows of the retention matrix for the given activity weeks: every cohort that signed up in or
+    before the week and kept at least one customer active, as the view returns them.
+    """
+    rows = []
+    for activity_week_id, week_bits in sorted(active_weeks.items()):
+        for cohort_week_id, (cohort_week, cohort_size, cohort_bits) in cohorts.items():
+            if cohort_week_id > activity_week_id:
+                continue
+            retained = intersection_count(cohort_bits, week_bits)
+            if retained:
+                rows.append((cohort_week_id, activity_week_id - cohort_week_id, activity_week_id, cohort_week,
+                             cohort_size, retained, retained / cohort_size * 100))
+    return rows
+
+def refresh_cohort_retention(conn, from_week_id=None):
+    """
+    Rewrites the kpi_cohort_retention cells whose activity week is from_week_id or later (all of
+    them if None, or if the table is still empty) in the caller's transaction. New customers only
+    join cohorts of weeks from their signup week on, so the earlier cells stay valid.
+    Returns the number of cells written.
+    """
+    if not {"calendar", "customers", "revenue"} <= existing_tables(conn):
+        return 0  # Not loaded (e.g. a partial CSV load)
+    for statement in COHORT_RETENTION_SQL:
+        conn.execute(statement)
+    if from_week_id is None or not conn.execute("SELECT 1 FROM kpi_cohort_retention LIMIT 1").fetchone():
+        conn.execute("DELETE FROM kpi_cohort_retention")
+        from_week_id = conn.execute("SELECT MIN(week_id) FROM revenue").fetchone()[0]
+        if from_week_id is None:
+            return 0
+    else:
+        conn.execute("DELETE FROM kpi_cohort_retention WHERE activity_week_id >= ?", (from_week_id,))
+
+    text_ids = has_text_ids(conn)
+    if text_ids:
+        for statement in TEXT_KEYS_SQL:
+            conn.execute(statement)
+    members_query, active_weeks_query = cohort_queries(text_ids)
+    customer_ids, cohorts = load_cohorts(conn, members_query)
+    rows = retention_cells(cohorts, load_active_weeks(conn, customer_ids, from_week_id, active_weeks_query))
+    conn.executemany(
+        "INSERT INTO kpi_cohort_retention (cohort_week_id, week_number_after_signup, activity_week_id, cohort_week, "
+        "cohort_size, retained_customers, retention_percentage) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    return len(rows)
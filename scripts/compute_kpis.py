@@ -0,0 +1,380 @@
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard"))
+from data_version import stamp_data_version  # noqa: E402
+from dataset_stats import mark_dataset_stats_stale, refresh_dataset_stats  # noqa: E402
+from churn_rate import refresh_churn_rates  # noqa: E402
+from cohort_retention import refresh_cohort_retention  # noqa: E402
+from olap_cube import refresh_cube  # noqa: E402
+from sqlite_schema import existing_tables  # noqa: E402
+
+# --- Configuration ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas_analytics.db")
+
+KPI_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS kpi_weekly (
+    week_start_date TEXT PRIMARY KEY,     -- YYYY-MM-DD, calendar.week_start_date
+    month INTEGER,
+    quarter INTEGER,
+    year INTEGER,
+    total_mrr REAL,
+    net_new_mrr REAL,
+    new_mrr REAL,
+    expansion_mrr REAL,
+    contraction_mrr REAL,                 -- Negative or zero
+    churned_mrr REAL,                     -- Negative or zero
+    active_customers INTEGER,
+    new_signups INTEGER,
+    active_at_start_of_week INTEGER,
+    churned_this_week INTEGER,
+    customer_churn_rate_pct REAL,
+    gross_revenue_churn_rate_pct REAL,
+    total_ad_spend REAL,
+    overall_cac REAL,
+    avg_sessions_per_active_customer REAL
+);
+
+CREATE TABLE IF NOT EXISTS kpi_daily (
+    date TEXT PRIMARY KEY,                -- YYYY-MM-DD
+    new_mrr REAL,
+    expansion_mrr REAL,
+    contraction_mrr REAL,                 -- Negative or zero
+    churned_mrr REAL,                     -- Negative or zero
+    net_new_mrr REAL,
+    new_signups INTEGER,
+    churned_customers INTEGER
+);
+
+-- High-watermark per source table: the largest key already reflected in the KPI tables.
+CREATE TABLE IF NOT EXISTS kpi_watermarks (
+    source_table TEXT PRIMARY KEY,
+    watermark_column TEXT NOT NULL,
+    high_watermark,                       -- No type affinity: keeps integer ids and date strings as loaded
+    refreshed_at TEXT NOT NULL
+);
+"""
+
+# For each source: the watermark column, and the first/last day number touched by a row
+# (integer *_day columns added by migration 2, see scripts/migrations.py).
+# A new customer changes "active at start of week" from signup until churn (or indefinitely).
+OPEN_END_DAY = 2147483647
+WATERMARK_SOURCES = [
+    ("subscription_changes", "event_id", "event_day", "event_day"),
+    ("revenue", "week_start", "week_start_day", "week_start_day"),
+    ("product_usage", "week_start", "week_start_day", "week_start_day"),
+    ("marketing", "week_start", "week_start_day", "week_start_day"),
+    ("customers", "customer_id", "signup_day", f"COALESCE(churn_day, {OPEN_END_DAY})"),
+]
+
+# Same definitions as v_weekly_dashboard_summary (sql/create_views.sql), restricted to the
+# calendar weeks with week_id in [:first_week, :last_week] so only those weeks are recomputed.
+KPI_WEEKLY_SQL = """
+INSERT INTO kpi_weekly
+WITH weeks AS (
+    SELECT week_id, MIN(week_start_date) as week_start_date, MIN(month) as month, MIN(quarter) as quarter, MIN(year) as year
+    FROM calendar
+    WHERE week_id BETWEEN :first_week AND :last_week
+    GROUP BY week_id
+),
+weekly_revenue AS (
+    SELECT
+        week_id,
+        SUM(MRR) as total_mrr,
+        COUNT(DISTINCT CASE WHEN MRR > 0 THEN customer_id END) as active_customers
+    FROM revenue
+    WHERE week_id BETWEEN :first_week - 1 AND :last_week -- Previous week feeds the LAG
+    GROUP BY week_id
+),
+revenue_with_prev AS (
+    SELECT
+        week_id,
+        total_mrr,
+        active_customers,
+        LAG(total_mrr, 1, 0) OVER (ORDER BY week_id) as mrr_at_start_of_week
+    FROM weekly_revenue
+),
+mrr_components AS (
+    SELECT
+        week_id,
+        SUM(CASE WHEN event_type = 'trial_conversion' THEN mrr_change ELSE 0 END) as new_mrr,
+        SUM(CASE WHEN event_type = 'upgrade' THEN mrr_change ELSE 0 END) as expansion_mrr,
+        SUM(CASE WHEN event_type = 'downgrade' THEN mrr_change ELSE 0 END) as contraction_mrr,
+        SUM(CASE WHEN event_type = 'cancellation_processed' AND mrr_change < 0 THEN mrr_change ELSE 0 END) as churned_mrr
+    FROM subscription_changes
+    WHERE week_id BETWEEN :first_week AND :last_week
+    GROUP BY week_id
+),
+signups AS (
+    SELECT signup_week_id as week_id, COUNT(DISTINCT customer_id) as new_signups
+    FROM customers
+    WHERE signup_week_id BETWEEN :first_week AND :last_week
+    GROUP BY signup_week_id
+),
+-- Active at the start of the week and churned in it, summed over the segments of kpi_customer_churn
+-- (scripts/churn_rate.py), which refresh_kpis rewrites first.
+churn AS (
+    SELECT week_id, SUM(active_at_start_of_week) as active_at_start_of_week, SUM(churned_this_week) as churned_this_week
+    FROM kpi_customer_churn
+    WHERE week_id BETWEEN :first_week AND :last_week
+    GROUP BY week_id
+),
+spend AS (
+    SELECT week_id, SUM(ad_spend) as total_ad_spend
+    FROM marketing
+    WHERE week_id BETWEEN :first_week AND :last_week
+    GROUP BY week_id
+),
+engagement AS (
+    SELECT week_id, SUM(sessions) as total_sessions
+    FROM product_usage
+    WHERE week_id BETWEEN :first_week AND :last_week
+    GROUP BY week_id
+)
+SELECT
+    w.week_start_date,
+    w.month,
+    w.quarter,
+    w.year,
+    COALESCE(r.total_mrr, 0) as total_mrr,
+    COALESCE(m.new_mrr + m.expansion_mrr + m.contraction_mrr + m.churned_mrr, 0) as net_new_mrr,
+    COALESCE(m.new_mrr, 0) as new_mrr,
+    COALESCE(m.expansion_mrr, 0) as expansion_mrr,
+    COALESCE(m.contraction_mrr, 0) as contraction_mrr,
+    COALESCE(m.churned_mrr, 0) as churned_mrr,
+    COALESCE(r.active_customers, 0) as active_customers,
+    COALESCE(s.new_signups, 0) as new_signups,
+    COALESCE(c.active_at_start_of_week, 0) as active_at_start_of_week,
+    COALESCE(c.churned_this_week, 0) as churned_this_week,
+    CASE
+        WHEN c.active_at_start_of_week > 0
+        THEN (CAST(COALESCE(c.churned_this_week, 0) AS REAL) / c.active_at_start_of_week) * 100
+        ELSE 0
+    END as customer_churn_rate_pct,
+    CASE
+        WHEN r.mrr_at_start_of_week > 0
+        THEN (ABS(CAST(COALESCE(m.churned_mrr, 0) AS REAL)) / r.mrr_at_start_of_week) * 100
+        ELSE 0
+    END as gross_revenue_churn_rate_pct,
+    COALESCE(sp.total_ad_spend, 0) as total_ad_spend,
+    CASE WHEN s.new_signups > 0 THEN COALESCE(sp.total_ad_spend / s.new_signups, 0) ELSE 0 END as overall_cac,
+    CASE
+        WHEN r.active_customers > 0
+        THEN COALESCE(CAST(e.total_sessions AS REAL) / r.active_customers, 0)
+        ELSE 0
+    END as avg_sessions_per_active_customer
+FROM weeks w
+LEFT JOIN revenue_with_prev r ON w.week_id = r.week_id
+LEFT JOIN mrr_components m ON w.week_id = m.week_id
+LEFT JOIN signups s ON w.week_id = s.week_id
+LEFT JOIN churn c ON w.week_id = c.week_id
+LEFT JOIN spend sp ON w.week_id = sp.week_id
+LEFT JOIN engagement e ON w.week_id = e.week_id
+ORDER BY w.week_id;
+"""
+
+# One row per day number in [:first_day, :last_day]; the aggregates are grouped per day, not joined per day.
+KPI_DAILY_SQL = """
+INSERT INTO kpi_daily
+WITH RECURSIVE days(day) AS (
+    SELECT :first_day
+    UNION ALL
+    SELECT day + 1
+    FROM days
+    WHERE day < :last_day
+),
+daily_changes AS (
+    SELECT
+        event_day as day,
+        SUM(CASE WHEN event_type = 'trial_conversion' THEN mrr_change ELSE 0 END) as new_mrr,
+        SUM(CASE WHEN event_type = 'upgrade' THEN mrr_change ELSE 0 END) as expansion_mrr,
+        SUM(CASE WHEN event_type = 'downgrade' THEN mrr_change ELSE 0 END) as contraction_mrr,
+        SUM(CASE WHEN event_type = 'cancellation_processed' AND mrr_change < 0 THEN mrr_change ELSE 0 END) as churned_mrr
+    FROM subscription_changes
+    WHERE event_day BETWEEN :first_day AND :last_day
+    GROUP BY event_day
+),
+daily_signups AS (
+    SELECT signup_day as day, COUNT(DISTINCT customer_id) as new_signups
+    FROM customers
+    WHERE signup_day BETWEEN :first_day AND :last_day
+    GROUP BY signup_day
+),
+daily_churns AS (
+    SELECT churn_day as day, COUNT(DISTINCT customer_id) as churned_customers
+    FROM customers
+    WHERE churn_day BETWEEN :first_day AND :last_day
+    GROUP BY churn_day
+)
+SELECT
+    DATE(d.day + 2440587.5), -- Day number back to YYYY-MM-DD
+    COALESCE(dc.new_mrr, 0),
+    COALESCE(dc.expansion_mrr, 0),
+    COALESCE(dc.contraction_mrr, 0),
+    COALESCE(dc.churned_mrr, 0),
+    COALESCE(dc.new_mrr + dc.expansion_mrr + dc.contraction_mrr + dc.churned_mrr, 0),
+    COALESCE(ds.new_signups, 0),
+    COALESCE(dch.churned_customers, 0)
+FROM days d
+LEFT JOIN daily_changes dc ON d.day = dc.day
+LEFT JOIN daily_signups ds ON d.day = ds.day
+LEFT JOIN daily_churns dch ON d.day = dch.day
+ORDER BY d.day;
+"""
+
+# --- Helper Functions ---
+def read_watermarks(conn):
+    """Returns {source_table: high_watermark} as stored by the last refresh."""
+    return dict(conn.execute("SELECT source_table, high_watermark FROM kpi_watermarks"))
+
+def write_watermarks(conn, tables):
+    """Stores the current maximum of every watermark column."""
+    refreshed_at = datetime.now().isoformat(timespec='seconds')
+    for source_table, column, _, _ in WATERMARK_SOURCES:
+        if source_table not in tables:
+            continue
+        high_watermark = conn.execute(f"SELECT MAX({column}) FROM {source_table}").fetchone()[0]
+        conn.execute(
+            "INSERT OR REPLACE INTO kpi_watermarks (source_table, watermark_column, high_watermark, refreshed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (source_table, column, high_watermark, refreshed_at)
+        )
+
+def pending_ingest_span(conn, tables):
+    """
+    First and last day number touched by ingested batches no KPI refresh has covered yet
+    (ingest_manifest, see scripts/ingest_batches.py). Upserts can rewrite rows below the watermarks.
+    """
+    if "ingest_manifest" not in tables:
+        return None, None
+    return conn.execute("SELECT MIN(first_day), MAX(last_day) FROM ingest_manifest WHERE kpi_refreshed_at IS NULL").fetchone()
+
+def mark_ingest_refreshed(conn, tables):
+    """Records in ingest_manifest that the pending batches are now reflected in the KPI tables."""
+    if "ingest_manifest" in tables:
+        conn.execute("UPDATE ingest_manifest SET kpi_refreshed_at = ? WHERE kpi_refreshed_at IS NULL",
+                     (datetime.now().isoformat(timespec='seconds'),))
+
+def new_row_spans(conn, watermarks, tables):
+    """
+    {source_table: (first day, last day)} of the rows beyond the stored watermarks, for the sources
+    that have any. A source without a watermark has never been materialized, so all of its rows count as new.
+    """
+    spans = {}
+    for source_table, column, first_expr, last_expr in WATERMARK_SOURCES:
+        if source_table not in tables:
+            continue
+        query = f"SELECT MIN({first_expr}), MAX({last_expr}) FROM {source_table}"
+        if source_table in watermarks:
+            low, high = conn.execute(f"{query} WHERE {column} > ?", (watermarks[source_table],)).fetchone()
+        else:
+            low, high = conn.execute(query).fetchone()
+        if low is not None:
+            spans[source_table] = (low, high)
+    return spans
+
+def touched_day_span(conn, new_rows, tables):
+    """
+    Earliest and latest day number touched by the new rows (new_row_spans) or by pending
+    ingested batches, or None if nothing is new.
+    """
+    first, last = pending_ingest_span(conn, tables)
+    for low, high in new_rows.values():
+        first = low if first is None else min(first, low)
+        last = high if last is None else max(last, high)
+    return None if first is None else (first, last)
+
+def weeks_for_span(conn, first_day, last_day):
+    """
+    Maps a day span to the calendar week_ids to recompute: from the week containing first_day
+    through the week after the one containing last_day (its revenue churn rate LAGs this week).
+    """
+    cal_first, cal_last = conn.execute("SELECT MIN(week_id), MAX(week_id) FROM calendar").fetchone()
+    if cal_first is None:
+        return None
+    first_week = conn.execute(
+        "SELECT MAX(week_id) FROM calendar WHERE week_start_day <= ?", (first_day,)
+    ).fetchone()[0]
+    last_week = conn.execute(
+        "SELECT MIN(week_id) FROM calendar WHERE week_start_day > ?", (last_day,)
+    ).fetchone()[0]
+    return (cal_first if first_week is None else first_week), (cal_last if last_week is None else last_week)
+
+# --- Materialization ---
+def refresh_kpis(conn, full_refresh=False):
+    """
+    Refreshes kpi_weekly, kpi_daily, kpi_customer_churn, kpi_cube and kpi_cohort_retention inside
+    one transaction. Without full_refresh only the weeks touched by rows past the stored watermarks
+    or by ingested batches not yet refreshed are deleted and recomputed (for the retention matrix: the cells of those activity weeks and later);
+    kpi_customer_churn is rewritten whole from one pass over customers.
+    Returns the (first_week, last_week) start dates refreshed, or None if already current.
+    """
+    conn.executescript(KPI_TABLES_SQL)
+    tables = existing_tables(conn)
+    watermarks = {} if full_refresh else read_watermarks(conn)
+
+    new_rows = new_row_spans(conn, watermarks, tables)
+    span = touched_day_span(conn, new_rows, tables)
+    if span is None:
+        print("KPI tables are up to date; nothing to refresh.")
+        return None
+    weeks = weeks_for_span(conn, *span)
+    if weeks is None:
+        print("Calendar table is empty; cannot materialize KPIs.")
+        return None
+    first_week_id, last_week_id = weeks
+    first_week, first_day = conn.execute(
+        "SELECT MIN(week_start_date), MIN(week_start_day) FROM calendar WHERE week_id = ?", (first_week_id,)
+    ).fetchone()
+    last_week, last_day = conn.execute(
+        "SELECT MIN(week_start_date), MAX(week_end_day) FROM calendar WHERE week_id = ?", (last_week_id,)
+    ).fetchone()
+    week_params = {"first_week": first_week_id, "last_week": last_week_id}
+    day_params = {"first_day": first_day, "last_day": last_day}
+
+    with conn:
+        if full_refresh:
+            conn.execute("DELETE FROM kpi_weekly")
+            conn.execute("DELETE FROM kpi_daily")
+        else:
+            conn.execute("DELETE FROM kpi_weekly WHERE week_start_date BETWEEN ? AND ?", (first_week, last_week))
+            conn.execute("DELETE FROM kpi_daily WHERE date BETWEEN DATE(? + 2440587.5) AND DATE(? + 2440587.5)",
+                         (first_day, last_day))
+        refresh_churn_rates(conn)  # One pass over customers; kpi_weekly reads its counts
+        conn.execute(KPI_WEEKLY_SQL, week_params)
+        conn.execute(KPI_DAILY_SQL, day_params)
+        cube_rows = refresh_cube(conn, *((None, None) if full_refresh else weeks))
+        cohort_cells = refresh_cohort_retention(conn, None if full_refresh else first_week_id)
+        write_watermarks(conn, tables)
+        mark_ingest_refreshed(conn, tables)
+        if full_refresh:
+            refresh_dataset_stats(conn, "analytics")
+        else:
+            mark_dataset_stats_stale(conn, new_rows)  # Rescanning every table would dominate a one-week refresh
+        stamp_data_version(conn, "kpi_refresh")  # Invalidates the dashboard's cached results
+
+    print(f"{'Fully refreshed' if full_refresh else 'Refreshed'} KPI tables for weeks {first_week} .. {last_week} "
+          f"({cube_rows} cube rows, {cohort_cells} cohort retention cells).")
+    return first_week, last_week
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Materializes the KPI tables (kpi_weekly, kpi_daily, kpi_customer_churn, kpi_cube, kpi_cohort_retention) from the raw analytics tables."
+    )
+    parser.add_argument("--db", default=DB_PATH, help="Analytics SQLite database.")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Recompute every week instead of only the weeks touched since the last refresh.")
+    kpi_args = parser.parse_args()
+
+    if not os.path.exists(kpi_args.db):
+        print(f"Error: database not found at {kpi_args.db}")
+        exit(1)
+    kpi_conn = sqlite3.connect(kpi_args.db)
+    try:
+        refresh_kpis(kpi_conn, full_refresh=kpi_args.full_refresh)
+    finally:
+        kpi_conn.close()
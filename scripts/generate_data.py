@@ -2,9 +2,22 @@ import pandas as pd
 import numpy as np
 from faker import Faker
 from datetime import timedelta, datetime
+import argparse
 import random
 import os
-import sqlite3
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource  # Unix only; used for the peak-RSS report
+except ImportError:
+    resource = None
+
+from load_to_db import bulk_load
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard"))
+import parquet_store
 
 fake = Faker()
 np.random.seed(42)
@@ -21,10 +34,40 @@ CONFIG = {
     "SUPPORT_TICKET_CHANNELS": ["Email", "Chat", "Phone", "Forum"],
     "SUPPORT_TICKET_ISSUE_TYPES": ["Billing Inquiry", "Technical Glitch", "Feature Request", "Password Reset", "How-to Question", "Bug Report"],
     "TRIAL_PERIOD_DAYS": 14,
+    # Volume and shape of the simulation; --scale-factor and --profile override these
+    "SCALE_FACTOR": 1,  # Multiplies weekly signups (and so every per-customer table) and marketing ad sets
+    "SIGNUP_BASE": 50,  # Mean weekly signups at SF1, before seasonality and growth
+    "SIGNUP_SEASONALITY": 30,
+    "SIGNUP_GROWTH": 0.75,  # Relative growth of weekly signups over the simulated period
+    "PLAN_WEIGHTS": [0.6, 0.3, 0.1],
+    "CHURN_SCALE_WEEKS": 52,  # Mean customer lifetime
+    "OPEN_CHURN_SHARE": 0.7,  # Share of churns past the simulated period left without a churn date
+    "PLAN_CHANGES_MAX": 2,  # Upgrades/downgrades attempted per converted customer: 0..max
+    "PLAN_CHANGE_ACTIONS": ["upgrade", "downgrade"],  # Drawn uniformly; repeat an action to weight it
+    "PLAN_CHANGE_GAP_DAYS": (30, 365),
+    "TICKETS_PER_CUSTOMER": 1,  # Poisson mean
     "DATA_OUTPUT_PATH": "data/raw",
-    "SQLITE_DB_PATH": "data/sqlite/saas_analytics.db"
+    "PARQUET_OUTPUT_PATH": "data/parquet",
+    "SQLITE_DB_PATH": "data/sqlite/saas_analytics.db",
+    "CHUNK_ROWS": 500_000,  # Default rows per generated batch
+    "SHARD_CUSTOMERS": 5_000,  # Customers per shard in sharded generation (--workers); fixed so shards do not depend on N
+    "BATCH_ROW_BYTES": 600  # Rough memory per batch row: the DataFrame plus its CSV/Parquet/SQLite copies
+}
+
+# Named load profiles: overrides of the CONFIG simulation parameters above.
+LOAD_PROFILES = {
+    "steady_growth": {},  # The defaults
+    "high_churn": {"CHURN_SCALE_WEEKS": 16, "OPEN_CHURN_SHARE": 0.3, "TICKETS_PER_CUSTOMER": 2},
+    "upgrade_heavy": {"PLAN_WEIGHTS": [0.8, 0.15, 0.05], "PLAN_CHANGES_MAX": 5,
+                      "PLAN_CHANGE_ACTIONS": ["upgrade", "upgrade", "upgrade", "downgrade"],
+                      "PLAN_CHANGE_GAP_DAYS": (14, 120)},
 }
 
+def configure(scale_factor=1, profile="steady_growth"):
+    """Applies a scale factor and a load profile to CONFIG. SF1 with steady_growth is the original dataset."""
+    CONFIG.update(LOAD_PROFILES[profile])
+    CONFIG["SCALE_FACTOR"] = scale_factor
+
 # Simulate weekly cohorts
 def simulate_weekly_signups():
     """
@@ -41,16 +84,16 @@ def simulate_weekly_signups():
     customer_id = 1
     for week in range(CONFIG["NUM_WEEKS"]):
         # Seasonality: more signups in Q1 and Q4
-        base_signups = 50 + 30 * np.sin(2 * np.pi * week / 52)
-        growth = 1 + (week / CONFIG["NUM_WEEKS"]) * 0.75  # gradual growth
-        n_signups = int(np.random.poisson(base_signups * growth))
+        base_signups = CONFIG["SIGNUP_BASE"] + CONFIG["SIGNUP_SEASONALITY"] * np.sin(2 * np.pi * week / 52)
+        growth = 1 + (week / CONFIG["NUM_WEEKS"]) * CONFIG["SIGNUP_GROWTH"]  # gradual growth
+        n_signups = int(np.random.poisson(base_signups * growth * CONFIG["SCALE_FACTOR"]))
         
         for _ in range(n_signups):
             signup_date = CONFIG["START_DATE"] + timedelta(weeks=week)
-            plan = random.choices(list(CONFIG["PLANS"].keys()), weights=[0.6, 0.3, 0.1])[0]
+            plan = random.choices(list(CONFIG["PLANS"].keys()), weights=CONFIG["PLAN_WEIGHTS"])[0]
             channel = random.choice(CONFIG["MARKETING_CHANNELS"])
             country = random.choice(CONFIG["COUNTRIES"])
-            churn_weeks = int(np.random.exponential(scale=52)) # Average 1 year
+            churn_weeks = int(np.random.exponential(scale=CONFIG["CHURN_SCALE_WEEKS"])) # Average 1 year by default
             churn_date = signup_date + timedelta(weeks=churn_weeks)
             
             max_simulation_date = CONFIG["START_DATE"] + timedelta(weeks=CONFIG["NUM_WEEKS"] + 52)
@@ -58,7 +101,7 @@ def simulate_weekly_signups():
                  churn_date = max_simulation_date
             
             if churn_date > (CONFIG["START_DATE"] + timedelta(weeks=CONFIG["NUM_WEEKS"])):
-                 if random.random() < 0.7:
+                 if random.random() < CONFIG["OPEN_CHURN_SHARE"]:
                     churn_date = None
 
             records.append({
@@ -75,7 +118,8 @@ def simulate_weekly_signups():
 # Simulate marketing spend + CAC per channel
 def simulate_marketing_data():
     """
-    Simulates weekly marketing spend and customer acquisition cost (CAC) per channel.
+    Simulates weekly marketing spend and customer acquisition cost (CAC) per channel, as one row
+    per ad set: round(SCALE_FACTOR) ad sets per channel and week (at least one).
     Output DataFrame Schema:
     - week (int): Week number from the start of simulation.
     - week_start (date): Start date of the week.
@@ -85,26 +129,56 @@ def simulate_marketing_data():
     - CAC (float): Customer Acquisition Cost for the channel in that week.
     """
     records = []
+    ad_sets = max(1, round(CONFIG["SCALE_FACTOR"]))
     for week in range(CONFIG["NUM_WEEKS"]):
         week_date = CONFIG["START_DATE"] + timedelta(weeks=week)
         for channel in CONFIG["MARKETING_CHANNELS"]:
-            spend = np.random.normal(loc=5000, scale=1000)
-            leads = int(np.random.poisson(50 + week * 0.5))
-            cac = spend / max(leads, 1)
-            records.append({
-                "week": week,
-                "week_start": week_date.date(),
-                "channel": channel,
-                "ad_spend": round(max(spend, 1000), 2),
-                "leads": leads,
-                "CAC": round(cac, 2)
-            })
+            for _ in range(ad_sets):
+                spend = np.random.normal(loc=5000, scale=1000)
+                leads = int(np.random.poisson(50 + week * 0.5))
+                cac = spend / max(leads, 1)
+                records.append({
+                    "week": week,
+                    "week_start": week_date.date(),
+                    "channel": channel,
+                    "ad_spend": round(max(spend, 1000), 2),
+                    "leads": leads,
+                    "CAC": round(cac, 2)
+                })
     return pd.DataFrame(records)
 
+def week_indices(dates, missing_week):
+    """
+    Index of the first simulated week starting on or after each date, clipped to [0, NUM_WEEKS];
+    missing_week where the date is missing.
+    """
+    days = (pd.to_datetime(pd.Series(dates)) - CONFIG["START_DATE"]).dt.days.to_numpy(dtype=float)
+    weeks = np.where(np.isnan(days), missing_week, np.ceil(days / 7))
+    return np.clip(weeks, 0, CONFIG["NUM_WEEKS"]).astype(np.int64)
+
+def active_week_grid(customers_df):
+    """
+    Every (customer, week) pair with signup <= week start < churn (no churn: through the last week),
+    as two integer arrays: row positions in customers_df and week numbers, ordered by customer, then week.
+    """
+    first_week = week_indices(customers_df.signup_date, CONFIG["NUM_WEEKS"])
+    end_week = week_indices(customers_df.churn_date, CONFIG["NUM_WEEKS"])
+    counts = np.maximum(end_week - first_week, 0)
+    rows = np.repeat(np.arange(len(customers_df)), counts)
+    # Position of each pair within its customer's run: 0, 1, ... counts-1
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rows, np.repeat(first_week, counts) + offsets
+
+def week_start_dates():
+    """Start date of every simulated week, indexable by week number."""
+    return np.array([(CONFIG["START_DATE"] + timedelta(weeks=week)).date() for week in range(CONFIG["NUM_WEEKS"])],
+                    dtype=object)
+
 # Simulate revenue per customer per week
 def simulate_weekly_revenue(customers_df):
     """
     Simulates weekly Monthly Recurring Revenue (MRR) per customer.
+    Draws no random numbers, so the rows are the same for the same customers_df.
     Output DataFrame Schema:
     - customer_id (int): Unique identifier for the customer.
     - week (int): Week number from the start of simulation.
@@ -112,27 +186,24 @@ def simulate_weekly_revenue(customers_df):
     - plan (str): Customer's plan for that week.
     - MRR (float): Monthly Recurring Revenue from the customer for that week.
     """
-    records = []
-    for _, row in customers_df.iterrows():
-        signup = datetime.strptime(str(row.signup_date), "%Y-%m-%d")
-        churn = datetime.strptime(str(row.churn_date), "%Y-%m-%d") if pd.notnull(row.churn_date) else CONFIG["START_DATE"] + timedelta(weeks=CONFIG["NUM_WEEKS"])
-        plan_price = CONFIG["PLANS"][row.plan]
-        for week in range(CONFIG["NUM_WEEKS"]):
-            week_date = CONFIG["START_DATE"] + timedelta(weeks=week)
-            if signup <= week_date < churn:
-                records.append({
-                    "customer_id": row.customer_id,
-                    "week": week,
-                    "week_start": week_date.date(),
-                    "plan": row.plan,
-                    "MRR": plan_price
-                })
-    return pd.DataFrame(records)
+    rows, weeks = active_week_grid(customers_df)
+    return pd.DataFrame({
+        "customer_id": customers_df.customer_id.to_numpy()[rows],
+        "week": weeks,
+        "week_start": week_start_dates()[weeks],
+        "plan": customers_df.plan.to_numpy()[rows],
+        "MRR": customers_df.plan.map(CONFIG["PLANS"]).to_numpy()[rows],
+    })
 
 # Simulate product engagement (logins, feature use)
-def simulate_product_data(customers_df):
+def iter_product_data(customers_df, chunk_rows=None):
     """
-    Simulates weekly product engagement for active customers.
+    Simulates weekly product engagement for active customers, yielded in week order as DataFrames
+    of about chunk_rows rows (whole weeks; a week with more active customers is one chunk).
+    Active weeks come from the integer signup/churn week indices, and each chunk draws all of its
+    sessions and features_used values with one RNG call per column. Both columns come from their
+    own generators seeded with one draw from the global state, so the values do not depend on
+    chunk_rows.
     Output DataFrame Schema:
     - customer_id (int): Unique identifier for the customer.
     - week (int): Week number from the start of simulation.
@@ -140,29 +211,63 @@ def simulate_product_data(customers_df):
     - sessions (int): Number of sessions for the customer in that week.
     - features_used (int): Number of distinct features used by the customer in that week.
     """
-    records = []
+    chunk_rows = chunk_rows or CONFIG["CHUNK_ROWS"]
+    first_week = week_indices(customers_df.signup_date, CONFIG["NUM_WEEKS"])
+    end_week = week_indices(customers_df.churn_date, CONFIG["NUM_WEEKS"])
+    customer_ids = customers_df.customer_id.to_numpy()
+    week_dates = week_start_dates()
+    seed = np.random.randint(2**31)
+    sessions_rng, features_rng = (np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(2))
+
+    def usage_chunk(positions, weeks):
+        n_rows = len(positions)
+        return pd.DataFrame({
+            "customer_id": customer_ids[positions],
+            "week": weeks,
+            "week_start": week_dates[weeks],
+            "sessions": sessions_rng.poisson(5, n_rows),
+            "features_used": features_rng.integers(1, 6, n_rows),
+        })
+
+    positions, weeks, pending = [], [], 0
     for week in range(CONFIG["NUM_WEEKS"]):
-        week_date = CONFIG["START_DATE"] + timedelta(weeks=week)
-        active_customers = customers_df[
-            (pd.to_datetime(customers_df.signup_date) <= week_date) &
-            ((pd.isnull(customers_df.churn_date)) | (pd.to_datetime(customers_df.churn_date) > week_date))
-        ]
-        for _, row in active_customers.iterrows():
-            sessions = np.random.poisson(5)
-            features_used = np.random.randint(1, 6)
-            records.append({
-                "customer_id": row.customer_id,
-                "week": week,
-                "week_start": week_date.date(),
-                "sessions": sessions,
-                "features_used": features_used
-            })
-    return pd.DataFrame(records)
+        active = np.flatnonzero((first_week <= week) & (end_week > week))
+        positions.append(active)
+        weeks.append(np.full(len(active), week))
+        pending += len(active)
+        if pending >= chunk_rows:
+            yield usage_chunk(np.concatenate(positions), np.concatenate(weeks))
+            positions, weeks, pending = [], [], 0
+    if pending:
+        yield usage_chunk(np.concatenate(positions), np.concatenate(weeks))
+
+def simulate_product_data(customers_df):
+    """All product engagement rows of iter_product_data as one DataFrame."""
+    chunks = list(iter_product_data(customers_df))
+    if not chunks:
+        return pd.DataFrame(columns=["customer_id", "week", "week_start", "sessions", "features_used"])
+    return pd.concat(chunks, ignore_index=True)
+
+# Scalar draws for the per-customer simulations: from a numpy Generator when one is given (sharded
+# generation), otherwise from the global random / np.random state exactly as before.
+def draw_int(rng, low, high):
+    """Integer in [low, high], both inclusive like random.randint."""
+    return random.randint(low, high) if rng is None else int(rng.integers(low, high + 1))
+
+def draw_choice(rng, options):
+    return random.choice(options) if rng is None else options[int(rng.integers(len(options)))]
+
+def draw_uniform(rng):
+    return random.random() if rng is None else rng.random()
+
+def draw_poisson(rng, lam):
+    return np.random.poisson(lam) if rng is None else int(rng.poisson(lam))
 
 # Simulate subscription changes (trials, upgrades, downgrades, cancellations)
-def simulate_subscription_changes(customers_df):
+def simulate_subscription_changes(customers_df, first_event_id=1, rng=None):
     """
-    Simulates subscription change events for customers.
+    Simulates subscription change events for customers, numbering events from first_event_id.
+    Draws from rng (a numpy Generator) if given, otherwise from the global random state.
     Output DataFrame Schema:
     - event_id (int): Unique identifier for the subscription event.
     - customer_id (int): Unique identifier for the customer.
@@ -173,7 +278,7 @@ def simulate_subscription_changes(customers_df):
     - mrr_change (float): Change in MRR due to this event.
     """
     records = []
-    event_id_counter = 1
+    event_id_counter = first_event_id
     plan_tiers = list(CONFIG["PLANS"].keys())
 
     for _, customer in customers_df.iterrows():
@@ -211,17 +316,17 @@ def simulate_subscription_changes(customers_df):
                 event_id_counter += 1
             continue 
 
-        for _ in range(random.randint(0, 2)):
+        for _ in range(draw_int(rng, 0, CONFIG["PLAN_CHANGES_MAX"])):
             if churn_dt and last_event_date >= churn_dt - timedelta(days=30): 
                 break
             
-            potential_event_date = last_event_date + timedelta(days=random.randint(30, 365))
+            potential_event_date = last_event_date + timedelta(days=draw_int(rng, *CONFIG["PLAN_CHANGE_GAP_DAYS"]))
             if churn_dt and potential_event_date >= churn_dt:
                 break
             if potential_event_date > CONFIG["START_DATE"] + timedelta(weeks=CONFIG["NUM_WEEKS"]):
                 break
 
-            action = random.choice(["upgrade", "downgrade"])
+            action = draw_choice(rng, CONFIG["PLAN_CHANGE_ACTIONS"])
             current_plan_index = plan_tiers.index(current_plan)
             new_plan = None
             old_mrr = CONFIG["PLANS"][current_plan]
@@ -244,7 +349,7 @@ def simulate_subscription_changes(customers_df):
                 last_event_date = potential_event_date
         
         if churn_dt:
-            request_date = churn_dt - timedelta(days=random.randint(1, 14))
+            request_date = churn_dt - timedelta(days=draw_int(rng, 1, 14))
             if request_date < last_event_date : request_date = last_event_date + timedelta(days=1) 
             if request_date < churn_dt:
                 records.append({
@@ -264,9 +369,10 @@ def simulate_subscription_changes(customers_df):
     return pd.DataFrame(records)
 
 # Simulate customer support tickets
-def simulate_support_tickets(customers_df):
+def simulate_support_tickets(customers_df, first_ticket_id=1, rng=None):
     """
-    Simulates customer support tickets.
+    Simulates customer support tickets, numbering tickets from first_ticket_id.
+    Draws from rng (a numpy Generator) if given, otherwise from the global random state.
     Output DataFrame Schema:
     - ticket_id (int): Unique identifier for the support ticket.
     - customer_id (int): Unique identifier for the customer who raised the ticket.
@@ -278,15 +384,15 @@ def simulate_support_tickets(customers_df):
     - channel (str): Channel through which the ticket was submitted (e.g., 'Email', 'Chat').
     """
     records = []
-    ticket_id_counter = 1
+    ticket_id_counter = first_ticket_id
 
     for _, customer in customers_df.iterrows():
         cust_id = customer.customer_id
         signup_dt = pd.to_datetime(customer.signup_date)
         churn_dt = pd.to_datetime(customer.churn_date) if pd.notnull(customer.churn_date) else CONFIG["START_DATE"] + timedelta(weeks=CONFIG["NUM_WEEKS"])
         
-        num_tickets = np.random.poisson(1) 
-        if num_tickets == 0 and random.random() < 0.3 : num_tickets = random.randint(1,3)
+        num_tickets = draw_poisson(rng, CONFIG["TICKETS_PER_CUSTOMER"])
+        if num_tickets == 0 and draw_uniform(rng) < 0.3 : num_tickets = draw_int(rng, 1, 3)
 
         for _ in range(num_tickets):
             if signup_dt >= churn_dt - timedelta(days=1):
@@ -295,12 +401,12 @@ def simulate_support_tickets(customers_df):
             if (churn_dt - signup_dt).days <= 0:
                 creation_dt = signup_dt 
             else:
-                creation_dt = signup_dt + timedelta(days=random.randint(0, (churn_dt - signup_dt).days -1  ))
+                creation_dt = signup_dt + timedelta(days=draw_int(rng, 0, (churn_dt - signup_dt).days -1  ))
             
-            status = random.choice(CONFIG["SUPPORT_TICKET_STATUSES"])
+            status = draw_choice(rng, CONFIG["SUPPORT_TICKET_STATUSES"])
             resolution_dt = None
             if status in ["Resolved", "Closed"]:
-                resolution_dt = creation_dt + timedelta(days=random.randint(0, 7), hours=random.randint(1,23))
+                resolution_dt = creation_dt + timedelta(days=draw_int(rng, 0, 7), hours=draw_int(rng, 1, 23))
                 if resolution_dt > churn_dt and churn_dt is not None : resolution_dt = churn_dt 
 
             records.append({
@@ -309,9 +415,9 @@ def simulate_support_tickets(customers_df):
                 "creation_date": creation_dt.date(),
                 "resolution_date": resolution_dt.date() if resolution_dt else None,
                 "status": status,
-                "priority": random.choice(CONFIG["SUPPORT_TICKET_PRIORITIES"]),
-                "issue_type": random.choice(CONFIG["SUPPORT_TICKET_ISSUE_TYPES"]),
-                "channel": random.choice(CONFIG["SUPPORT_TICKET_CHANNELS"])
+                "priority": draw_choice(rng, CONFIG["SUPPORT_TICKET_PRIORITIES"]),
+                "issue_type": draw_choice(rng, CONFIG["SUPPORT_TICKET_ISSUE_TYPES"]),
+                "channel": draw_choice(rng, CONFIG["SUPPORT_TICKET_CHANNELS"])
             })
             ticket_id_counter += 1
     return pd.DataFrame(records)
@@ -341,71 +447,186 @@ def simulate_calendar_table():
         })
     return pd.DataFrame(records)
 
-if __name__ == "__main__":
-    output_path = CONFIG["DATA_OUTPUT_PATH"]
-    os.makedirs(output_path, exist_ok=True)
-    print(f"Ensuring output directory exists: {output_path}")
+# --- Streaming Producers ---
+# Each producer yields a table as DataFrames of bounded size. The tables are consumed one after the
+# other in the order above, so the global random state is used in the same order as by the
+# whole-table functions and batching does not change the generated rows.
+def customer_blocks(customers_df, block_customers):
+    for start in range(0, len(customers_df), block_customers):
+        yield customers_df.iloc[start:start + block_customers]
+
+def single_batch(simulate, *args):
+    """Runs a simulation for a small table only when its batch is requested."""
+    yield simulate(*args)
+
+def iter_weekly_revenue(customers_df, block_customers):
+    for block in customer_blocks(customers_df, block_customers):
+        revenue = simulate_weekly_revenue(block)
+        if len(revenue):
+            yield revenue
+
+def iter_subscription_changes(customers_df, block_customers):
+    """subscription_changes per customer block, with event_id continuing across blocks."""
+    next_event_id = 1
+    for block in customer_blocks(customers_df, block_customers):
+        events = simulate_subscription_changes(block, next_event_id)
+        next_event_id += len(events)
+        if len(events):
+            yield events
+
+def iter_support_tickets(customers_df, block_customers):
+    """support_tickets per customer block, with ticket_id continuing across blocks."""
+    next_ticket_id = 1
+    for block in customer_blocks(customers_df, block_customers):
+        tickets = simulate_support_tickets(block, next_ticket_id)
+        next_ticket_id += len(tickets)
+        if len(tickets):
+            yield tickets
+
+# --- Sharded Generation ---
+# With --workers, the per-customer tables are simulated in shards of SHARD_CUSTOMERS customers,
+# each drawing from its own numpy Generator: SeedSequence(seed) is split per table and then per
+# shard. A shard's rows depend only on the seed and its customers, so the output is the same for
+# any number of worker processes. Shards are numbered from 1 and renumbered in shard order.
+SHARDED_TABLES = {
+    "subscription_changes": (simulate_subscription_changes, "event_id"),
+    "support_tickets": (simulate_support_tickets, "ticket_id"),
+}
 
-    print("\nGenerating datasets...")
+def simulate_shard(task):
+    """Simulates one table for one customer shard (runs in a worker process)."""
+    table_name, customers_df, seed_sequence, config = task
+    CONFIG.update(config)  # Scale factor and profile, also under the spawn start method
+    simulate, _ = SHARDED_TABLES[table_name]
+    return simulate(customers_df, 1, np.random.default_rng(seed_sequence))
 
-    df_calendar = simulate_calendar_table()
-    df_calendar.to_csv(os.path.join(output_path, "calendar.csv"), index=False)
-    print(f"- Generated calendar.csv with {len(df_calendar)} records.")
+def run_shards(tasks, workers):
+    """
+    Yields simulate_shard results in task order. With more than one worker the shards run in a
+    process pool, with at most two shards per worker in flight so finished shards do not pile up.
+    """
+    if workers <= 1:
+        yield from map(simulate_shard, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(simulate_shard, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_sharded(table_name, customers_df, seed, workers, shard_customers=None):
+    """A per-customer table generated shard by shard, with ids made globally unique and contiguous."""
+    shard_customers = shard_customers or CONFIG["SHARD_CUSTOMERS"]
+    n_shards = -(-len(customers_df) // shard_customers)
+    table_seed = np.random.SeedSequence(seed).spawn(len(SHARDED_TABLES))[list(SHARDED_TABLES).index(table_name)]
+    tasks = ((table_name, shard, shard_seed, dict(CONFIG)) for shard, shard_seed
+             in zip(customer_blocks(customers_df, shard_customers), table_seed.spawn(n_shards)))
+    _, id_column = SHARDED_TABLES[table_name]
+    next_id = 1
+    for frame in run_shards(tasks, workers):
+        if len(frame):
+            frame[id_column] += next_id - 1
+            next_id += len(frame)
+            yield frame
+
+def stream_table(batches, table_name, storage):
+    """
+    Passes a table's batches on to the SQLite loader, appending each one to data/raw/<table>.csv
+    and/or data/parquet/<table>/ first, so no table is held in memory as a whole.
+    """
+    csv_path = os.path.join(CONFIG["DATA_OUTPUT_PATH"], f"{table_name}.csv")
+    rows, schema = 0, None
+    for index, batch in enumerate(batches):
+        if storage in ("csv", "both"):
+            batch.to_csv(csv_path, mode="w" if index == 0 else "a", header=index == 0, index=False)
+        if storage in ("parquet", "both"):
+            schema = parquet_store.append_batch(batch, table_name, index, schema, CONFIG["PARQUET_OUTPUT_PATH"])
+        rows += len(batch)
+        yield batch
+    if storage in ("parquet", "both") and schema is not None:
+        files, compacted = parquet_store.compact_table(table_name, CONFIG["PARQUET_OUTPUT_PATH"])
+        if compacted < files:
+            print(f"- Compacted {table_name} Parquet files per partition: {files:,} -> {compacted:,}.")
+    print(f"- Generated {table_name} ({storage}) with {rows} records.")
+
+def batch_rows_for(batch_size, max_memory_mb):
+    """Rows per batch: batch_size, lowered so one batch stays within max_memory_mb (if given)."""
+    if max_memory_mb:
+        return max(1, min(batch_size, int(max_memory_mb * 1024 * 1024 // CONFIG["BATCH_ROW_BYTES"])))
+    return batch_size
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where the platform does not report it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates the simulated SaaS datasets and loads them into SQLite.")
+    parser.add_argument("--storage", choices=["csv", "parquet", "both"], default="csv",
+                        help="Raw file format: CSVs in data/raw/, Parquet in data/parquet/, or both.")
+    parser.add_argument("--batch-size", type=int, default=CONFIG["CHUNK_ROWS"],
+                        help="Rows per generated batch of the large tables.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for every random draw.")
+    parser.add_argument("--scale-factor", type=float, default=1,
+                        help="Dataset size relative to the default (SF1): scales customers and with them revenue, "
+                             "usage, events and tickets, plus marketing ad sets per channel.")
+    parser.add_argument("--profile", choices=list(LOAD_PROFILES), default="steady_growth",
+                        help="Load profile shaping churn, plan changes and tickets.")
+    parser.add_argument("--workers", type=int,
+                        help="Generate subscription_changes and support_tickets in seeded customer shards on N "
+                             "processes (output depends only on --seed, not on N).")
+    parser.add_argument("--max-memory", type=float,
+                        help="Memory budget in MB: lowers --batch-size so one batch fits, and sizes SQLite's page cache "
+                             "for the load, whose journal and index-build sorts then go to disk. The customers table and "
+                             "the post-load KPI builds (cohort retention, churn, cube) are still held in memory in full.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    configure(args.scale_factor, args.profile)
+    batch_rows = batch_rows_for(args.batch_size, args.max_memory)
+    block_customers = max(1, batch_rows // CONFIG["NUM_WEEKS"])  # A customer has at most one revenue row per week
+    output_path = CONFIG["DATA_OUTPUT_PATH"] if args.storage != "parquet" else CONFIG["PARQUET_OUTPUT_PATH"]
+    os.makedirs(output_path, exist_ok=True)
+    print(f"Ensuring output directory exists: {output_path}")
+    print(f"Scale factor {CONFIG['SCALE_FACTOR']:g}, profile '{args.profile}', seed {args.seed}.")
+    print(f"Generating in batches of up to {batch_rows:,} rows ({block_customers:,} customers per block).")
+    if args.workers:
+        print(f"Sharded subscription_changes/support_tickets on {args.workers} worker(s), "
+              f"{CONFIG['SHARD_CUSTOMERS']:,} customers per shard.")
+
+    # Customers drive every other table, so they are generated up front; the rest is produced batch
+    # by batch while the loader consumes it.
     df_customers = simulate_weekly_signups()
-    df_customers.to_csv(os.path.join(output_path, "customers.csv"), index=False)
-    print(f"- Generated customers.csv with {len(df_customers)} records.")
-
-    df_marketing = simulate_marketing_data()
-    df_marketing.to_csv(os.path.join(output_path, "marketing.csv"), index=False)
-    print(f"- Generated marketing.csv with {len(df_marketing)} records.")
-
-    df_revenue = simulate_weekly_revenue(df_customers)
-    df_revenue.to_csv(os.path.join(output_path, "revenue.csv"), index=False)
-    print(f"- Generated revenue.csv with {len(df_revenue)} records.")
 
-    df_product = simulate_product_data(df_customers)
-    df_product.to_csv(os.path.join(output_path, "product_usage.csv"), index=False)
-    print(f"- Generated product_usage.csv with {len(df_product)} records.")
-
-    df_subscription_changes = simulate_subscription_changes(df_customers)
-    df_subscription_changes.to_csv(os.path.join(output_path, "subscription_changes.csv"), index=False)
-    print(f"- Generated subscription_changes.csv with {len(df_subscription_changes)} records.")
-
-    df_support_tickets = simulate_support_tickets(df_customers)
-    df_support_tickets.to_csv(os.path.join(output_path, "support_tickets.csv"), index=False)
-    print(f"- Generated support_tickets.csv with {len(df_support_tickets)} records.")
-
-    print(f"\nAll simulated datasets saved in {output_path}")
-
-    # Load data into SQLite
-    print("\nLoading data into SQLite database...")
     sqlite_db_file = CONFIG["SQLITE_DB_PATH"]
-    sqlite_dir = os.path.dirname(sqlite_db_file)
-    os.makedirs(sqlite_dir, exist_ok=True)
-    print(f"Ensuring SQLite directory exists: {sqlite_dir}")
-
-    conn = sqlite3.connect(sqlite_db_file)
-
-    dataframes_to_load = [
-        (df_calendar, "calendar"),
-        (df_customers, "customers"),
-        (df_marketing, "marketing"),
-        (df_revenue, "revenue"),
-        (df_product, "product_usage"),
-        (df_subscription_changes, "subscription_changes"),
-        (df_support_tickets, "support_tickets")
+    print(f"\nGenerating datasets and loading them into {sqlite_db_file}...")
+    tables_to_stream = [
+        ("calendar", single_batch(simulate_calendar_table)),
+        ("customers", iter([df_customers])),
+        ("marketing", single_batch(simulate_marketing_data)),
+        ("revenue", iter_weekly_revenue(df_customers, block_customers)),
+        ("product_usage", iter_product_data(df_customers, batch_rows)),
     ]
-
-    try:
-        for df, table_name in dataframes_to_load:
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-            print(f"- Loaded {len(df)} records into '{table_name}' table.")
-        
-        conn.commit()
-        print(f"\nSuccessfully loaded all data into SQLite database: {sqlite_db_file}")
-    except Exception as e:
-        print(f"Error loading data into SQLite: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+    if args.workers:
+        tables_to_stream += [(table_name, iter_sharded(table_name, df_customers, args.seed, args.workers))
+                             for table_name in SHARDED_TABLES]
+    else:
+        tables_to_stream += [
+            ("subscription_changes", iter_subscription_changes(df_customers, block_customers)),
+            ("support_tickets", iter_support_tickets(df_customers, block_customers)),
+        ]
+    sources = [(table_name, stream_table(batches, table_name, args.storage)) for table_name, batches in tables_to_stream]
+
+    # Same path as scripts/load_to_db.py: executemany in one transaction, then indexes and views
+    if bulk_load(sqlite_db_file, sources, max_memory_mb=args.max_memory):
+        print(f"\nAll simulated datasets saved in {output_path}")
+        print(f"Successfully loaded all data into SQLite database: {sqlite_db_file}")
+    peak_mb = peak_rss_mb()
+    if peak_mb is not None:
+        print(f"Peak RSS: {peak_mb:,.0f} MB")
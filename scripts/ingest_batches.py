@@ -0,0 +1,238 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from load_to_db import CHUNK_ROWS, DB_PATH, column_dtypes, column_values, csv_columns
+from migrations import DAY_KEY_COLUMNS, NATURAL_KEYS, has_unique_key, run_migrations
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard"))
+import parquet_store  # noqa: E402
+from data_version import stamp_data_version  # noqa: E402
+from dataset_stats import mark_dataset_stats_stale  # noqa: E402
+from sqlite_schema import table_columns  # noqa: E402
+
+# --- Configuration ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INBOX_DIR = os.path.join(PROJECT_ROOT, "data", "incoming")
+
+# Incremental ingestion: new CSV/Parquet batches of the appended tables are upserted on their
+# natural keys (migrations.NATURAL_KEYS) instead of reloading the database. Every batch is one
+# transaction that also writes its row in ingest_manifest, keyed by the file's content hash, so a
+# batch is applied exactly once however often it is offered. The manifest also records the days
+# the batch touched; the next KPI refresh (scripts/compute_kpis.py) recomputes those weeks, even
+# when a batch corrects rows below the KPI watermarks.
+INGEST_MANIFEST_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    batch_id TEXT PRIMARY KEY,            -- SHA-256 of the batch file
+    table_name TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    rows_read INTEGER NOT NULL,
+    rows_upserted INTEGER NOT NULL,       -- Inserted, or updated with different values
+    first_day INTEGER,                    -- Day numbers touched (old and new dates); NULL if no KPI reads the table
+    last_day INTEGER,
+    ingested_at TEXT NOT NULL,
+    kpi_refreshed_at TEXT                 -- Set by the KPI refresh that recomputed the touched weeks
+);
+"""
+# Day column whose weeks the KPI tables read, per ingestible table (support tickets feed no KPI).
+KPI_DAY_COLUMNS = {
+    "subscription_changes": "event_day",
+    "revenue": "week_start_day",
+    "product_usage": "week_start_day",
+    "support_tickets": None,
+}
+STAGE_TABLE = "temp.ingest_stage"
+
+# --- Helper Functions ---
+def file_hash(path):
+    """SHA-256 of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def batch_table(path):
+    """The table a batch file belongs to, from its name: '<table>.csv' or '<table>_<anything>.parquet'."""
+    name = os.path.basename(path)
+    for table_name in sorted(NATURAL_KEYS, key=len, reverse=True):
+        if name == table_name or name.startswith((f"{table_name}.", f"{table_name}_", f"{table_name}-")):
+            return table_name
+    return None
+
+def batch_files(paths):
+    """The CSV/Parquet files of `paths` (files, or directories scanned in name order)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith((".csv", ".parquet")))
+        else:
+            files.append(path)
+    return files
+
+def read_batch(path, table_name, chunk_rows=CHUNK_ROWS):
+    """A batch file as DataFrames of at most chunk_rows rows, with the loader's column types."""
+    if path.endswith(".parquet"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            frame = batch.to_pandas()
+            yield frame.drop(columns=[column for column in parquet_store.PARTITION_FIELDS if column in frame.columns])
+    else:
+        yield from pd.read_csv(path, dtype=column_dtypes(table_name, csv_columns(path)), chunksize=chunk_rows)
+
+def source_columns(conn, table_name):
+    """Columns of table_name a batch may carry: all but the day/week keys the migration 2 triggers fill."""
+    derived = {column for table, _, day_column, week_column in DAY_KEY_COLUMNS if table == table_name
+               for column in (day_column, week_column)}
+    return [column for column in table_columns(conn, table_name) if column not in derived]
+
+def ingested_batches(conn):
+    return {row[0] for row in conn.execute("SELECT batch_id FROM ingest_manifest")}
+
+def day_span(conn, table_name, key):
+    """MIN/MAX of the KPI day column over the rows of table_name matching the staged keys."""
+    day_column = KPI_DAY_COLUMNS[table_name]
+    if day_column is None:
+        return None, None
+    join = " AND ".join(f"t.{column} = s.{column}" for column in key)
+    return conn.execute(f"SELECT MIN(t.{day_column}), MAX(t.{day_column}) FROM {table_name} t "
+                        f"JOIN {STAGE_TABLE} s ON {join}").fetchone()
+
+def span_union(*spans):
+    lows = [low for low, _ in spans if low is not None]
+    highs = [high for _, high in spans if high is not None]
+    return (min(lows) if lows else None, max(highs) if highs else None)
+
+# --- Ingestion ---
+def stage_batch(conn, path, table_name, columns, key, chunk_rows):
+    """
+    Reads a batch into the temporary stage table, deduplicated on the natural key (last row wins).
+    Returns (rows read, the batch's columns).
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {STAGE_TABLE}")
+    conn.execute(f"CREATE TABLE {STAGE_TABLE} ({', '.join(columns)}, PRIMARY KEY ({', '.join(key)}))")
+    rows_read, names = 0, None
+    for chunk in read_batch(path, table_name, chunk_rows):
+        unknown = set(chunk.columns) - set(columns)
+        if unknown or not set(key) <= set(chunk.columns):
+            raise ValueError(f"{path}: columns {sorted(unknown) or key} do not match table '{table_name}'")
+        rows_read += len(chunk)
+        names = names or list(chunk.columns)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {STAGE_TABLE} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            zip(*(column_values(chunk[column]) for column in names))
+        )
+    return rows_read, names or []
+
+def upsert_staged(conn, table_name, columns, key):
+    """
+    Upserts the stage table into table_name on its natural key. Only the batch's columns are written,
+    and rows whose values are unchanged are not rewritten. Returns rows written.
+    """
+    values = [column for column in columns if column not in key]
+    update = ", ".join(f"{column} = excluded.{column}" for column in values)
+    changed = " OR ".join(f"{table_name}.{column} IS NOT excluded.{column}" for column in values)
+    conflict = f"DO UPDATE SET {update} WHERE {changed}" if values else "DO NOTHING"
+    # WHERE true: without it SQLite would parse ON CONFLICT as part of the SELECT's join
+    cursor = conn.execute(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {STAGE_TABLE} WHERE true "
+        f"ON CONFLICT ({', '.join(key)}) {conflict}"
+    )
+    return cursor.rowcount
+
+def ingest_batch(conn, path, chunk_rows=CHUNK_ROWS):
+    """
+    Upserts one batch file in its own transaction and records it in ingest_manifest.
+    Returns (table, rows read, rows upserted), or None if the batch was already ingested.
+    """
+    table_name = batch_table(path)
+    if table_name is None:
+        raise ValueError(f"{path}: not a batch of {', '.join(NATURAL_KEYS)} (name it <table>_<batch>.csv or .parquet)")
+    columns = source_columns(conn, table_name)
+    if not columns:
+        raise ValueError(f"Table '{table_name}' is not loaded; load it with scripts/load_to_db.py first")
+    if not has_unique_key(conn, table_name):
+        raise ValueError(f"Table '{table_name}' repeats ({', '.join(NATURAL_KEYS[table_name])}) keys and has no unique key to upsert on; "
+                         "fix the source data or run `python scripts/migrations.py dedupe` first")
+    batch_id = file_hash(path)
+    if batch_id in ingested_batches(conn):
+        return None
+
+    key = NATURAL_KEYS[table_name]
+    with conn:
+        rows_read, batch_columns = stage_batch(conn, path, table_name, columns, key, chunk_rows)
+        before = day_span(conn, table_name, key)  # Days the updated rows had; a re-dated event moves out of its old week
+        rows_upserted = upsert_staged(conn, table_name, batch_columns, key) if rows_read else 0
+        first_day, last_day = span_union(before, day_span(conn, table_name, key))  # Day keys set by the migration 2 triggers
+        if not rows_upserted:
+            first_day = last_day = None  # Nothing changed, no week to recompute
+        conn.execute(
+            "INSERT INTO ingest_manifest (batch_id, table_name, source_path, rows_read, rows_upserted, first_day, last_day, "
+            "ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (batch_id, table_name, os.path.abspath(path), rows_read, rows_upserted, first_day, last_day,
+             datetime.now().isoformat(timespec='seconds'))
+        )
+        conn.execute(f"DROP TABLE {STAGE_TABLE}")
+    return table_name, rows_read, rows_upserted
+
+def ingest_batches(db_path, paths, chunk_rows=CHUNK_ROWS):
+    """
+    Ingests every new batch file of `paths` into db_path, then marks the dataset_stats rows of the
+    changed tables stale and stamps a data version if anything changed. Prints one line per batch.
+    Returns True on success.
+    """
+    files = batch_files(paths)
+    if not files:
+        print(f"No batch files in {', '.join(paths)}.")
+        return True
+    conn = sqlite3.connect(db_path)
+    try:
+        run_migrations(conn, schema="analytics")  # The upserts need the unique natural keys (migration 6)
+        with conn:
+            conn.execute(INGEST_MANIFEST_SQL)
+        changed = set()
+        for path in files:
+            started = time.perf_counter()
+            result = ingest_batch(conn, path, chunk_rows)
+            if result is None:
+                print(f"- Skipped {path}: already ingested.")
+                continue
+            table_name, rows_read, rows_upserted = result
+            if rows_upserted:
+                changed.add(table_name)
+            print(f"- Upserted {rows_upserted:,} of {rows_read:,} rows into '{table_name}' from {path} "
+                  f"in {time.perf_counter() - started:.2f}s.")
+        if changed:
+            with conn:
+                mark_dataset_stats_stale(conn, changed)
+                print(f"Data version {stamp_data_version(conn, 'ingest')}.")
+        return True
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error ingesting batches (the failing batch was rolled back): {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Upserts new CSV/Parquet batches of subscription_changes, revenue, product_usage and support_tickets "
+                    "into the analytics database, once per batch."
+    )
+    parser.add_argument("paths", nargs="*", default=[INBOX_DIR],
+                        help="Batch files or directories of them, named <table>_<batch>.csv/.parquet (default: data/incoming/).")
+    parser.add_argument("--db", default=DB_PATH, help="Analytics SQLite database.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read and staged per chunk.")
+    ingest_args = parser.parse_args()
+
+    if not os.path.exists(ingest_args.db):
+        print(f"Error: database not found at {ingest_args.db}")
+        exit(1)
+    if not ingest_batches(ingest_args.db, ingest_args.paths, ingest_args.chunk_rows):
+        exit(1)
@@ -1,11 +1,295 @@
+import argparse
+import os
 import sqlite3
+import sys
+import time
+from datetime import date
+
 import pandas as pd
 
-def load_table_to_sqlite(csv_path, table_name, db_path='data/sqlite/saas.db'):
-    df = pd.read_csv(csv_path)
-    conn = sqlite3.connect(db_path)
-    df.to_sql(table_name, conn, if_exists='replace', index=False)
-    conn.close()
+from compute_kpis import refresh_kpis
+from migrations import reset_schema_version, run_migrations
+from shadow_db import build_pragmas, integrity_problems, remove_database, replace_database, shadow_file
+from sql_runner import run_script
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard"))
+import parquet_store
+from data_version import stamp_data_version
+from dataset_stats import refresh_dataset_stats
+
+# --- Configuration ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RAW_DIR = os.path.join(PROJECT_ROOT, "data", "raw")
+PARQUET_DIR = parquet_store.PARQUET_DIR
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas_analytics.db")
+CREATE_VIEWS_FILE = os.path.join(PROJECT_ROOT, "sql", "create_views.sql")
+CHUNK_ROWS = 100_000
+
+# Explicit column dtypes of the CSVs written by scripts/generate_data.py, in load order.
+# Dates stay text (YYYY-MM-DD); the integer day keys are added by the migrations after the load.
+# Columns a CSV has beyond these are loaded as text.
+TABLE_DTYPES = {
+    "calendar": {"week_id": "int64", "week_start_date": str, "week_end_date": str,
+                 "month": "int64", "quarter": "int64", "year": "int64"},
+    "customers": {"customer_id": "int64", "signup_date": str, "plan": str, "marketing_channel": str,
+                  "country": str, "churn_date": str},
+    "marketing": {"week": "int64", "week_start": str, "channel": str, "ad_spend": "float64",
+                  "leads": "int64", "CAC": "float64"},
+    "revenue": {"customer_id": "int64", "week": "int64", "week_start": str, "plan": str, "MRR": "float64"},
+    "product_usage": {"customer_id": "int64", "week": "int64", "week_start": str, "sessions": "int64",
+                      "features_used": "int64"},
+    "subscription_changes": {"event_id": "int64", "customer_id": "int64", "event_date": str, "event_type": str,
+                             "old_plan": str, "new_plan": str, "mrr_change": "float64"},
+    "support_tickets": {"ticket_id": "int64", "customer_id": "int64", "creation_date": str, "resolution_date": str,
+                        "status": str, "priority": str, "issue_type": str, "channel": str},
+}
+SQL_TYPES = {"int64": "INTEGER", "float64": "REAL"}
+
+# A load goes into a shadow file (scripts/shadow_db.py) with the unsafe-fast build PRAGMAs: no
+# fsyncs and the rollback journal in memory (not OFF, under which ROLLBACK is undefined). Only the
+# finished, checked file replaces the live database, which keeps the journal mode it had (WAL is
+# stored in the file).
+RESTORED_PRAGMAS = ["journal_mode"]
+# Tables the KPI tables are computed from. The KPI watermarks assume these are only appended to, so
+# a load replacing any of them does not carry the kpi_* tables (or their watermarks) over: they are
+# rebuilt from the loaded rows before the swap instead.
+KPI_SOURCE_TABLES = {"calendar", "customers", "marketing", "revenue", "product_usage", "subscription_changes"}
+
+# --- Helper Functions ---
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+def read_pragmas(conn, names, schema="main"):
+    """Current values of the named PRAGMAs of a (possibly attached) database, in the form apply_pragmas takes."""
+    return {name: conn.execute(f"PRAGMA {schema}.{name}").fetchone()[0] for name in names}
+
+def csv_columns(csv_path):
+    """Header of a CSV file."""
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+def column_dtypes(table_name, columns):
+    """Dtype for every CSV column: the declared one, text otherwise."""
+    declared = TABLE_DTYPES.get(table_name, {})
+    return {column: declared.get(column, str) for column in columns}
+
+def create_table(conn, table_name, dtypes):
+    """(Re)creates a table with declared column types and no indexes; those are built after the load."""
+    columns = ", ".join(f'"{column}" {SQL_TYPES.get(dtype, "TEXT")}' for column, dtype in dtypes.items())
+    conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    conn.execute(f'CREATE TABLE "{table_name}" ({columns})')
+
+def column_values(series):
+    """A column as Python values sqlite3 can bind: numbers as int/float, the rest as str with None for missing."""
+    if series.dtype.kind in "iuf":
+        return series.tolist()
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    text = values.astype(str).astype(object)  # Also turns date objects into YYYY-MM-DD
+    text[missing] = None
+    return text.tolist()
+
+def insert_rows(conn, table_name, frame):
+    """Appends a DataFrame with one executemany over a prepared INSERT. Returns the number of rows."""
+    columns = ", ".join(f'"{column}"' for column in frame.columns)
+    placeholders = ", ".join("?" * len(frame.columns))
+    rows = zip(*(column_values(frame[column]) for column in frame.columns))
+    conn.executemany(f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})', rows)
+    return len(frame)
+
+def carry_over(conn, live_path, replaced_tables):
+    """
+    Copies every table of the live database the load does not replace into the new shadow file,
+    with its indexes and triggers, plus the views, so the swap keeps them (data_version, ...).
+    The kpi_* tables are left behind when the load replaces one of KPI_SOURCE_TABLES.
+    Returns (the live database's RESTORED_PRAGMAS, True if KPI tables were left behind).
+    """
+    conn.execute("ATTACH DATABASE ? AS live", (live_path,))
+    try:
+        previous_pragmas = read_pragmas(conn, RESTORED_PRAGMAS, "live")
+        objects = conn.execute(
+            "SELECT type, name, tbl_name, sql FROM live.sqlite_master "
+            "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type = 'table' DESC"
+        ).fetchall()
+        replaces_sources = bool(KPI_SOURCE_TABLES & set(replaced_tables))
+        kpi_tables_dropped = False
+        with conn:
+            for object_type, name, table_name, sql in objects:  # Tables before their indexes and triggers
+                if replaces_sources and table_name.startswith("kpi_"):
+                    kpi_tables_dropped = True
+                    continue
+                if table_name in replaced_tables:
+                    continue
+                conn.execute(sql)  # Unqualified: created in main
+                if object_type == "table":
+                    conn.execute(f'INSERT INTO main."{name}" SELECT * FROM live."{name}"')
+    finally:
+        conn.execute("DETACH DATABASE live")
+    return previous_pragmas, kpi_tables_dropped
+
+def report_rate(table_name, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float("inf")
+    print(f"- Loaded {rows:,} records into '{table_name}' in {seconds:.2f}s ({rate:,.0f} rows/s).")
+
+def finish_load(conn, create_views=True, rebuild_kpis=False):
+    """
+    After the tables were replaced: builds the indexes (the migrations run again because dropping
+    the tables dropped their indexes), recreates the views, refreshes dataset_stats and stamps
+    a new data version. The batch manifest of scripts/ingest_batches.py is dropped with the data
+    it described, so those batches can be upserted again on top of the reload. rebuild_kpis
+    recomputes every KPI week (the live database had KPI tables that were not carried over).
+    """
+    reset_schema_version(conn)
+    run_migrations(conn, schema="analytics")
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS ingest_manifest")
+    if create_views and os.path.exists(CREATE_VIEWS_FILE):
+        with open(CREATE_VIEWS_FILE) as f:
+            run_script(conn, f.read())
+        print("Recreated the views from create_views.sql.")
+    if rebuild_kpis:
+        refresh_kpis(conn, full_refresh=True)  # Also refreshes dataset_stats
+    with conn:
+        if not rebuild_kpis:
+            refresh_dataset_stats(conn, "analytics")
+        print(f"Data version {stamp_data_version(conn, 'load')}.")
+
+# --- Loaders ---
+def load_csv(conn, csv_path, table_name, chunk_rows=CHUNK_ROWS):
+    """Streams one CSV into a fresh table in chunks of `chunk_rows`. Returns the number of rows."""
+    dtypes = column_dtypes(table_name, csv_columns(csv_path))
+    create_table(conn, table_name, dtypes)
+    rows = 0
+    for chunk in pd.read_csv(csv_path, dtype=dtypes, chunksize=chunk_rows):
+        rows += insert_rows(conn, table_name, chunk)
+    return rows
+
+def load_batches(conn, batches, table_name):
+    """
+    Inserts an iterable of DataFrames (e.g. Parquet record batches) into a fresh table. Returns the
+    number of rows. Without any batch (a date range with no rows of this table) the table is
+    recreated empty with its declared columns, so the other tables of the load still go in.
+    """
+    rows = 0
+    for index, batch in enumerate(batches):
+        if index == 0:
+            create_table(conn, table_name, column_dtypes(table_name, batch.columns))
+        rows += insert_rows(conn, table_name, batch)
+    if rows == 0:
+        print(f"Warning: no rows to load into '{table_name}' (empty source or date range); it is left empty.")
+        create_table(conn, table_name, column_dtypes(table_name, TABLE_DTYPES.get(table_name, {})))
+    return rows
+
+def bulk_load(db_path, sources, chunk_rows=CHUNK_ROWS, create_views=True, max_memory_mb=None):
+    """
+    Loads [(table_name, csv path, DataFrame or iterable of DataFrames)] into a shadow copy of db_path
+    inside one transaction with the build PRAGMAs, then builds the indexes and views, checks the
+    file and swaps it in place of db_path. Tables not in `sources` are carried over from the live
+    database, which stays untouched (and readable) until the swap and is kept if anything fails.
+    max_memory_mb bounds SQLite's page cache and moves its journal and sorts to disk (build_pragmas).
+    Prints rows/s per table and returns True on success.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    build_path = shadow_file(db_path)
+    conn = None
+    try:
+        remove_database(build_path)  # Left over from an interrupted load
+        conn = sqlite3.connect(build_path)
+        previous_pragmas, rebuild_kpis = {}, False
+        if os.path.exists(db_path):
+            previous_pragmas, rebuild_kpis = carry_over(conn, db_path, {table_name for table_name, _ in sources})
+        apply_pragmas(conn, build_pragmas(max_memory_mb))
+        total_rows, load_started = 0, time.perf_counter()
+        with conn:
+            conn.execute("BEGIN")  # One transaction for every table, including the DDL
+            for table_name, source in sources:
+                started = time.perf_counter()
+                if isinstance(source, pd.DataFrame):
+                    create_table(conn, table_name, column_dtypes(table_name, source.columns))
+                    rows = insert_rows(conn, table_name, source)
+                elif isinstance(source, str):
+                    rows = load_csv(conn, source, table_name, chunk_rows)
+                else:
+                    rows = load_batches(conn, source, table_name)
+                report_rate(table_name, rows, time.perf_counter() - started)
+                total_rows += rows
+        report_rate(f"{len(sources)} tables", total_rows, time.perf_counter() - load_started)
+
+        index_started = time.perf_counter()
+        finish_load(conn, create_views=create_views, rebuild_kpis=rebuild_kpis)
+        print(f"Built indexes and views in {time.perf_counter() - index_started:.2f}s.")
+
+        problems = integrity_problems(conn)
+        if problems:
+            raise sqlite3.DatabaseError(f"integrity check of the loaded database failed: {problems[0]}")
+        apply_pragmas(conn, previous_pragmas)
+        conn.close()
+        conn = None
+        replace_database(build_path, db_path)
+        print(f"Swapped the loaded database into place: {db_path}")
+        return True
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error loading data into SQLite (the live database was not changed): {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+        remove_database(build_path)  # Only still there if the load failed
+
+def raw_csv_sources(raw_dir, tables=None):
+    """(table, path) for the known tables present in raw_dir, in TABLE_DTYPES order."""
+    sources = []
+    for table_name in tables or TABLE_DTYPES:
+        csv_path = os.path.join(raw_dir, f"{table_name}.csv")
+        if os.path.exists(csv_path):
+            sources.append((table_name, csv_path))
+        elif tables:
+            print(f"Warning: {csv_path} not found; skipping '{table_name}'.")
+    return sources
+
+def parquet_sources(parquet_dir, tables=None, start_date=None, end_date=None, chunk_rows=CHUNK_ROWS):
+    """
+    (table, batch iterator) for the known tables present in parquet_dir. With start_date/end_date
+    only the partitions and row groups in that range are read (a dated slice of every table).
+    """
+    sources = []
+    for table_name in tables or TABLE_DTYPES:
+        if parquet_store.has_table(table_name, parquet_dir):
+            sources.append((table_name, parquet_store.iter_batches(table_name, chunk_rows, start_date, end_date,
+                                                                   root=parquet_dir)))
+        elif tables:
+            print(f"Warning: {parquet_store.table_dir(table_name, parquet_dir)} not found; skipping '{table_name}'.")
+    return sources
+
+def load_table_to_sqlite(csv_path, table_name, db_path=DB_PATH, chunk_rows=CHUNK_ROWS):
+    """Loads a single CSV with the bulk loader."""
+    return bulk_load(db_path, [(table_name, csv_path)], chunk_rows=chunk_rows)
 
 if __name__ == "__main__":
-    load_table_to_sqlite("data/raw/customers.csv", "customers")
+    parser = argparse.ArgumentParser(description="Bulk-loads the CSVs in data/raw/ (or the Parquet tables in data/parquet/) into the analytics SQLite database.")
+    parser.add_argument("--source", choices=["csv", "parquet"], default="csv", help="Raw file format to load from.")
+    parser.add_argument("--raw-dir", default=RAW_DIR, help="Directory holding <table>.csv files.")
+    parser.add_argument("--parquet-dir", default=PARQUET_DIR, help="Directory holding the partitioned <table>/ Parquet datasets.")
+    parser.add_argument("--start", type=date.fromisoformat, help="Parquet only: first date (YYYY-MM-DD) to load.")
+    parser.add_argument("--end", type=date.fromisoformat, help="Parquet only: last date (YYYY-MM-DD) to load.")
+    parser.add_argument("--db", default=DB_PATH, help="Target SQLite database.")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLE_DTYPES), help="Tables to load (default: all present).")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read and inserted per chunk.")
+    parser.add_argument("--max-memory", type=float,
+                        help="SQLite page cache in MB for the load; its journal and sorts then go to disk.")
+    load_args = parser.parse_args()
+
+    if load_args.source == "parquet":
+        load_sources = parquet_sources(load_args.parquet_dir, load_args.tables, load_args.start, load_args.end,
+                                       load_args.chunk_rows)
+        source_dir = load_args.parquet_dir
+    else:
+        if load_args.start or load_args.end:
+            parser.error("--start/--end need --source parquet (CSV files cannot skip rows by date)")
+        load_sources = raw_csv_sources(load_args.raw_dir, load_args.tables)
+        source_dir = load_args.raw_dir
+    if not load_sources:
+        print(f"No {load_args.source} files to load in {source_dir}")
+        exit(1)
+    if not bulk_load(load_args.db, load_sources, chunk_rows=load_args.chunk_rows, max_memory_mb=load_args.max_memory):
+        exit(1)
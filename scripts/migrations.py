@@ -0,0 +1,442 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+# --- Configuration ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ANALYTICS_DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas_analytics.db")
+DASHBOARD_DB_PATH = os.path.join(PROJECT_ROOT, "data", "sqlite", "saas.db")
+
+# The audit explains the dashboard's own statements (Streamlit puts dashboard/ on sys.path).
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "dashboard"))
+import queries  # noqa: E402
+from churn_rate import CHURN_RATE_SQL, refresh_churn_rates  # noqa: E402
+from cohort_retention import (  # noqa: E402
+    ACTIVE_WEEKS_QUERY, COHORT_MEMBERS_QUERY, COHORT_RETENTION_SQL, refresh_cohort_retention
+)
+from compute_kpis import KPI_DAILY_SQL, KPI_WEEKLY_SQL  # noqa: E402
+from data_version import stamp_data_version  # noqa: E402
+from olap_cube import CUBE_FACT_QUERIES, CUBE_MARKETING_QUERY, CUBE_SQL, refresh_cube  # noqa: E402
+from sqlite_schema import existing_tables, table_columns  # noqa: E402
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+);
+"""
+
+# --- Integer Day Keys ---
+# Ingestion-time normalization of the analytics dates: every date column gets an integer day
+# number (days since 1970-01-01) and the table gets the week it falls in, so the views join on
+# integer equality instead of parsing DATE(...) strings per row.
+# (table, date column, day column, week column or None)
+DAY_KEY_COLUMNS = [
+    ("calendar", "week_start_date", "week_start_day", "week_id"),
+    ("calendar", "week_end_date", "week_end_day", None),
+    ("customers", "signup_date", "signup_day", "signup_week_id"),
+    ("customers", "churn_date", "churn_day", "churn_week_id"),
+    ("subscription_changes", "event_date", "event_day", "week_id"),
+    ("revenue", "week_start", "week_start_day", "week_id"),
+    ("marketing", "week_start", "week_start_day", "week_id"),
+    ("product_usage", "week_start", "week_start_day", "week_id"),
+    ("support_tickets", "creation_date", "creation_day", "week_id"),
+    ("support_tickets", "resolution_date", "resolution_day", None),
+]
+EPOCH_JULIAN_DAY = 2440587.5  # JULIANDAY('1970-01-01')
+
+def day_expr(column):
+    """SQL for the day number of a date/datetime column (NULL stays NULL)."""
+    return f"CAST(JULIANDAY(DATE({column})) - {EPOCH_JULIAN_DAY} AS INTEGER)"
+
+def week_expr(day_column):
+    """
+    SQL for the week a day number falls in: whole 7-day weeks since the first calendar week,
+    which is the calendar's own 0-based week_id. Floors for days before that week.
+    """
+    offset = f"({day_column} - (SELECT MIN(week_start_day) FROM calendar))"
+    return f"CASE WHEN {offset} >= 0 THEN {offset} / 7 ELSE ({offset} - 6) / 7 END"
+
+def day_keys_by_table(conn):
+    """DAY_KEY_COLUMNS grouped per existing table, skipping date columns the table does not have."""
+    grouped = {}
+    for table, date_column, day_column, week_column in DAY_KEY_COLUMNS:
+        if date_column in table_columns(conn, table):
+            grouped.setdefault(table, []).append((date_column, day_column, week_column))
+    return grouped
+
+def day_key_updates(keys, where):
+    """The two UPDATE bodies filling the day columns, then the week columns derived from them."""
+    days = ", ".join(f"{day_column} = {day_expr(date_column)}" for date_column, day_column, _ in keys)
+    weeks = ", ".join(f"{week_column} = {week_expr(day_column)}" for _, day_column, week_column in keys if week_column)
+    return [f"SET {days} {where}"] + ([f"SET {weeks} {where}"] if weeks else [])
+
+def add_day_keys(conn):
+    """
+    Adds the integer day/week columns, backfills them, and installs triggers that fill them
+    for rows inserted or re-dated later (incremental loads).
+    """
+    grouped = day_keys_by_table(conn)
+    for table, keys in grouped.items():
+        existing = table_columns(conn, table)
+        for _, day_column, week_column in keys:
+            for column in (day_column, week_column):
+                if column and column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+                    existing.append(column)
+    # Day numbers first everywhere: week ids are counted from calendar.week_start_day
+    for table, keys in grouped.items():
+        conn.execute(f"UPDATE {table} {day_key_updates(keys, '')[0]}")
+    for table, keys in grouped.items():
+        for update in day_key_updates(keys, "")[1:]:
+            conn.execute(f"UPDATE {table} {update}")
+
+    for table, keys in grouped.items():
+        body = " ".join(f"UPDATE {table} {update};" for update in day_key_updates(keys, "WHERE rowid = NEW.rowid"))
+        date_columns = ", ".join(date_column for date_column, _, _ in keys)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_day_keys_insert AFTER INSERT ON {table} BEGIN {body} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_day_keys_update "
+                     f"AFTER UPDATE OF {date_columns} ON {table} BEGIN {body} END")
+
+# --- Natural Keys ---
+# Key of a row in the appended tables: incremental ingestion (scripts/ingest_batches.py) upserts on it.
+NATURAL_KEYS = {
+    "subscription_changes": ["event_id"],
+    "revenue": ["customer_id", "week_start"],
+    "product_usage": ["customer_id", "week_start"],
+    "support_tickets": ["ticket_id"],
+}
+
+# Unique index of every natural key (migration 6), with the statements that go with it.
+UNIQUE_KEY_SQL = {
+    "subscription_changes": [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_subscription_changes_event_id ON subscription_changes (event_id)",
+        "DROP INDEX IF EXISTS idx_subscription_changes_event_id",  # Same column, not unique
+    ],
+    "revenue": ["CREATE UNIQUE INDEX IF NOT EXISTS uq_revenue_customer_week_start ON revenue (customer_id, week_start)"],
+    "product_usage": ["CREATE UNIQUE INDEX IF NOT EXISTS uq_product_usage_customer_week_start "
+                      "ON product_usage (customer_id, week_start)"],
+    "support_tickets": ["CREATE UNIQUE INDEX IF NOT EXISTS uq_support_tickets_ticket_id ON support_tickets (ticket_id)"],
+}
+UNIQUE_KEY_INDEX_RE = re.compile(r"INDEX IF NOT EXISTS (\w+)")
+
+def has_unique_key(conn, table):
+    """True if the table has the unique index of its natural key (missing while it holds duplicate keys)."""
+    index = UNIQUE_KEY_INDEX_RE.search(UNIQUE_KEY_SQL[table][0]).group(1)
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone() is not None
+
+def duplicate_keys(conn, table, key, examples=3):
+    """(rows beyond the first of each repeated key, up to `examples` of the repeated keys)."""
+    columns = ", ".join(key)
+    grouped = f"SELECT {columns}, COUNT(*) AS n FROM {table} GROUP BY {columns} HAVING COUNT(*) > 1"
+    extra = conn.execute(f"SELECT COALESCE(SUM(n - 1), 0) FROM ({grouped})").fetchone()[0]
+    return extra, [row[:-1] for row in conn.execute(f"{grouped} LIMIT ?", (examples,))]
+
+def create_unique_keys(conn):
+    """
+    Builds the unique index of every natural key. A table with repeated keys is reported and left
+    without one (its batches cannot be ingested until then); no row is deleted here, see
+    drop_duplicate_keys. Returns {table: repeated rows} for the tables left without a unique key.
+    """
+    skipped = {}
+    for table, key in NATURAL_KEYS.items():
+        if not set(key) <= set(table_columns(conn, table)):
+            continue
+        extra, examples = duplicate_keys(conn, table, key)
+        if extra:
+            skipped[table] = extra
+            print(f"  Warning: {extra:,} rows of '{table}' repeat a ({', '.join(key)}) key, e.g. "
+                  f"{', '.join(map(str, examples))}; it gets no unique key and batches cannot be ingested into it. "
+                  "Fix the source data, or run `python scripts/migrations.py dedupe` to keep the last loaded row of each key.")
+            continue
+        for statement in UNIQUE_KEY_SQL[table]:
+            conn.execute(statement)
+    return skipped
+
+def drop_duplicate_keys(conn):
+    """
+    Opt-in (`migrations.py dedupe`): keeps the last loaded row of every natural key, then builds
+    the unique indexes. Prints the rows deleted per table. Returns {table: rows deleted}.
+    """
+    deleted = {}
+    for table, key in NATURAL_KEYS.items():
+        if set(key) <= set(table_columns(conn, table)):
+            deleted[table] = conn.execute(
+                f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {', '.join(key)})"
+            ).rowcount
+            if deleted[table]:
+                print(f"- Deleted {deleted[table]:,} rows of '{table}' that repeated a ({', '.join(key)}) key; "
+                      "the last loaded row of each key was kept.")
+    create_unique_keys(conn)
+    return deleted
+
+def drop_views(conn):
+    """Drops every view so the next create_views.sql run builds the current definitions."""
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='view'").fetchall():
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+
+# Ordered migrations per database: (version, description, steps). A step is a SQL statement or
+# a function taking the connection. Never edit an applied migration; append a new version instead.
+# Version 1 indexed the DATE(column) expressions the views used to compare, with the aggregated
+# columns appended so the weekly rollups are answered from the index alone. Version 2 moves the
+# views onto integer day/week keys and replaces those indexes. Version 3 materializes the cohort
+# retention matrix (scripts/cohort_retention.py); the view becomes a read of that table. Version 4
+# does the same for the weekly churn counts (scripts/churn_rate.py) and the churn views. Version 5
+# builds the week x plan x channel x country cube (dashboard/olap_cube.py) from them. Version 6
+# makes the natural keys of the appended tables unique, the conflict targets of incremental ingestion.
+ANALYTICS_MIGRATIONS = [
+    (1, "Covering indexes for the weekly views and KPI refresh", [
+        "CREATE INDEX IF NOT EXISTS idx_calendar_week ON calendar (week_start_date, week_end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_signup ON customers (DATE(signup_date), customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_churn ON customers (DATE(churn_date), customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_id ON customers (customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_subscription_changes_date "
+        "ON subscription_changes (DATE(event_date), event_type, mrr_change)",
+        "CREATE INDEX IF NOT EXISTS idx_subscription_changes_event_id ON subscription_changes (event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_revenue_week ON revenue (DATE(week_start), customer_id, MRR)",
+        "CREATE INDEX IF NOT EXISTS idx_revenue_customer ON revenue (customer_id, DATE(week_start), MRR)",
+        "CREATE INDEX IF NOT EXISTS idx_marketing_week ON marketing (DATE(week_start), ad_spend)",
+        "CREATE INDEX IF NOT EXISTS idx_product_usage_week "
+        "ON product_usage (DATE(week_start), customer_id, sessions, features_used)",
+    ]),
+    (2, "Integer day/week keys replacing the DATE() expression indexes", [
+        add_day_keys,
+        drop_views,  # The pipeline recreates them on the integer keys
+        "DROP INDEX IF EXISTS idx_calendar_week",
+        "DROP INDEX IF EXISTS idx_customers_signup",
+        "DROP INDEX IF EXISTS idx_customers_churn",
+        "DROP INDEX IF EXISTS idx_subscription_changes_date",
+        "DROP INDEX IF EXISTS idx_revenue_week",
+        "DROP INDEX IF EXISTS idx_revenue_customer",
+        "DROP INDEX IF EXISTS idx_marketing_week",
+        "DROP INDEX IF EXISTS idx_product_usage_week",
+        "CREATE INDEX IF NOT EXISTS idx_calendar_week_id ON calendar (week_id, week_start_date, week_start_day)",
+        "CREATE INDEX IF NOT EXISTS idx_calendar_week_start_day ON calendar (week_start_day, week_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_signup_week "
+        "ON customers (signup_week_id, churn_week_id, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_churn_week "
+        "ON customers (churn_week_id, signup_week_id, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_signup_day ON customers (signup_day, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_churn_day ON customers (churn_day, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_subscription_changes_week "
+        "ON subscription_changes (week_id, event_type, mrr_change)",
+        "CREATE INDEX IF NOT EXISTS idx_subscription_changes_day "
+        "ON subscription_changes (event_day, event_type, mrr_change)",
+        "CREATE INDEX IF NOT EXISTS idx_revenue_week_id ON revenue (week_id, customer_id, MRR)",
+        "CREATE INDEX IF NOT EXISTS idx_revenue_customer_week ON revenue (customer_id, week_id, MRR)",
+        "CREATE INDEX IF NOT EXISTS idx_marketing_week_id ON marketing (week_id, ad_spend)",
+        "CREATE INDEX IF NOT EXISTS idx_product_usage_week_id "
+        "ON product_usage (week_id, customer_id, sessions, features_used)",
+    ]),
+    (3, "Bitmap-computed cohort retention table replacing the retention self-join", [
+        *COHORT_RETENTION_SQL,
+        "DROP VIEW IF EXISTS v_weekly_cohort_retention_summary",  # Recreated over kpi_cohort_retention
+        refresh_cohort_retention,
+    ]),
+    (4, "Single-pass churn counts per segment replacing the churn views' joins", [
+        *CHURN_RATE_SQL,
+        "DROP VIEW IF EXISTS v_weekly_customer_churn_rate",  # Recreated over kpi_customer_churn
+        "DROP VIEW IF EXISTS v_customers_churned_in_week",
+        "DROP VIEW IF EXISTS v_customers_active_at_week_start",
+        refresh_churn_rates,
+    ]),
+    (5, "Pre-aggregated cube over week x plan x marketing channel x country", [
+        *CUBE_SQL,
+        refresh_cube,
+    ]),
+    (6, "Unique natural keys for incremental upserts", [
+        create_unique_keys,  # Never deletes: a table with repeated keys is reported instead
+    ]),
+]
+
+DASHBOARD_MIGRATIONS = [
+    (1, "Covering indexes for the dashboard queries", [
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_customer_start "
+        "ON subscriptions (customer_id, start_date, plan_id, end_date, status)",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_start ON subscriptions (start_date)",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_end ON subscriptions (end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_status_start "
+        "ON subscriptions (status, start_date, end_date, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_campaign_registration "
+        "ON customers (marketing_campaign_id, registration_date)",
+        "CREATE INDEX IF NOT EXISTS idx_marketing_campaigns_dates ON marketing_campaigns (start_date, end_date)",
+    ]),
+]
+
+# Statements checked by the audit, besides every view in the database.
+AUDITED_QUERIES = {
+    "dashboard": {
+        "date range (subscriptions)": queries.SUBSCRIPTION_DATE_RANGE_QUERY,
+        "date range (campaigns)": queries.CAMPAIGN_DATE_RANGE_QUERY,
+        "subscription periods": queries.SUBSCRIPTION_PERIODS_QUERY,
+        "MRR buckets (daily)": queries.MRR_BUCKET_QUERIES['D'],
+        "MRR buckets (weekly)": queries.MRR_BUCKET_QUERIES['W'],
+        "MRR buckets (monthly)": queries.MRR_BUCKET_QUERIES['M'],
+        "active periods": queries.ACTIVE_PERIODS_QUERY,
+        "subscription events": queries.SUBSCRIPTION_EVENTS_QUERY,
+        "marketing campaign summary": queries.MARKETING_CAMPAIGN_SUMMARY_QUERY,
+    },
+    "analytics": {
+        "weekly KPIs (dashboard)": queries.WEEKLY_KPIS_QUERY,
+        "churn segments (dashboard)": queries.CHURN_SEGMENTS_QUERY,
+        "segment churn (dashboard)": queries.SEGMENT_CHURN_QUERY,
+        "kpi_weekly refresh": KPI_WEEKLY_SQL,
+        "kpi_daily refresh": KPI_DAILY_SQL,
+        "cohort members": COHORT_MEMBERS_QUERY,
+        "cohort activity weeks": ACTIVE_WEEKS_QUERY,
+        **{f"cube facts ({fact})": query for fact, query in CUBE_FACT_QUERIES.items()},
+        "cube facts (marketing)": CUBE_MARKETING_QUERY,
+    },
+}
+
+# --- Helper Functions ---
+def detect_schema(conn):
+    """'dashboard' for the plans/subscriptions database, 'analytics' for the pipeline database."""
+    return "dashboard" if "subscriptions" in existing_tables(conn) else "analytics"
+
+def migrations_for(schema):
+    """The ordered migration list for a schema name."""
+    return DASHBOARD_MIGRATIONS if schema == "dashboard" else ANALYTICS_MIGRATIONS
+
+def current_version(conn):
+    """Highest applied migration version, 0 for a database that was never migrated."""
+    conn.execute(SCHEMA_VERSION_SQL)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def reset_schema_version(conn):
+    """
+    Forgets applied migrations. Loaders that drop and recreate tables (to_sql(if_exists='replace'),
+    database_setup.py) also drop their indexes, so the migrations must run again afterwards.
+    """
+    conn.execute("DROP TABLE IF EXISTS schema_version")
+    conn.commit()
+
+INDEX_TABLE_RE = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\b.*?\bON\s+(\w+)", re.IGNORECASE | re.DOTALL)
+
+def index_table_missing(conn, statement):
+    """True for a CREATE INDEX on a table this database does not have (e.g. a partial CSV load)."""
+    match = INDEX_TABLE_RE.match(statement)
+    return bool(match) and not table_columns(conn, match.group(1))
+
+# --- Migrations ---
+def run_migrations(conn, schema=None):
+    """Applies every migration newer than the stored schema version, each in its own transaction."""
+    schema = schema or detect_schema(conn)
+    version = current_version(conn)
+    applied = 0
+    for migration_version, description, steps in migrations_for(schema):
+        if migration_version <= version:
+            continue
+        with conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                elif index_table_missing(conn, step):
+                    print(f"  Skipped (table not loaded): {step}")
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration_version, description, datetime.now().isoformat(timespec='seconds'))
+            )
+        print(f"- Applied {schema} migration {migration_version}: {description}")
+        applied += 1
+    if applied:
+        conn.execute("ANALYZE")  # Refresh planner statistics for the new indexes
+    print(f"{schema.capitalize()} schema is at version {current_version(conn)} ({applied} migration(s) applied).")
+    return applied
+
+# --- Query Plan Audit ---
+# FROM/JOIN <table> [AS] <alias>; plan lines name the alias rather than the table.
+TABLE_REFERENCE_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+NAMED_PARAM_RE = re.compile(r"(?<!\w):(\w+)")
+SQL_KEYWORDS = {"on", "where", "group", "order", "left", "inner", "join", "cross", "using", "limit", "union"}
+
+def reference_targets(sql_texts, tables):
+    """
+    Maps every name a plan line can show (table or alias, from statements and view bodies) to the
+    tables, CTEs or subqueries it stands for. The same alias may name a table in one view and a
+    CTE in another.
+    """
+    targets = {table: {table} for table in tables}
+    for sql in sql_texts:
+        for name, alias in TABLE_REFERENCE_RE.findall(sql):
+            if alias and alias.lower() not in SQL_KEYWORDS:
+                targets.setdefault(alias, set()).add(name)
+    return targets
+
+def full_scans(conn, sql, tables, targets):
+    """
+    Plan lines of `sql` that read a base table without an index (plain 'SCAN <table or alias>').
+    Scans of subqueries and CTEs the plan materializes itself are not flagged, including aliases
+    of them that elsewhere name a table.
+    """
+    named = NAMED_PARAM_RE.findall(sql)
+    params = dict.fromkeys(named) if named else (None,) * sql.count("?")
+    plan = [detail.split() for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    subqueries = {words[1] for words in plan if len(words) >= 2 and words[0] in ("MATERIALIZE", "CO-ROUTINE")}
+    flagged = []
+    for words in plan:
+        if len(words) < 2 or words[0] != "SCAN" or "USING" in words or words[1] in subqueries:
+            continue
+        names = targets.get(words[1], set())
+        if names & tables and not names & subqueries:
+            flagged.append(" ".join(words))
+    return flagged
+
+def audit_query_plans(conn, schema=None):
+    """
+    Runs EXPLAIN QUERY PLAN over every view and every audited statement for this database and
+    prints the ones that still fall back to a full table scan. Returns the number flagged.
+    """
+    schema = schema or detect_schema(conn)
+    tables = existing_tables(conn)
+    views = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='view' ORDER BY name").fetchall()
+    statements = {f"view {name}": f"SELECT * FROM {name}" for name, _ in views}
+    statements.update(AUDITED_QUERIES[schema])
+    targets = reference_targets([sql for _, sql in views] + list(statements.values()), tables)
+
+    flagged = 0
+    print(f"Auditing {len(statements)} {schema} statements for full table scans...")
+    for label, sql in statements.items():
+        try:
+            scans = full_scans(conn, sql, tables, targets)
+        except sqlite3.Error as e:
+            print(f"- {label}: could not be explained ({e})")
+            continue
+        if scans:
+            flagged += 1
+            print(f"- {label}: " + "; ".join(scans))
+    print(f"{flagged} of {len(statements)} statements still do a full SCAN.")
+    return flagged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema migrations and query plan audit for the SQLite databases.")
+    parser.add_argument("command", choices=["migrate", "audit", "dedupe"],
+                        help="'migrate' applies pending migrations; 'audit' flags statements that still do full scans; "
+                             "'dedupe' deletes all but the last loaded row of every repeated natural key (analytics DB).")
+    parser.add_argument("--db", default=ANALYTICS_DB_PATH,
+                        help=f"SQLite database (default: analytics DB; the dashboard DB is {DASHBOARD_DB_PATH}).")
+    migration_args = parser.parse_args()
+
+    if not os.path.exists(migration_args.db):
+        print(f"Error: database not found at {migration_args.db}")
+        exit(1)
+    migration_conn = sqlite3.connect(migration_args.db)
+    try:
+        if migration_args.command == "migrate":
+            run_migrations(migration_conn)
+        elif migration_args.command == "dedupe":
+            with migration_conn:
+                if any(drop_duplicate_keys(migration_conn).values()):
+                    print(f"Data version {stamp_data_version(migration_conn, 'dedupe')}.")
+                else:
+                    print("No repeated natural keys.")
+        else:
+            exit(1 if audit_query_plans(migration_conn) else 0)
+    finally:
+        migration_conn.close()
@@ -0,0 +1,70 @@
+# Build-then-swap for the analytics database: a rebuild or bulk load goes into a shadow file next
+# to the live database, and is only moved over it (os.replace, an atomic rename) once complete and
+# checked, so the dashboard never sees a missing or half-loaded database.
+import os
+import sqlite3
+
+SHADOW_SUFFIX = ".shadow"
+# Only for connections to the shadow: nobody reads it before the swap, so a crash mid-build just
+# means rebuilding it. MEMORY (not OFF) keeps the rollback journal that transactions rely on.
+BUILD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -262144,  # 256 MiB (negative values are KiB)
+}
+
+def build_pragmas(max_memory_mb=None):
+    """
+    BUILD_PRAGMAS, or for a memory budget: a page cache of max_memory_mb, with the rollback journal
+    and SQLite's temp files (index-build sorts) on disk instead of in memory, still without fsyncs.
+    """
+    if not max_memory_mb:
+        return BUILD_PRAGMAS
+    return {**BUILD_PRAGMAS, "journal_mode": "DELETE", "temp_store": "FILE",
+            "cache_size": -max(1024, int(max_memory_mb * 1024))}
+
+def shadow_file(db_path):
+    """Path of the shadow file db_path is built in."""
+    return os.path.abspath(db_path) + SHADOW_SUFFIX
+
+def remove_database(path):
+    """Deletes a database file and its journal files, if they exist (a stale journal would be rolled into a new file)."""
+    for name in (path, f"{path}-journal", f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+
+def copy_database(source_path, target_path):
+    """Copies a database page by page with SQLite's backup API (consistent while others read it)."""
+    source, target = sqlite3.connect(source_path), sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def integrity_problems(conn):
+    """Messages of PRAGMA integrity_check; empty if the file is sound."""
+    problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    return [] if problems == ["ok"] else problems
+
+def fsync_path(path):
+    """Flushes a file (or, on POSIX, a directory entry) to disk; the build ran with synchronous=OFF."""
+    flags = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) if os.path.isdir(path) else os.O_RDWR
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return  # Directories cannot be opened on Windows; os.replace is durable there
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def replace_database(build_path, db_path):
+    """
+    Moves a finished shadow over db_path durably: fsync the file, rename it, fsync the directory.
+    Readers holding the old file keep reading it to the end of their query. Raises OSError.
+    """
+    fsync_path(build_path)
+    os.replace(build_path, db_path)
+    fsync_path(os.path.dirname(os.path.abspath(db_path)))
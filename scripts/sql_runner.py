@@ -0,0 +1,126 @@
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard"))
+from sqlite_schema import read_only_uri  # noqa: E402
+
+# Applied before a script's transaction starts. The whole script commits once, so the per-statement
+# fsyncs of the sqlite3 CLI (which autocommits every statement) are gone; these trim the rest.
+SCRIPT_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",   # Sorts and temporary B-trees for index builds stay in memory
+    "cache_size": -65536,     # 64 MiB page cache (negative values are KiB)
+}
+
+COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# --- Helper Functions ---
+def has_sql(text):
+    """True if the text contains anything besides whitespace and comments."""
+    return bool(COMMENT_RE.sub("", text).strip())
+
+def split_statements(sql):
+    """
+    Splits a SQL script into single statements. Text is accumulated up to each ';' until SQLite
+    reports a complete statement, so semicolons inside strings, comments and trigger bodies
+    (BEGIN ... END;) do not split a statement. Comment-only fragments are dropped.
+    """
+    statements, buffer = [], ""
+    pieces = sql.split(";")
+    for piece in pieces[:-1]:
+        buffer += piece + ";"
+        if sqlite3.complete_statement(buffer):
+            if has_sql(buffer):
+                statements.append(buffer.strip())
+            buffer = ""
+    buffer += pieces[-1]
+    if has_sql(buffer):
+        statements.append(buffer.strip())  # Last statement without a closing ';'
+    return statements
+
+def statement_label(statement, width=70):
+    """First line of a statement without its comments, for timing reports."""
+    first_line = COMMENT_RE.sub("", statement).strip().splitlines()[0]
+    return first_line if len(first_line) <= width else first_line[:width - 3] + "..."
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+# --- Script Execution ---
+def run_script(conn, sql, pragmas=SCRIPT_PRAGMAS):
+    """
+    Runs every statement of a SQL script inside a single transaction and returns
+    [(statement label, seconds)]. On error the transaction is rolled back, the failing
+    statement is printed and the sqlite3 error is re-raised.
+    """
+    statements = split_statements(sql)
+    apply_pragmas(conn, pragmas)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Transaction boundaries are managed explicitly below
+    timings = []
+    try:
+        conn.execute("BEGIN")
+        for statement in statements:
+            started = time.perf_counter()
+            try:
+                conn.execute(statement)
+            except sqlite3.Error:
+                print(f"Failed statement: {statement_label(statement)}")
+                raise
+            timings.append((statement_label(statement), time.perf_counter() - started))
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+    return timings
+
+def print_timings(timings):
+    """Prints one line per statement, then the total."""
+    for label, seconds in timings:
+        print(f"  {seconds:8.3f}s  {label}")
+    print(f"  {sum(seconds for _, seconds in timings):8.3f}s  total ({len(timings)} statements)")
+
+# --- Parallel View Checks ---
+def view_names(conn):
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='view' ORDER BY name")]
+
+def check_view(db_path, view, count_rows=False):
+    """
+    Queries one view on its own read-only connection. By default it runs SELECT * ... LIMIT 0, which
+    compiles the view against the current tables (a missing column or table fails) without running
+    it; count_rows runs it to completion with COUNT(*). Returns (rows or None, seconds, error).
+    """
+    started = time.perf_counter()
+    conn = None
+    try:
+        conn = sqlite3.connect(read_only_uri(db_path), uri=True)
+        rows = None
+        if count_rows:
+            rows = conn.execute(f"SELECT COUNT(*) FROM {view}").fetchone()[0]
+        else:
+            conn.execute(f"SELECT * FROM {view} LIMIT 0").fetchall()
+        return rows, time.perf_counter() - started, None
+    except sqlite3.Error as e:
+        return None, time.perf_counter() - started, str(e)
+    finally:
+        if conn:
+            conn.close()
+
+def check_views(db_path, views, workers=4, count_rows=False):
+    """
+    Checks every view concurrently (see check_view), one read-only connection per worker thread.
+    Creating views has to stay serial (SQLite allows a single writer), but checking them only reads,
+    so they can be checked in parallel; sqlite3 releases the GIL while a query runs.
+    Returns {view: (rows, seconds, error)} in the order given.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda view: check_view(db_path, view, count_rows), views)
+        return dict(zip(views, results))
@@ -30,12 +30,19 @@ ORDER BY week_start_date;
 
 -- 4. Customer Churn Rate Trend (Weekly Percentage)
 -- Shows the percentage of customers lost each week.
+-- Reads the per-segment counts materialized by scripts/compute_kpis.py (kpi_customer_churn).
+-- Add e.g. WHERE plan = 'Pro' AND country = 'USA' to slice by plan, marketing_channel or country.
 SELECT
-    week_start_date,
-    active_at_start_of_week,
-    churned_this_week,
-    customer_churn_rate_percentage
-FROM v_weekly_customer_churn_rate
+    MIN(week_start_date) as week_start_date,
+    SUM(active_at_start_of_week) as active_at_start_of_week,
+    SUM(churned_this_week) as churned_this_week,
+    CASE
+        WHEN SUM(active_at_start_of_week) > 0
+        THEN (CAST(SUM(churned_this_week) AS REAL) / SUM(active_at_start_of_week)) * 100
+        ELSE 0
+    END as customer_churn_rate_percentage
+FROM kpi_customer_churn
+GROUP BY week_id
 ORDER BY week_start_date;
 
 -- 5. Gross Revenue Churn Rate Trend (Weekly Percentage)
@@ -77,19 +84,20 @@ ORDER BY week_start_date;
 
 -- 9. Cohort Retention Analysis (Example for a specific cohort)
 -- Tracks how many customers from a specific signup week remain active over subsequent weeks.
--- Replace 'YYYY-MM-DD' with an actual cohort_week_start from your v_customer_cohorts or v_weekly_cohort_retention_summary
+-- Reads the retention matrix materialized by scripts/compute_kpis.py (kpi_cohort_retention).
+-- Replace the subquery with an actual cohort_week_id (or filter on cohort_week = 'YYYY-MM-DD')
 SELECT
     cohort_week,
     week_number_after_signup,
     cohort_size,
     retained_customers,
     retention_percentage
-FROM v_weekly_cohort_retention_summary
-WHERE cohort_week = (SELECT MIN(cohort_week) FROM v_weekly_cohort_retention_summary) -- Example: Oldest cohort
-ORDER BY cohort_week, week_number_after_signup;
+FROM kpi_cohort_retention
+WHERE cohort_week_id = (SELECT MIN(cohort_week_id) FROM kpi_cohort_retention) -- Example: Oldest cohort
+ORDER BY cohort_week_id, week_number_after_signup;
 
 -- To get a list of available cohort weeks:
--- SELECT DISTINCT cohort_week FROM v_weekly_cohort_retention_summary ORDER BY cohort_week;
+-- SELECT DISTINCT cohort_week FROM kpi_cohort_retention ORDER BY cohort_week;
 
 -- 10. Weekly Performance Snapshot (Example for the most recent week)
 -- Provides a summary of all key metrics for a specific period.